@@ -17,6 +17,8 @@ from .models import (
     AtaRegistroPrecos,
     DocumentoAtaRegistroPrecos,
     Notificacao,
+    TarefaProcessamento,
+    TravaOperacao,
 )
 
 # ============================================================
@@ -193,4 +195,19 @@ class DocumentoContratoAdmin(admin.ModelAdmin):
 class NotificacaoAdmin(admin.ModelAdmin):
     list_display = ('id', 'usuario', 'ator', 'tipo_acao', 'titulo', 'lida', 'criado_em')
     list_filter = ('tipo_acao', 'lida', 'criado_em')
-    search_fields = ('usuario__username', 'ator__username', 'titulo', 'mensagem')
\ No newline at end of file
+    search_fields = ('usuario__username', 'ator__username', 'titulo', 'mensagem')
+
+
+@admin.register(TarefaProcessamento)
+class TarefaProcessamentoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'usuario', 'processo', 'processados', 'total', 'criado_em')
+    list_filter = ('tipo', 'status')
+    search_fields = ('usuario__username', 'mensagem')
+
+
+@admin.register(TravaOperacao)
+class TravaOperacaoAdmin(admin.ModelAdmin):
+    # Apagar uma trava aqui libera o processo na hora (sem esperar vencer)
+    list_display = ('id', 'processo', 'operacao', 'usuario', 'iniciada_em', 'expira_em')
+    list_filter = ('operacao',)
+    search_fields = ('processo__numero_processo', 'usuario__username')
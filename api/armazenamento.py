@@ -0,0 +1,687 @@
+# api/armazenamento.py
+"""
+Camada de armazenamento dos arquivos enviados (FileFields).
+
+Com settings.ARMAZENAMENTO_S3_BUCKET o storage padrão é um bucket S3 ou
+compatível (MinIO, Ceph, R2...; ver a seção ARMAZENAMENTO em settings.py),
+o que permite vários servidores de aplicação. Nesse modo:
+
+- Upload direto: o cliente pede uma URL pré-assinada (POST
+  /api/uploads/presign/), envia o arquivo direto ao bucket e depois chama o
+  endpoint de criação do documento com o token 'upload' e o 'arquivo_hash'
+  (SHA-256). A API só confere tamanho e hash (lendo o objeto em blocos) e
+  grava os metadados; nenhum byte do upload passa por um worker do Django.
+  O token vale para um único documento (UploadAnexado).
+- Download: o endpoint de download redireciona para uma URL pré-assinada
+  do bucket (ver api/downloads.py).
+- Envio ao PNCP: o arquivo é lido do bucket em fluxo (abrir_leitura /
+  CorpoMultipart), sem carregar o PDF inteiro em memória.
+
+Sem bucket configurado tudo continua em MEDIA_ROOT e o upload segue pelo
+multipart de sempre.
+
+Em qualquer modo, arquivos grandes podem ser enviados em partes por uma
+SessaoUpload retomável (/api/uploads/): partes sequenciais com offset vão
+para o storage compartilhado (no bucket, um multipart upload direto para o
+destino, com partes de ao menos 5 MB exceto a última; no disco, um arquivo
+por parte sob ARMAZENAMENTO_UPLOAD_PARCIAL_PREFIXO), então cada parte pode
+chegar a um servidor diferente. Ao concluir, o arquivo é conferido
+(SHA-256) e o documento é criado com 'sessao_upload'. Após uma queda, só as
+partes que faltam são reenviadas.
+
+Erros seguem o padrão dos serviços: ValueError com mensagem amigável.
+"""
+
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from django.utils.text import get_valid_filename
+
+from .models import SessaoUpload, UploadAnexado
+
+TAMANHO_MAXIMO = getattr(settings, "ARMAZENAMENTO_UPLOAD_TAMANHO_MAXIMO", 200 * 1024 * 1024)
+VALIDADE_UPLOAD = getattr(settings, "ARMAZENAMENTO_UPLOAD_VALIDADE_SEGUNDOS", 900)
+TAMANHO_BLOCO = 1024 * 1024
+SALT = "api.armazenamento.upload"
+PARCIAL_PREFIXO = getattr(settings, "ARMAZENAMENTO_UPLOAD_PARCIAL_PREFIXO", "uploads_parciais/")
+PARTE_MAXIMA = getattr(settings, "ARMAZENAMENTO_UPLOAD_PARTE_MAXIMA", 16 * 1024 * 1024)
+PARTE_MINIMA_S3 = 5 * 1024 * 1024
+PARTE_TIMEOUT = getattr(settings, "ARMAZENAMENTO_UPLOAD_PARTE_TIMEOUT_SEGUNDOS", 300)
+
+
+def usa_s3(storage=None):
+    """True se o storage (padrão: default_storage) é um bucket S3/compatível."""
+    storage = storage or default_storage
+    return hasattr(storage, "bucket_name") and hasattr(storage, "connection")
+
+
+def _cliente(storage):
+    return storage.connection.meta.client
+
+
+def _chave_s3(storage, nome):
+    # Aplica o prefixo 'location' do storage, como o próprio django-storages
+    return storage._normalize_name(nome)
+
+
+def sha256(arquivo):
+    """SHA-256 de um arquivo aberto, lido em blocos (volta o ponteiro ao início)."""
+    h = hashlib.sha256()
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b""):
+        h.update(bloco)
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    return h.hexdigest()
+
+
+# ============================================================
+# ⬆️ UPLOAD DIRETO (URL PRÉ-ASSINADA)
+# ============================================================
+
+def _prefixo(modelo):
+    upload_to = modelo._meta.get_field("arquivo").upload_to
+    return upload_to if upload_to.endswith("/") else upload_to + "/"
+
+
+def preparar_upload(modelo, tipo, usuario_id, nome, tamanho, content_type=None):
+    """
+    URL pré-assinada (POST) para enviar um arquivo de 'modelo' direto ao bucket.
+    Devolve {"upload": token, "url", "campos", "chave", "expira_em"}.
+    """
+    if not usa_s3():
+        raise ValueError("Upload direto indisponível: o armazenamento é local. Envie o arquivo por multipart.")
+    nome = get_valid_filename(os.path.basename(nome or "")) or "arquivo"
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        raise ValueError("Informe o tamanho do arquivo em bytes.")
+    if tamanho <= 0 or tamanho > TAMANHO_MAXIMO:
+        raise ValueError(f"Tamanho inválido (máximo {TAMANHO_MAXIMO // (1024 * 1024)} MB).")
+
+    # Um diretório por upload: nada a sobrescrever, nome original preservado
+    chave = f"{_prefixo(modelo)}{uuid.uuid4().hex}/{nome}"
+    content_type = content_type or "application/octet-stream"
+    storage = default_storage
+    assinado = _cliente(storage).generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=_chave_s3(storage, chave),
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", tamanho, tamanho],
+        ],
+        ExpiresIn=VALIDADE_UPLOAD,
+    )
+    token = signing.dumps(
+        {"c": chave, "t": tipo, "u": usuario_id, "n": nome, "s": tamanho}, salt=SALT, compress=True
+    )
+    return {
+        "upload": token,
+        "url": assinado["url"],
+        "campos": assinado["fields"],
+        "chave": chave,
+        "expira_em": VALIDADE_UPLOAD,
+    }
+
+
+class UploadFinalizado:
+    """Arquivo já gravado no bucket; 'chave' pode ser atribuída direto ao FileField."""
+
+    def __init__(self, chave, nome, tamanho, hash_):
+        self.chave = chave
+        self.nome = nome
+        self.tamanho = tamanho
+        self.hash = hash_
+
+
+class UploadJaAnexado(ValueError):
+    """O upload do token já foi anexado a outro documento."""
+
+    def __init__(self):
+        super().__init__("Este upload já foi anexado a outro documento; envie o arquivo novamente.")
+
+
+def _ler_token(token):
+    try:
+        return signing.loads(token or "", salt=SALT, max_age=VALIDADE_UPLOAD * 4)
+    except signing.BadSignature:
+        raise ValueError("Token de upload inválido ou expirado.")
+
+
+def nome_do_upload(token):
+    """Nome original do arquivo de um token de upload (None se inválido)."""
+    try:
+        return _ler_token(token)["n"]
+    except ValueError:
+        return None
+
+
+def finalizar_upload(token, tipo, usuario_id, arquivo_hash):
+    """
+    Confere o token, a existência/tamanho do objeto e o SHA-256 informado
+    pelo cliente e marca a chave como anexada. ValueError se algo não bater;
+    UploadJaAnexado se o token já foi usado.
+    """
+    dados = _ler_token(token)
+    if dados["t"] != tipo or dados["u"] != usuario_id:
+        raise ValueError("Token de upload não pertence a este tipo de documento ou usuário.")
+    arquivo_hash = (arquivo_hash or "").strip().lower()
+    if len(arquivo_hash) != 64:
+        raise ValueError("Informe 'arquivo_hash' (SHA-256 em hexadecimal) do arquivo enviado.")
+
+    storage = default_storage
+    chave = dados["c"]
+    # Antes de ler o objeto: um hash errado apagaria o arquivo do outro documento
+    if UploadAnexado.objects.filter(chave=chave).exists():
+        raise UploadJaAnexado()
+    try:
+        tamanho = storage.size(chave)
+    except FileNotFoundError:
+        raise ValueError("Arquivo não encontrado no armazenamento: conclua o envio antes de finalizar.")
+    if tamanho != dados["s"]:
+        raise ValueError("Tamanho do arquivo enviado não confere com o informado.")
+
+    corpo = abrir_leitura(chave, storage)
+    try:
+        calculado = sha256(corpo)
+    finally:
+        corpo.close()
+    if calculado != arquivo_hash:
+        storage.delete(chave)
+        raise ValueError("Hash do arquivo enviado não confere; envie o arquivo novamente.")
+    try:
+        with transaction.atomic():
+            UploadAnexado.objects.create(chave=chave, usuario_id=usuario_id)
+    except IntegrityError:
+        raise UploadJaAnexado()
+    return UploadFinalizado(chave, dados["n"], tamanho, calculado)
+
+
+# ============================================================
+# 🧩 UPLOAD EM PARTES (retomável)
+# ============================================================
+
+class OffsetInvalido(ValueError):
+    """Parte fora de ordem; 'recebido' é o offset que o servidor espera."""
+
+    def __init__(self, recebido):
+        super().__init__(f"Offset inválido: o servidor espera a parte a partir do byte {recebido}.")
+        self.recebido = recebido
+
+
+class SessaoOcupada(ValueError):
+    """Outra requisição está gravando nesta sessão."""
+
+
+def _prefixo_parcial(sessao):
+    return f"{PARCIAL_PREFIXO}{sessao.pk}/"
+
+
+def _travar_sessao(sessao_id, usuario_id, nowait=True):
+    """Sessão do usuário com a linha travada (dentro de transaction.atomic)."""
+    try:
+        uuid.UUID(str(sessao_id))
+    except ValueError:
+        raise SessaoUpload.DoesNotExist
+    try:
+        return SessaoUpload.objects.select_for_update(nowait=nowait).get(pk=sessao_id, usuario_id=usuario_id)
+    except DatabaseError:
+        raise SessaoOcupada("Outra parte desta sessão está sendo recebida; tente novamente em instantes.")
+
+
+def _iniciar_multipart(storage, sessao):
+    resp = _cliente(storage).create_multipart_upload(
+        Bucket=storage.bucket_name,
+        Key=_chave_s3(storage, sessao.chave),
+        ContentType=sessao.content_type or "application/octet-stream",
+    )
+    return resp["UploadId"]
+
+
+def _abortar_multipart(storage, sessao):
+    try:
+        _cliente(storage).abort_multipart_upload(
+            Bucket=storage.bucket_name, Key=_chave_s3(storage, sessao.chave), UploadId=sessao.upload_id
+        )
+    except Exception:
+        # Já concluído/abortado; o bucket expira multiparts esquecidos pela lifecycle
+        pass
+
+
+def iniciar_sessao(usuario_id, tipo, modelo, nome, tamanho, content_type="", arquivo_hash=None):
+    """
+    Cria a sessão (no bucket, já com o multipart upload para o destino no
+    prefixo do 'modelo'). ValueError se os dados forem inválidos.
+    """
+    nome = get_valid_filename(os.path.basename(nome or "")) or "arquivo"
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        raise ValueError("Informe o tamanho do arquivo em bytes.")
+    if tamanho <= 0 or tamanho > TAMANHO_MAXIMO:
+        raise ValueError(f"Tamanho inválido (máximo {TAMANHO_MAXIMO // (1024 * 1024)} MB).")
+    arquivo_hash = (arquivo_hash or "").strip().lower() or None
+    if arquivo_hash and len(arquivo_hash) != 64:
+        raise ValueError("'arquivo_hash' deve ser o SHA-256 do arquivo em hexadecimal.")
+
+    sessao = SessaoUpload(
+        usuario_id=usuario_id,
+        tipo=tipo,
+        nome=nome,
+        content_type=(content_type or "")[:100],
+        tamanho=tamanho,
+        arquivo_hash=arquivo_hash,
+    )
+    if usa_s3():
+        sessao.chave = f"{_prefixo(modelo)}{uuid.uuid4().hex}/{nome}"
+        sessao.upload_id = _iniciar_multipart(default_storage, sessao)
+    sessao.save()
+    return sessao
+
+
+def parte_minima(sessao):
+    # No multipart do S3 toda parte, menos a última, tem ao menos 5 MB
+    return PARTE_MINIMA_S3 if sessao.upload_id else 1
+
+
+def _liberar_gravacao(sessao_id, reserva):
+    SessaoUpload.objects.filter(pk=sessao_id, gravacao=reserva).update(gravacao=None, gravando_ate=None)
+
+
+def _gravar_parte(storage, sessao, numero, reserva, conteudo, tamanho):
+    """Grava a parte no storage compartilhado e devolve seu registro em 'partes'."""
+    if sessao.upload_id:
+        resp = _cliente(storage).upload_part(
+            Bucket=storage.bucket_name,
+            Key=_chave_s3(storage, sessao.chave),
+            UploadId=sessao.upload_id,
+            PartNumber=numero,
+            Body=conteudo,
+            ContentLength=tamanho,
+        )
+        return {"numero": numero, "tamanho": tamanho, "etag": resp["ETag"]}
+    # Nome por tentativa: uma tentativa antiga não sobrescreve a que valeu
+    nome = storage.save(f"{_prefixo_parcial(sessao)}{numero:05d}-{reserva.hex[:12]}", File(conteudo))
+    return {"numero": numero, "tamanho": tamanho, "nome": nome}
+
+
+def _descartar_parte(storage, parte):
+    if parte.get("nome"):
+        storage.delete(parte["nome"])
+
+
+def receber_parte(sessao_id, usuario_id, offset, fluxo, tamanho_parte, hash_parte=None):
+    """
+    Grava a parte [offset, offset + tamanho_parte) lida de 'fluxo'.
+
+    Só aceita a próxima parte esperada (OffsetInvalido). A linha da sessão
+    fica travada apenas para conferir o offset e reservar a parte e, depois,
+    para registrá-la e avançar 'recebido'; a leitura da rede e a gravação no
+    storage acontecem fora da transação. Uma parte interrompida ou com
+    SHA-256 diferente de hash_parte é descartada.
+    """
+    if tamanho_parte is None or tamanho_parte <= 0:
+        raise ValueError("Informe o Content-Length da parte.")
+    if tamanho_parte > PARTE_MAXIMA:
+        raise ValueError(f"Parte maior que o limite de {PARTE_MAXIMA // (1024 * 1024)} MB.")
+
+    agora = timezone.now()
+    with transaction.atomic():
+        sessao = _travar_sessao(sessao_id, usuario_id)
+        if sessao.status != "recebendo":
+            raise ValueError("Sessão de upload já concluída.")
+        if offset != sessao.recebido:
+            raise OffsetInvalido(sessao.recebido)
+        if offset + tamanho_parte > sessao.tamanho:
+            raise ValueError("A parte ultrapassa o tamanho declarado do arquivo.")
+        if offset + tamanho_parte < sessao.tamanho and tamanho_parte < parte_minima(sessao):
+            raise ValueError(
+                f"Partes intermediárias devem ter ao menos {parte_minima(sessao) // (1024 * 1024)} MB."
+            )
+        if sessao.gravacao and sessao.gravando_ate and sessao.gravando_ate > agora:
+            raise SessaoOcupada("Outra parte desta sessão está sendo recebida; tente novamente em instantes.")
+        reserva = uuid.uuid4()
+        sessao.gravacao = reserva
+        sessao.gravando_ate = agora + timedelta(seconds=PARTE_TIMEOUT)
+        sessao.save(update_fields=["gravacao", "gravando_ate", "atualizado_em"])
+
+    storage = default_storage
+    parte = None
+    try:
+        # Até 1 MB em memória; o restante da parte vai para disco temporário
+        with tempfile.SpooledTemporaryFile(max_size=TAMANHO_BLOCO) as conteudo:
+            h = hashlib.sha256()
+            gravados = 0
+            while gravados < tamanho_parte:
+                bloco = fluxo.read(min(TAMANHO_BLOCO, tamanho_parte - gravados))
+                if not bloco:
+                    break
+                h.update(bloco)
+                conteudo.write(bloco)
+                gravados += len(bloco)
+            if gravados != tamanho_parte or (hash_parte and h.hexdigest() != hash_parte.strip().lower()):
+                raise ValueError(f"Parte incompleta ou corrompida; reenvie a partir do byte {offset}.")
+            conteudo.seek(0)
+            parte = _gravar_parte(storage, sessao, len(sessao.partes) + 1, reserva, conteudo, gravados)
+
+        with transaction.atomic():
+            sessao = _travar_sessao(sessao_id, usuario_id, nowait=False)
+            if sessao.gravacao != reserva or sessao.recebido != offset:
+                # A reserva venceu e outra requisição assumiu a parte
+                _descartar_parte(storage, parte)
+                raise OffsetInvalido(sessao.recebido)
+            sessao.partes = [*sessao.partes, parte]
+            sessao.recebido = offset + gravados
+            sessao.gravacao = None
+            sessao.gravando_ate = None
+            sessao.save(update_fields=["partes", "recebido", "gravacao", "gravando_ate", "atualizado_em"])
+    except BaseException:
+        _liberar_gravacao(sessao_id, reserva)
+        raise
+    return sessao
+
+
+class _Concatenacao:
+    """Leitura sequencial das partes gravadas no storage, calculando o SHA-256."""
+
+    def __init__(self, storage, partes, nome):
+        self._storage = storage
+        self._pendentes = [p["nome"] for p in partes]
+        self._atual = None
+        self.name = nome
+        self.size = sum(p["tamanho"] for p in partes)
+        self.hash = hashlib.sha256()
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            return b"".join(iter(lambda: self.read(TAMANHO_BLOCO), b""))
+        while True:
+            if self._atual is None:
+                if not self._pendentes:
+                    return b""
+                self._atual = self._storage.open(self._pendentes.pop(0), "rb")
+            dados = self._atual.read(n)
+            if dados:
+                self.hash.update(dados)
+                return dados
+            self.close()
+
+    def close(self):
+        if self._atual is not None:
+            self._atual.close()
+            self._atual = None
+
+
+def _remover_partes(storage, partes):
+    for parte in partes:
+        _descartar_parte(storage, parte)
+
+
+def finalizar_sessao(sessao_id, usuario_id, modelo):
+    """
+    Junta as partes no storage (no bucket, completa o multipart upload; no
+    disco, concatena os arquivos das partes no prefixo do 'modelo') e
+    confere o SHA-256 em uma leitura em blocos. Idempotente para sessões
+    já concluídas.
+    """
+    storage = default_storage
+    with transaction.atomic():
+        sessao = _travar_sessao(sessao_id, usuario_id)
+        if sessao.status != "recebendo":
+            return sessao
+        if sessao.recebido != sessao.tamanho:
+            raise OffsetInvalido(sessao.recebido)
+
+        partes = sessao.partes
+        if sessao.upload_id:
+            _cliente(storage).complete_multipart_upload(
+                Bucket=storage.bucket_name,
+                Key=_chave_s3(storage, sessao.chave),
+                UploadId=sessao.upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": p["numero"], "ETag": p["etag"]} for p in partes]},
+            )
+            chave = sessao.chave
+            corpo = abrir_leitura(chave, storage)
+            try:
+                calculado = sha256(corpo)
+            finally:
+                corpo.close()
+        else:
+            juncao = _Concatenacao(storage, partes, sessao.nome)
+            try:
+                chave = storage.save(f"{_prefixo(modelo)}{uuid.uuid4().hex}/{sessao.nome}", File(juncao))
+            finally:
+                juncao.close()
+            calculado = juncao.hash.hexdigest()
+
+        corrompido = bool(sessao.arquivo_hash) and calculado != sessao.arquivo_hash
+        if corrompido:
+            # Conteúdo corrompido em algum ponto: recomeça do zero
+            storage.delete(chave)
+            if sessao.upload_id:
+                sessao.upload_id = _iniciar_multipart(storage, sessao)
+            sessao.partes = []
+            sessao.recebido = 0
+            sessao.save(update_fields=["upload_id", "partes", "recebido", "atualizado_em"])
+        else:
+            sessao.chave = chave
+            sessao.arquivo_hash = calculado
+            sessao.status = "concluida"
+            sessao.upload_id = None
+            sessao.partes = []
+            sessao.save(update_fields=["chave", "arquivo_hash", "status", "upload_id", "partes", "atualizado_em"])
+        transaction.on_commit(lambda: _remover_partes(storage, partes))
+
+    if corrompido:
+        raise ValueError("Hash do arquivo não confere; o upload foi reiniciado.")
+    return sessao
+
+
+def anexar_sessao(sessao_id, usuario_id, tipo):
+    """
+    Marca a sessão concluída como anexada (uma única vez) e devolve
+    (chave, nome, hash) para gravar no FileField.
+    """
+    try:
+        uuid.UUID(str(sessao_id))
+    except ValueError:
+        raise ValueError("Sessão de upload inválida.")
+    filtro = {"pk": sessao_id, "usuario_id": usuario_id, "tipo": tipo}
+    if not SessaoUpload.objects.filter(status="concluida", **filtro).update(status="anexada"):
+        raise ValueError("Sessão de upload não encontrada, não concluída ou já anexada a outro documento.")
+    sessao = SessaoUpload.objects.get(**filtro)
+    return sessao.chave, sessao.nome, sessao.arquivo_hash
+
+
+def cancelar_sessao(sessao):
+    """Remove a sessão, as partes e o arquivo concluído que não chegou a ser anexado."""
+    storage = default_storage
+    if sessao.status == "recebendo":
+        if sessao.upload_id:
+            _abortar_multipart(storage, sessao)
+        _remover_partes(storage, sessao.partes)
+    elif sessao.status == "concluida" and sessao.chave:
+        storage.delete(sessao.chave)
+    sessao.delete()
+
+
+def expurgar_sessoes(horas):
+    """
+    Cancela sessões paradas há mais de 'horas' e remove as anexadas antigas,
+    além das marcas de upload direto cujo token já venceu.
+    """
+    limite = timezone.now() - timedelta(hours=horas)
+    UploadAnexado.objects.filter(criado_em__lt=timezone.now() - timedelta(seconds=VALIDADE_UPLOAD * 4)).delete()
+    removidas = 0
+    for sessao in SessaoUpload.objects.filter(atualizado_em__lt=limite).iterator():
+        if sessao.status == "anexada":
+            sessao.delete()
+        else:
+            cancelar_sessao(sessao)
+        removidas += 1
+    return removidas
+
+
+# ============================================================
+# ⬇️ LEITURA
+# ============================================================
+
+class _LeituraS3:
+    """Corpo de um objeto do bucket lido em fluxo; seek(0) reabre o objeto."""
+
+    def __init__(self, storage, nome):
+        self._storage = storage
+        self.name = os.path.basename(nome)
+        self._chave = _chave_s3(storage, nome)
+        self._corpo = None
+
+    def _abrir(self):
+        resp = _cliente(self._storage).get_object(Bucket=self._storage.bucket_name, Key=self._chave)
+        self._corpo = resp["Body"]
+
+    def read(self, n=-1):
+        if self._corpo is None:
+            self._abrir()
+        return self._corpo.read(None if n is None or n < 0 else n)
+
+    def seek(self, posicao, whence=0):
+        if posicao != 0 or whence != 0:
+            raise OSError("Leitura em fluxo do armazenamento só volta ao início.")
+        self.close()
+
+    def close(self):
+        if self._corpo is not None:
+            self._corpo.close()
+            self._corpo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def abrir_leitura(arquivo, storage=None):
+    """
+    Arquivo (FieldFile ou nome no storage) aberto para leitura sequencial.
+    No bucket, lê o objeto em fluxo (o S3File do django-storages baixaria
+    tudo para um arquivo temporário antes do primeiro read).
+    """
+    nome = getattr(arquivo, "name", arquivo)
+    storage = storage or getattr(arquivo, "storage", None) or default_storage
+    if usa_s3(storage):
+        return _LeituraS3(storage, nome)
+    return storage.open(nome, "rb")
+
+
+def url_leitura(arquivo, nome_download, como_anexo=False, content_type=None):
+    """URL pré-assinada do bucket para baixar o arquivo (só com S3)."""
+    parametros = {"ResponseContentDisposition": content_disposition_header(como_anexo, nome_download)}
+    if content_type:
+        parametros["ResponseContentType"] = content_type
+    return arquivo.storage.url(arquivo.name, parameters=parametros)
+
+
+# ============================================================
+# 📨 CORPO MULTIPART EM FLUXO (envio ao PNCP)
+# ============================================================
+
+class CorpoMultipart:
+    """
+    multipart/form-data com um único arquivo, gerado sob demanda.
+
+    O requests monta 'files=' inteiro em memória; este corpo informa o
+    tamanho (Content-Length) e entrega o arquivo em blocos. Um FieldFile é
+    lido do armazenamento em fluxo (abrir_leitura) e fechado ao terminar.
+    seek(0) permite reenviar na próxima base do PNCP.
+    """
+
+    def __init__(self, campo, arquivo, content_type="application/pdf"):
+        self._origem = arquivo
+        self._do_storage = hasattr(arquivo, "storage") and hasattr(arquivo, "field")
+        self._fonte = None
+        self.boundary = uuid.uuid4().hex
+        nome = os.path.basename(getattr(arquivo, "name", "") or "") or "documento.pdf"
+        self._inicio = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{campo}"; filename="{nome.replace(chr(34), "")}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._fim = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._total = len(self._inicio) + _tamanho(arquivo) + len(self._fim)
+        self.seek(0)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._total
+
+    def seek(self, posicao, whence=0):
+        if posicao != 0 or whence != 0:
+            raise OSError("CorpoMultipart só volta ao início.")
+        self.close()
+        self._partes = [self._inicio, None, self._fim]
+
+    def close(self):
+        if self._fonte is not None and self._do_storage:
+            self._fonte.close()
+        self._fonte = None
+
+    def _ler_arquivo(self, n):
+        if self._fonte is None:
+            if self._do_storage:
+                self._fonte = abrir_leitura(self._origem)
+            else:
+                if hasattr(self._origem, "seek"):
+                    self._origem.seek(0)
+                self._fonte = self._origem
+        dados = self._fonte.read(n)
+        if not dados:
+            self.close()
+        return dados
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            return b"".join(iter(lambda: self.read(TAMANHO_BLOCO), b""))
+        while self._partes:
+            parte = self._partes[0]
+            if parte is None:
+                dados = self._ler_arquivo(n)
+                if dados:
+                    return dados
+                self._partes.pop(0)
+                continue
+            self._partes.pop(0)
+            if len(parte) > n:
+                self._partes.insert(0, parte[n:])
+                return parte[:n]
+            return parte
+        return b""
+
+    def __iter__(self):
+        return iter(lambda: self.read(TAMANHO_BLOCO), b"")
+
+
+def _tamanho(arquivo):
+    tamanho = getattr(arquivo, "size", None)
+    if tamanho is not None:
+        return tamanho
+    atual = arquivo.tell()
+    arquivo.seek(0, os.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(atual)
+    return tamanho
@@ -0,0 +1,138 @@
+# api/autocomplete.py
+"""
+Autocomplete de usuários e fornecedores (campos de busca digitados tecla a
+tecla no frontend).
+
+- Uma única consulta por busca: icontains nos campos de texto, com os
+  resultados que começam pelo termo ordenados antes dos que só o contêm.
+  No Postgres essas buscas usam índices trigram (pg_trgm) criados na
+  migração 0019; nos demais bancos caem em varredura, o que só importa
+  em desenvolvimento.
+- Escopo por entidade via EXISTS na tabela de vínculo (sem JOIN + DISTINCT).
+- Resultados em cache por escopo de entidades + termo, com TTL curto
+  (settings.AUTOCOMPLETE_CACHE_SEGUNDOS): usuários da mesma entidade
+  digitando o mesmo prefixo reaproveitam a resposta, e o TTL limita o quanto
+  um cadastro novo demora a aparecer.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+
+from .models import CustomUser, EntidadeFornecedor, Fornecedor
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 50
+TTL = getattr(settings, "AUTOCOMPLETE_CACHE_SEGUNDOS", 30)
+
+
+def normalizar_termo(termo):
+    return " ".join((termo or "").split()).lower()
+
+
+def ler_limite(valor):
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return LIMITE_PADRAO
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _chave(tipo, escopo, termo, limite):
+    # Termo vai em hash: chaves curtas e sem caracteres problemáticos p/ memcached
+    resumo = hashlib.sha1(termo.encode("utf-8")).hexdigest()[:16]
+    return f"autocomplete:{tipo}:{escopo}:{limite}:{resumo}"
+
+
+def _escopo(entidade_ids):
+    """Identificador estável do conjunto de entidades (None = sem restrição)."""
+    if entidade_ids is None:
+        return "todas"
+    return "e" + "-".join(str(e) for e in sorted(set(entidade_ids)))
+
+
+def _em_cache(tipo, escopo, termo, limite, consultar):
+    chave = _chave(tipo, escopo, termo, limite)
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = consultar()
+        cache.set(chave, resultado, TTL)
+    return resultado
+
+
+def _ranquear(qs, termo, campos):
+    """Filtra por icontains em qualquer campo; prefixo vem antes de substring."""
+    if not termo:
+        return qs.annotate(_rank=Value(0, output_field=IntegerField()))
+    contem = Q()
+    prefixo = Q()
+    for campo in campos:
+        contem |= Q(**{f"{campo}__icontains": termo})
+        prefixo |= Q(**{f"{campo}__istartswith": termo})
+    return qs.filter(contem).annotate(
+        _rank=Case(When(prefixo, then=Value(0)), default=Value(1), output_field=IntegerField())
+    )
+
+
+# ============================================================
+# 👤 USUÁRIOS
+# ============================================================
+
+def buscar_usuarios(termo, entidade_ids=None, *, usuario_id=None, limite=LIMITE_PADRAO):
+    """
+    Usuários que pertencem a alguma das entidades (None = todos). Com
+    entidade_ids vazio, só o próprio usuario_id (mesmo comportamento de
+    antes para usuários sem entidade).
+    """
+    termo = normalizar_termo(termo)
+    escopo = _escopo(entidade_ids) if entidade_ids != [] else f"u{usuario_id}"
+
+    def consultar():
+        qs = CustomUser.objects.all()
+        if entidade_ids is not None:
+            if entidade_ids:
+                qs = qs.filter(
+                    Exists(
+                        CustomUser.entidades.through.objects.filter(
+                            customuser_id=OuterRef("pk"), entidade_id__in=entidade_ids
+                        )
+                    )
+                )
+            else:
+                qs = qs.filter(pk=usuario_id)
+        qs = _ranquear(qs, termo, ("username", "first_name", "last_name"))
+        return [
+            {"id": u.id, "username": u.username, "nome": u.get_full_name() or u.username}
+            for u in qs.order_by("_rank", "username").only("id", "username", "first_name", "last_name")[:limite]
+        ]
+
+    return _em_cache("usuarios", escopo, termo, limite, consultar)
+
+
+# ============================================================
+# 🏭 FORNECEDORES
+# ============================================================
+
+def buscar_fornecedores(termo, entidade_ids=None, *, limite=LIMITE_PADRAO):
+    """Fornecedores que participam de processos das entidades (None = todos)."""
+    termo = normalizar_termo(termo)
+
+    def consultar():
+        qs = Fornecedor.objects.all()
+        if entidade_ids is not None:
+            qs = qs.filter(
+                Exists(
+                    EntidadeFornecedor.objects.filter(
+                        fornecedor_id=OuterRef("pk"), entidade_id__in=entidade_ids
+                    )
+                )
+            )
+        qs = _ranquear(qs, termo, ("razao_social", "nome_fantasia", "cnpj"))
+        return list(
+            qs.order_by("_rank", "razao_social")
+            .values("id", "cnpj", "razao_social", "nome_fantasia")[:limite]
+        )
+
+    return _em_cache("fornecedores", _escopo(entidade_ids), termo, limite, consultar)
@@ -0,0 +1,278 @@
+# api/downloads.py
+"""
+Download autenticado dos arquivos enviados (documentos PNCP, de contratos,
+de atas e arquivos do usuário).
+
+A view confere a permissão (mesmo escopo por entidade dos ViewSets) e:
+
+- com settings.DOWNLOAD_SERVIDOR configurado, só devolve o cabeçalho de
+  repasse (X-Accel-Redirect / X-Sendfile / X-LiteSpeed-Location) e o
+  servidor da frente transmite o arquivo, com Range e cache condicionais
+  próprios; o Python não lê nenhum byte;
+- sem ele, o Django transmite em blocos (FileResponse; sob ASGI, um
+  gerador assíncrono, ver api/streaming.py), com suporte a Range (um
+  intervalo, 206/416) e a If-None-Match/If-Modified-Since/If-Range;
+- com armazenamento em bucket S3/compatível (api/armazenamento.py),
+  redireciona para uma URL pré-assinada e o próprio bucket transmite.
+
+A ETag segue o formato do nginx (mtime-tamanho em hexadecimal), para que
+revalidações continuem valendo ao ligar/desligar o repasse.
+
+Como <a href> e visualizadores de PDF não enviam o cabeçalho Authorization,
+os serializers expõem arquivo_url como URL assinada (django.core.signing),
+ligada ao usuário e com validade de settings.DOWNLOAD_URL_VALIDADE_SEGUNDOS.
+A permissão é conferida de novo a cada download.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+from . import armazenamento, streaming
+from .models import ArquivoUser, DocumentoAtaRegistroPrecos, DocumentoContrato, DocumentoPNCP
+
+SERVIDOR = getattr(settings, "DOWNLOAD_SERVIDOR", "")
+PREFIXO_INTERNO = getattr(settings, "DOWNLOAD_PREFIXO_INTERNO", "/media-protegida/")
+VALIDADE = getattr(settings, "DOWNLOAD_URL_VALIDADE_SEGUNDOS", 3600)
+TAMANHO_BLOCO = 64 * 1024
+SALT = "api.downloads"
+
+# Documentos ativos e não removidos, como nas listagens
+_DOCUMENTO_VIGENTE = Q(ativo=True) & ~Q(status="removido")
+
+# Tipo na URL -> (modelo, caminho até a entidade, filtro fixo).
+# Caminho None = arquivo pessoal, só o dono baixa.
+TIPOS = {
+    "documentos-pncp": (DocumentoPNCP, "processo__entidade", _DOCUMENTO_VIGENTE),
+    "documentos-contratos": (DocumentoContrato, "contrato__processo__entidade", _DOCUMENTO_VIGENTE),
+    "documentos-atas": (DocumentoAtaRegistroPrecos, "ata__processo__entidade", _DOCUMENTO_VIGENTE),
+    "arquivos-user": (ArquivoUser, None, Q()),
+}
+
+
+# ============================================================
+# 🔒 PERMISSÃO
+# ============================================================
+
+def localizar(tipo, pk, usuario):
+    """Registro do arquivo se o usuário pode baixá-lo; None caso contrário."""
+    if tipo not in TIPOS:
+        return None
+    modelo, campo_entidade, filtro = TIPOS[tipo]
+    qs = modelo.objects.filter(filtro, pk=pk)
+    if campo_entidade is None:
+        qs = qs.filter(usuario=usuario)
+    elif not usuario.is_superuser:
+        qs = qs.filter(**{f"{campo_entidade}__in": usuario.entidades.values("id")})
+    return qs.first()
+
+
+# ============================================================
+# 🔗 URL ASSINADA
+# ============================================================
+
+def assinar(tipo, pk, usuario_id):
+    return signing.dumps([tipo, pk, usuario_id], salt=SALT, compress=True)
+
+
+def ler_assinatura(assinatura, tipo, pk):
+    """usuario_id da assinatura, se válida para este arquivo e no prazo; senão None."""
+    try:
+        tipo_assinado, pk_assinado, usuario_id = signing.loads(assinatura, salt=SALT, max_age=VALIDADE)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if tipo_assinado != tipo or pk_assinado != pk:
+        return None
+    return usuario_id
+
+
+def url_download(request, tipo, obj):
+    """
+    arquivo_url para os serializers: URL assinada do endpoint de download
+    quando há usuário na requisição; senão a URL do storage (uso interno).
+    """
+    arquivo = getattr(obj, "arquivo", None)
+    if not arquivo:
+        return None
+    usuario = getattr(request, "user", None)
+    if usuario is None or not usuario.is_authenticated:
+        try:
+            return arquivo.url
+        except Exception:
+            return None
+    url = reverse("arquivo-download", kwargs={"tipo": tipo, "pk": obj.pk})
+    url += "?assinatura=" + assinar(tipo, obj.pk, usuario.pk)
+    return request.build_absolute_uri(url)
+
+
+# ============================================================
+# 📦 RESPOSTA
+# ============================================================
+
+def _metadados(arquivo):
+    """(caminho local ou None, tamanho, mtime em segundos)."""
+    try:
+        caminho = arquivo.path
+    except NotImplementedError:
+        caminho = None
+    if caminho:
+        st = os.stat(caminho)
+        return caminho, st.st_size, int(st.st_mtime)
+    storage = arquivo.storage
+    try:
+        mtime = int(storage.get_modified_time(arquivo.name).timestamp())
+    except (NotImplementedError, OSError):
+        mtime = None
+    return None, arquivo.size, mtime
+
+
+def _etag(tamanho, mtime):
+    return f'"{mtime or 0:x}-{tamanho:x}"'
+
+
+def _intervalo(cabecalho, tamanho):
+    """
+    (inicio, fim) inclusivos do cabeçalho Range. None = arquivo inteiro
+    (sem Range, malformado ou com vários intervalos). ValueError = 416.
+    """
+    if not cabecalho or not cabecalho.startswith("bytes="):
+        return None
+    especificacoes = cabecalho[len("bytes="):].split(",")
+    if len(especificacoes) != 1:
+        # multipart/byteranges não é suportado: responde 200 com o arquivo todo
+        return None
+    inicio, separador, fim = especificacoes[0].strip().partition("-")
+    if not separador or not (inicio or fim):
+        return None
+    if (inicio and not inicio.isdigit()) or (fim and not fim.isdigit()):
+        return None
+
+    if not inicio:
+        # bytes=-N: os últimos N bytes
+        sufixo = int(fim)
+        if sufixo == 0 or tamanho == 0:
+            raise ValueError
+        return max(0, tamanho - sufixo), tamanho - 1
+
+    inicio = int(inicio)
+    fim = int(fim) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        raise ValueError
+    return inicio, min(fim, tamanho - 1)
+
+
+def _if_range_valido(request, etag, mtime):
+    valor = request.headers.get("If-Range")
+    if not valor:
+        return True
+    if valor.startswith('"') or valor.startswith("W/"):
+        return valor == etag  # comparação forte: ETag fraca nunca casa
+    return mtime is not None and valor == http_date(mtime)
+
+
+class _Trecho:
+    """Leitura limitada a um intervalo do arquivo (sem fileno: não cai no sendfile do arquivo todo)."""
+
+    def __init__(self, arquivo, inicio, tamanho):
+        self._arquivo = arquivo
+        self._restante = tamanho
+        arquivo.seek(inicio)
+
+    def read(self, n=-1):
+        if self._restante <= 0:
+            return b""
+        if n is None or n < 0 or n > self._restante:
+            n = self._restante
+        dados = self._arquivo.read(n)
+        self._restante -= len(dados)
+        return dados
+
+    def close(self):
+        self._arquivo.close()
+
+
+def _nome(obj):
+    return getattr(obj, "arquivo_nome", None) or os.path.basename(obj.arquivo.name)
+
+
+def _repasse(caminho, nome_storage):
+    """Cabeçalho para o servidor da frente, ou None se não houver repasse."""
+    if SERVIDOR == "apache" and caminho:
+        return "X-Sendfile", caminho
+    uri = PREFIXO_INTERNO.rstrip("/") + "/" + quote(nome_storage)
+    if SERVIDOR == "nginx" and caminho:
+        return "X-Accel-Redirect", uri
+    if SERVIDOR == "litespeed" and caminho:
+        return "X-LiteSpeed-Location", uri
+    return None
+
+
+def resposta_arquivo(request, obj, como_anexo=False):
+    """Resposta de download para um registro com FileField 'arquivo' já autorizado."""
+    arquivo = obj.arquivo
+    if armazenamento.usa_s3(arquivo.storage):
+        nome = _nome(obj)
+        content_type = mimetypes.guess_type(nome)[0]
+        return HttpResponseRedirect(armazenamento.url_leitura(arquivo, nome, como_anexo, content_type))
+
+    caminho, tamanho, mtime = _metadados(arquivo)
+    etag = _etag(tamanho, mtime)
+
+    condicional = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if condicional is not None:
+        return condicional
+
+    nome = _nome(obj)
+    content_type = mimetypes.guess_type(nome)[0] or "application/octet-stream"
+    repasse = _repasse(caminho, arquivo.name)
+
+    if repasse:
+        # O servidor da frente trata Range/condicionais e transmite o arquivo
+        response = HttpResponse(content_type=content_type)
+        response[repasse[0]] = repasse[1]
+    else:
+        try:
+            intervalo = _intervalo(request.headers.get("Range"), tamanho)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{tamanho}"
+            return response
+        if intervalo and not _if_range_valido(request, etag, mtime):
+            intervalo = None
+
+        aberto = arquivo.storage.open(arquivo.name, "rb")
+        if intervalo:
+            inicio, fim = intervalo
+            leitura = _Trecho(aberto, inicio, fim - inicio + 1)
+            status_resposta = 206
+        else:
+            leitura = aberto
+            status_resposta = 200
+        if streaming.sob_asgi(request):
+            blocos = streaming.blocos_arquivo(leitura, TAMANHO_BLOCO)
+            response = StreamingHttpResponse(
+                streaming.conteudo(request, blocos), content_type=content_type, status=status_resposta
+            )
+        else:
+            response = FileResponse(leitura, content_type=content_type, status=status_resposta)
+        if intervalo:
+            response["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+            response["Content-Length"] = str(fim - inicio + 1)
+        else:
+            response["Content-Length"] = str(tamanho)
+        response["Accept-Ranges"] = "bytes"
+
+    response["Content-Disposition"] = content_disposition_header(como_anexo, nome)
+    response["ETag"] = etag
+    if mtime is not None:
+        response["Last-Modified"] = http_date(mtime)
+    response["Cache-Control"] = "private, no-cache"
+    return response
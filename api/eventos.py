@@ -0,0 +1,316 @@
+# api/eventos.py
+"""
+Eventos em tempo real (Server-Sent Events) por usuário: novas notificações
+e andamento das tarefas em segundo plano.
+
+Uma conexão por aba (/api/eventos/) substitui o polling de notificações.
+O stream é servido por uma view assíncrona e precisa de um servidor ASGI
+(uvicorn/daphne) para não prender um worker WSGI por conexão.
+
+A distribuição dos eventos passa por um broker configurável em
+settings.EVENTOS_BROKER:
+
+- "banco" (padrão): um único laço por processo consulta o banco a cada
+  EVENTOS_INTERVALO_SEGUNDOS para todos os usuários conectados (uma consulta
+  de notificações + uma de tarefas, independente do número de abas) e
+  distribui os resultados. Funciona com vários workers/servidores.
+- "memoria": publicação direta em memória a partir de quem grava (views,
+  tarefas). Sem consultas periódicas, mas só alcança conexões do mesmo
+  processo; serve para desenvolvimento e instalações de um worker.
+- caminho pontilhado para outra classe com a mesma interface.
+
+O id dos eventos de notificação é o id da Notificacao: ao reconectar, o
+navegador envia Last-Event-ID e as notificações perdidas são reenviadas.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Notificacao, TarefaProcessamento
+from .serializers import NotificacaoSerializer, TarefaProcessamentoSerializer
+
+logger = logging.getLogger("api")
+
+INTERVALO = getattr(settings, "EVENTOS_INTERVALO_SEGUNDOS", 2)
+HEARTBEAT = getattr(settings, "EVENTOS_HEARTBEAT_SEGUNDOS", 15)
+DURACAO_MAXIMA = getattr(settings, "EVENTOS_DURACAO_MAXIMA_SEGUNDOS", 300)
+REENVIO_MAXIMO = 100
+LOTE_CONSULTA = 500
+TAMANHO_FILA = 1000
+
+
+# ============================================================
+# 🧾 CONSULTAS / SERIALIZAÇÃO
+# ============================================================
+
+def _notificacoes(filtro, limite=None):
+    qs = (
+        Notificacao.objects.filter(**filtro)
+        .select_related("ator", "anotacao")
+        .order_by("id")
+    )
+    if limite:
+        qs = qs[:limite]
+    return [("notificacao", n.usuario_id, n.id, NotificacaoSerializer(n).data) for n in qs]
+
+
+def _tarefas(filtro):
+    qs = TarefaProcessamento.objects.filter(**filtro).order_by("atualizado_em")
+    return [("tarefa", t.usuario_id, None, TarefaProcessamentoSerializer(t).data) for t in qs]
+
+
+def _maior_id():
+    close_old_connections()
+    return Notificacao.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _estado_inicial(usuario_id, ultimo_id):
+    """Notificações perdidas desde Last-Event-ID (ou só o id mais recente)."""
+    close_old_connections()
+    if ultimo_id is None:
+        maior = (
+            Notificacao.objects.filter(usuario_id=usuario_id)
+            .order_by("-id").values_list("id", flat=True).first()
+        )
+        return maior or 0, []
+    perdidas = _notificacoes({"usuario_id": usuario_id, "id__gt": ultimo_id}, limite=REENVIO_MAXIMO)
+    return (perdidas[-1][2] if perdidas else ultimo_id), perdidas
+
+
+def formatar(evento):
+    """Evento no formato text/event-stream."""
+    tipo, _usuario_id, evento_id, dados = evento
+    linhas = []
+    if evento_id is not None:
+        linhas.append(f"id: {evento_id}")
+    linhas.append(f"event: {tipo}")
+    linhas.append("data: " + json.dumps(dados, cls=JSONEncoder, ensure_ascii=False))
+    return "\n".join(linhas) + "\n\n"
+
+
+# ============================================================
+# 📡 BROKERS
+# ============================================================
+
+class _Assinatura:
+    def __init__(self, usuario_id, ultimo_id):
+        self.usuario_id = usuario_id
+        self.ultimo_id = ultimo_id
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self.tarefas_enviadas = {}
+
+    def entregar(self, evento):
+        """Enfileira o evento; pode ser chamado de qualquer thread."""
+        tipo, _usuario_id, evento_id, dados = evento
+        if tipo == "notificacao":
+            if evento_id <= self.ultimo_id:
+                return
+            self.ultimo_id = evento_id
+        elif tipo == "tarefa":
+            marca = (dados.get("atualizado_em"), dados.get("status"), dados.get("processados"))
+            if self.tarefas_enviadas.get(dados.get("id")) == marca:
+                return
+            self.tarefas_enviadas[dados.get("id")] = marca
+        self.loop.call_soon_threadsafe(self._colocar, evento)
+
+    def _colocar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            logger.warning("Fila de eventos cheia para o usuário %s; evento descartado.", self.usuario_id)
+
+
+class BrokerMemoria:
+    """Distribuição em memória, alimentada por notificacoes_criadas/tarefa_atualizada."""
+
+    def __init__(self):
+        self._assinaturas = set()
+
+    async def assinar(self, usuario_id, ultimo_id=None):
+        ultimo, perdidas = await sync_to_async(_estado_inicial, thread_sensitive=False)(usuario_id, ultimo_id)
+        assinatura = _Assinatura(usuario_id, ultimo_id if ultimo_id is not None else ultimo)
+        for evento in perdidas:
+            assinatura.entregar(evento)
+        self._assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        self._assinaturas.discard(assinatura)
+
+    def manter(self):
+        """Chamado a cada heartbeat; nada a fazer sem laço de consulta."""
+
+    def _distribuir(self, eventos):
+        for assinatura in list(self._assinaturas):
+            for evento in eventos:
+                if evento[1] == assinatura.usuario_id:
+                    assinatura.entregar(evento)
+
+    def notificacoes_criadas(self, notificacoes):
+        if self._assinaturas and notificacoes:
+            ids = [n.pk for n in notificacoes if n.pk]
+            self._distribuir(_notificacoes({"id__in": ids}))
+
+    def tarefa_atualizada(self, tarefa_id):
+        if self._assinaturas:
+            self._distribuir(_tarefas({"pk": tarefa_id}))
+
+
+class BrokerBancoDados(BrokerMemoria):
+    """
+    Um laço de consulta por processo, compartilhado por todas as conexões.
+
+    O laço guarda a marca d'água do broker (maior id de notificação já
+    buscado) e cada ciclo busca só o que veio depois dela, para todos os
+    assinantes; o ultimo_id de cada assinatura apenas decide o que ela
+    recebe. A recuperação do que um assinante perdeu antes de conectar fica
+    na consulta inicial da conexão (REENVIO_MAXIMO).
+    """
+
+    def __init__(self, intervalo=INTERVALO):
+        super().__init__()
+        self.intervalo = intervalo
+        self._laco = None
+        self._marca = None
+
+    async def assinar(self, usuario_id, ultimo_id=None):
+        # Lida antes do estado inicial: o que vier depois o laço entrega
+        marca = await sync_to_async(_maior_id, thread_sensitive=False)()
+        assinatura = await super().assinar(usuario_id, ultimo_id)
+        if self._marca is None:
+            self._marca = marca
+        elif self._marca > assinatura.ultimo_id:
+            # O laço já passou deste ponto: busca a lacuna só para este assinante
+            lacuna = await sync_to_async(_notificacoes, thread_sensitive=False)(
+                {"usuario_id": usuario_id, "id__gt": assinatura.ultimo_id, "id__lte": self._marca},
+                limite=REENVIO_MAXIMO,
+            )
+            for evento in lacuna:
+                assinatura.entregar(evento)
+        self.manter()
+        return assinatura
+
+    def manter(self):
+        # O laço morre com o event loop em que nasceu (ex.: servidor WSGI);
+        # qualquer conexão viva o recria no seu próprio loop
+        if self._laco is None or self._laco.done():
+            self._laco = asyncio.get_running_loop().create_task(self._consultar_periodicamente())
+
+    async def _consultar_periodicamente(self):
+        desde = timezone.now()
+        atrasado = False
+        while self._assinaturas:
+            # Lote cheio: ainda há notificações depois da marca, sem esperar
+            if not atrasado:
+                await asyncio.sleep(self.intervalo)
+            assinaturas = list(self._assinaturas)
+            if not assinaturas:
+                break
+            usuarios = {a.usuario_id for a in assinaturas}
+            if self._marca is None:
+                self._marca = min(a.ultimo_id for a in assinaturas)
+            inicio = timezone.now()
+            try:
+                notificacoes, tarefas = await sync_to_async(self._consultar, thread_sensitive=False)(
+                    usuarios, self._marca, desde - timedelta(seconds=self.intervalo)
+                )
+            except Exception:
+                logger.exception("Falha ao consultar eventos; nova tentativa no próximo ciclo.")
+                atrasado = False
+                continue
+            desde = inicio
+            atrasado = len(notificacoes) >= LOTE_CONSULTA
+            if notificacoes:
+                self._marca = max(self._marca, notificacoes[-1][2])
+            self._distribuir(notificacoes + tarefas)
+        # Sem assinantes: a próxima conexão recomeça do maior id atual
+        self._marca = None
+
+    @staticmethod
+    def _consultar(usuarios, marca, desde):
+        close_old_connections()
+        return (
+            _notificacoes({"usuario_id__in": usuarios, "id__gt": marca}, limite=LOTE_CONSULTA),
+            _tarefas({"usuario_id__in": usuarios, "atualizado_em__gte": desde}),
+        )
+
+    # A gravação no banco já é a publicação
+    def notificacoes_criadas(self, notificacoes):
+        pass
+
+    def tarefa_atualizada(self, tarefa_id):
+        pass
+
+
+BROKERS = {
+    "banco": BrokerBancoDados,
+    "memoria": BrokerMemoria,
+}
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        nome = getattr(settings, "EVENTOS_BROKER", "banco")
+        classe = BROKERS.get(nome) or import_string(nome)
+        _broker = classe()
+    return _broker
+
+
+# ============================================================
+# 📣 PUBLICAÇÃO (chamada por quem grava)
+# ============================================================
+
+def notificacoes_criadas(notificacoes):
+    try:
+        broker().notificacoes_criadas(notificacoes)
+    except Exception:
+        logger.exception("Falha ao publicar notificações; os clientes recebem na próxima reconexão.")
+
+
+def tarefa_atualizada(tarefa_id):
+    try:
+        broker().tarefa_atualizada(tarefa_id)
+    except Exception:
+        logger.exception("Falha ao publicar andamento da tarefa %s.", tarefa_id)
+
+
+# ============================================================
+# 🔁 STREAM
+# ============================================================
+
+async def stream(usuario_id, ultimo_id=None, expira_em=None):
+    """Gerador assíncrono de text/event-stream para o usuário."""
+    b = broker()
+    assinatura = await b.assinar(usuario_id, ultimo_id)
+    fim = asyncio.get_running_loop().time() + DURACAO_MAXIMA
+    if expira_em is not None:
+        fim = min(fim, asyncio.get_running_loop().time() + max(0, expira_em - timezone.now().timestamp()))
+    try:
+        # Reconexão do EventSource em 3 s quando o servidor encerra o stream
+        yield "retry: 3000\n\n"
+        while True:
+            restante = fim - asyncio.get_running_loop().time()
+            if restante <= 0:
+                break
+            try:
+                evento = await asyncio.wait_for(assinatura.fila.get(), timeout=min(HEARTBEAT, restante))
+            except asyncio.TimeoutError:
+                b.manter()
+                yield ": ping\n\n"
+                continue
+            yield formatar(evento)
+    finally:
+        b.cancelar(assinatura)
@@ -0,0 +1,246 @@
+# api/exportacao.py
+"""
+Exportação em streaming (CSV/XLSX) das grades de processos, itens e contratos.
+
+As linhas são produzidas por geradores sobre querysets com .iterator(), de
+modo que a memória não cresce com o volume exportado:
+
+- CSV: StreamingHttpResponse; o primeiro byte sai assim que o primeiro bloco
+  do cursor é lido.
+- XLSX: workbook openpyxl em modo write_only, gravado num arquivo temporário
+  (o formato é um ZIP e só pode ser fechado ao final) e devolvido com
+  FileResponse, em blocos.
+
+Sob ASGI os blocos saem por um gerador assíncrono (ver api/streaming.py).
+"""
+
+import csv
+import os
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from . import streaming
+
+from .choices import (
+    CATEGORIA_ITEM_CHOICES,
+    MODALIDADE_CHOICES,
+    SITUACAO_CHOICES,
+    SITUACAO_ITEM_CHOICES,
+)
+from .models import ItemFornecedor
+
+FORMATOS = ("csv", "xlsx")
+TAMANHO_BLOCO = 2000
+
+_SITUACOES_PROCESSO = dict(SITUACAO_CHOICES)
+_MODALIDADES = dict(MODALIDADE_CHOICES)
+_SITUACOES_ITEM = dict(SITUACAO_ITEM_CHOICES)
+_CATEGORIAS_ITEM = dict(CATEGORIA_ITEM_CHOICES)
+
+
+# ============================================================
+# 📤 RESPOSTAS
+# ============================================================
+
+class _Eco:
+    """Pseudo-buffer para o csv.writer: devolve a linha em vez de gravá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def _celula_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "Sim" if valor else "Não"
+    if isinstance(valor, Decimal):
+        # Planilhas em pt-BR esperam vírgula decimal
+        return str(valor).replace(".", ",")
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime("%d/%m/%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    return valor
+
+
+def _celula_xlsx(valor):
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        # Excel não guarda fuso horário
+        return timezone.localtime(valor).replace(tzinfo=None)
+    if isinstance(valor, bool):
+        return "Sim" if valor else "Não"
+    return valor
+
+
+def resposta_csv(request, nome_arquivo, cabecalho, linhas):
+    escritor = csv.writer(_Eco(), delimiter=";")
+
+    def gerar():
+        # BOM para o Excel reconhecer UTF-8
+        yield "\ufeff" + escritor.writerow(cabecalho)
+        for linha in linhas:
+            yield escritor.writerow([_celula_csv(v) for v in linha])
+
+    response = StreamingHttpResponse(streaming.conteudo(request, gerar()), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nome_arquivo}.csv"'
+    return response
+
+
+def resposta_xlsx(request, nome_arquivo, cabecalho, linhas):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=nome_arquivo[:31])
+    ws.append(cabecalho)
+    for linha in linhas:
+        ws.append([_celula_xlsx(v) for v in linha])
+
+    arquivo = tempfile.TemporaryFile()
+    wb.save(arquivo)
+    arquivo.seek(0)
+    content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if not streaming.sob_asgi(request):
+        return FileResponse(
+            arquivo,
+            as_attachment=True,
+            filename=f"{nome_arquivo}.xlsx",
+            content_type=content_type,
+        )
+
+    tamanho = os.fstat(arquivo.fileno()).st_size
+    response = StreamingHttpResponse(
+        streaming.conteudo(request, streaming.blocos_arquivo(arquivo)), content_type=content_type
+    )
+    response["Content-Length"] = str(tamanho)
+    response["Content-Disposition"] = content_disposition_header(True, f"{nome_arquivo}.xlsx")
+    return response
+
+
+def resposta_exportacao(request, formato, nome_arquivo, cabecalho, linhas):
+    if formato == "xlsx":
+        return resposta_xlsx(request, nome_arquivo, cabecalho, linhas)
+    return resposta_csv(request, nome_arquivo, cabecalho, linhas)
+
+
+# ============================================================
+# 📄 PROCESSOS
+# ============================================================
+
+CABECALHO_PROCESSOS = [
+    "ID", "Número do Processo", "Número do Certame", "Objeto", "Modalidade",
+    "Situação", "Data do Processo", "Data de Abertura", "Valor de Referência",
+    "Registro de Preço", "Entidade", "Órgão", "Ano PNCP", "Sequencial PNCP",
+]
+
+
+def linhas_processos(queryset):
+    campos = (
+        "id", "numero_processo", "numero_certame", "objeto", "modalidade",
+        "situacao", "data_processo", "data_abertura", "valor_referencia",
+        "registro_preco", "entidade__nome", "orgao__nome",
+        "pncp_ano_compra", "pncp_sequencial_compra",
+    )
+    for row in queryset.values_list(*campos).iterator(chunk_size=TAMANHO_BLOCO):
+        row = list(row)
+        row[4] = _MODALIDADES.get(row[4], row[4])
+        row[5] = _SITUACOES_PROCESSO.get(row[5], row[5])
+        yield row
+
+
+# ============================================================
+# 📋 ITENS (com propostas e vencedor)
+# ============================================================
+
+CABECALHO_ITENS = [
+    "Processo", "Nº Item", "Lote", "Descrição", "Especificação", "Unidade",
+    "Quantidade", "Valor Unitário Estimado", "Valor Total Estimado",
+    "Valor Homologado", "Situação", "Categoria", "CNPJ Vencedor",
+    "Fornecedor Vencedor", "Valor Vencedor", "Qtd. Propostas", "Propostas",
+]
+
+
+def linhas_itens(queryset):
+    """
+    Uma linha por item, com o vencedor e o resumo das propostas. O queryset
+    deve vir ordenado por processo; a numeração 1..N reinicia a cada processo.
+    """
+    propostas = Prefetch(
+        "propostas",
+        queryset=ItemFornecedor.objects.select_related("fornecedor").order_by("valor_proposto", "id"),
+    )
+    itens = (
+        queryset.select_related("processo", "lote", "fornecedor")
+        .prefetch_related(propostas)
+        .order_by("processo_id", "ordem", "id")
+        .iterator(chunk_size=TAMANHO_BLOCO)
+    )
+
+    processo_atual, numero = None, 0
+    for item in itens:
+        if item.processo_id != processo_atual:
+            processo_atual, numero = item.processo_id, 0
+        numero += 1
+
+        lista = list(item.propostas.all())
+        vencedora = next((p for p in lista if p.vencedor), None)
+        if vencedora:
+            fornecedor, valor_vencedor = vencedora.fornecedor, vencedora.valor_proposto
+        else:
+            fornecedor, valor_vencedor = item.fornecedor, item.valor_homologado
+
+        total = (
+            item.quantidade * item.valor_estimado
+            if item.quantidade is not None and item.valor_estimado is not None
+            else None
+        )
+        yield [
+            item.processo.numero_processo,
+            numero,
+            item.lote.numero if item.lote else None,
+            item.descricao,
+            item.especificacao,
+            item.unidade,
+            item.quantidade,
+            item.valor_estimado,
+            total.quantize(Decimal("0.01")) if total is not None else None,
+            item.valor_homologado,
+            _SITUACOES_ITEM.get(item.situacao_item),
+            _CATEGORIAS_ITEM.get(item.categoria_item),
+            fornecedor.cnpj if fornecedor else None,
+            fornecedor.razao_social if fornecedor else None,
+            valor_vencedor,
+            len(lista),
+            " | ".join(
+                f"{p.fornecedor.razao_social}: {_celula_csv(p.valor_proposto)}" for p in lista
+            ),
+        ]
+
+
+# ============================================================
+# 📑 CONTRATOS
+# ============================================================
+
+CABECALHO_CONTRATOS = [
+    "ID", "Processo", "Número", "Ano", "Tipo (ID)", "Objeto", "CNPJ/CPF Fornecedor",
+    "Valor Inicial", "Valor Global", "Data de Assinatura", "Vigência Início",
+    "Vigência Fim", "Status", "Nº Controle PNCP",
+]
+
+
+def linhas_contratos(queryset):
+    campos = (
+        "id", "processo__numero_processo", "numero_contrato_empenho", "ano_contrato",
+        "tipo_contrato_id", "objeto", "ni_fornecedor", "valor_inicial", "valor_global",
+        "data_assinatura", "data_vigencia_inicio", "data_vigencia_fim", "status",
+        "numero_controle_pncp",
+    )
+    yield from queryset.values_list(*campos).iterator(chunk_size=TAMANHO_BLOCO)
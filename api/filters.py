@@ -1,18 +1,91 @@
 # api/filters.py
+from django.db.models import Exists, OuterRef, Q
 from django_filters import rest_framework as filters
-from .models import ProcessoLicitatorio
+from .models import Fornecedor, Item, ItemFornecedor, Lote, ProcessoLicitatorio
 
 class ProcessoFilter(filters.FilterSet):
     # Filtro para buscar no campo 'objeto' ou 'numero_processo' (case-insensitive)
     search = filters.CharFilter(method='filter_by_search', label='Search')
+    # Alias usado pelo frontend para o campo 'registro_preco'
+    registro_precos = filters.BooleanFilter(field_name='registro_preco')
 
     class Meta:
         model = ProcessoLicitatorio
-        fields = ['modalidade', 'situacao', 'orgao', 'classificacao',  'registro_precos']
+        fields = ['modalidade', 'situacao', 'orgao', 'classificacao']
 
     def filter_by_search(self, queryset, name, value):
         # Q objects permitem buscas complexas com OR
-        from django.db.models import Q
         return queryset.filter(
             Q(objeto__icontains=value) | Q(numero_processo__icontains=value)
-        )
\ No newline at end of file
+        )
+
+# ============================================================
+# 📋 COLEÇÕES DO PROCESSO (itens / fornecedores / lotes)
+# ============================================================
+
+class ItemProcessoFilter(filters.FilterSet):
+    """Filtros de /processos/{id}/itens/ (o processo já vem fixado no queryset)."""
+
+    lote = filters.NumberFilter(field_name='lote_id')
+    lote_numero = filters.NumberFilter(field_name='lote__numero')
+    sem_lote = filters.BooleanFilter(field_name='lote', lookup_expr='isnull')
+    situacao_item = filters.BaseInFilter(field_name='situacao_item')
+    categoria_item = filters.BaseInFilter(field_name='categoria_item')
+    fornecedor_vencedor = filters.NumberFilter(method='filter_fornecedor_vencedor')
+    search = filters.CharFilter(field_name='descricao', lookup_expr='icontains')
+
+    ordering = filters.OrderingFilter(
+        fields=(
+            ('ordem', 'ordem'),
+            ('descricao', 'descricao'),
+            ('quantidade', 'quantidade'),
+            ('valor_estimado', 'valor_estimado'),
+            ('valor_homologado', 'valor_homologado'),
+            ('lote__numero', 'lote'),
+            ('situacao_item', 'situacao_item'),
+            ('id', 'id'),
+        )
+    )
+
+    class Meta:
+        model = Item
+        fields = []
+
+    def filter_fornecedor_vencedor(self, queryset, name, value):
+        # Proposta vencedora ou, na falta dela, o fornecedor definido no item
+        proposta_vencedora = ItemFornecedor.objects.filter(
+            item=OuterRef('pk'), fornecedor_id=value, vencedor=True
+        )
+        return queryset.filter(Q(Exists(proposta_vencedora)) | Q(fornecedor_id=value))
+
+
+class FornecedorProcessoFilter(filters.FilterSet):
+    search = filters.CharFilter(method='filter_by_search')
+    uf = filters.CharFilter(field_name='uf', lookup_expr='iexact')
+    porte = filters.CharFilter(field_name='porte')
+
+    ordering = filters.OrderingFilter(
+        fields=(('razao_social', 'razao_social'), ('cnpj', 'cnpj'), ('criado_em', 'criado_em'))
+    )
+
+    class Meta:
+        model = Fornecedor
+        fields = []
+
+    def filter_by_search(self, queryset, name, value):
+        return queryset.filter(
+            Q(razao_social__icontains=value)
+            | Q(nome_fantasia__icontains=value)
+            | Q(cnpj__icontains=value)
+        )
+
+
+class LoteProcessoFilter(filters.FilterSet):
+    numero = filters.NumberFilter(field_name='numero')
+    search = filters.CharFilter(field_name='descricao', lookup_expr='icontains')
+
+    ordering = filters.OrderingFilter(fields=(('numero', 'numero'), ('descricao', 'descricao')))
+
+    class Meta:
+        model = Lote
+        fields = []
@@ -0,0 +1,281 @@
+# api/limpeza_midia.py
+"""
+Coleta de arquivos órfãos no storage (MEDIA_ROOT ou bucket S3).
+
+Arquivos substituídos (ex.: novo upload de um documento de contrato) e
+uploads nunca anexados continuam no storage sem nenhum registro apontando
+para eles. A coleta:
+
+1. grava os nomes referenciados por todos os FileFields do app (e pelas
+   sessões de upload concluídas/anexadas) num conjunto em disco (SQLite
+   temporário), lendo as tabelas em fluxo: a memória não cresce com o
+   número de arquivos;
+2. percorre o storage nos prefixos dos upload_to, também em fluxo, e
+   consulta o conjunto em lotes;
+3. remove (ou move para quarentena/) os não referenciados mais antigos que
+   a carência, que protege uploads em andamento.
+
+Pensada para rodar periodicamente (cron: manage.py expurgar_midia_orfa).
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from . import armazenamento
+from .models import SessaoUpload
+
+PREFIXO_QUARENTENA = "quarentena/"
+TAMANHO_LOTE = 1000
+
+
+# ============================================================
+# 🗂️ CONJUNTO DE REFERÊNCIAS EM DISCO
+# ============================================================
+
+class ConjuntoEmDisco:
+    """Conjunto de strings num SQLite temporário (memória limitada ao cache do SQLite)."""
+
+    def __init__(self):
+        self._arquivo = tempfile.NamedTemporaryFile(prefix="midia_refs_", suffix=".sqlite3", delete=False)
+        self._arquivo.close()
+        self._conexao = sqlite3.connect(self._arquivo.name)
+        self._conexao.execute("PRAGMA journal_mode=OFF")
+        self._conexao.execute("PRAGMA synchronous=OFF")
+        self._conexao.execute("CREATE TABLE refs (nome TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def adicionar(self, nomes):
+        self._conexao.executemany("INSERT OR IGNORE INTO refs (nome) VALUES (?)", ((n,) for n in nomes))
+
+    def contidos(self, nomes):
+        """Subconjunto de 'nomes' presente no conjunto."""
+        nomes = list(nomes)
+        encontrados = set()
+        # Limite de parâmetros por consulta do SQLite
+        for i in range(0, len(nomes), 900):
+            parte = nomes[i:i + 900]
+            marcadores = ",".join("?" * len(parte))
+            encontrados.update(
+                linha[0] for linha in self._conexao.execute(f"SELECT nome FROM refs WHERE nome IN ({marcadores})", parte)
+            )
+        return encontrados
+
+    def __len__(self):
+        return self._conexao.execute("SELECT COUNT(*) FROM refs").fetchone()[0]
+
+    def fechar(self):
+        self._conexao.close()
+        os.unlink(self._arquivo.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def campos_de_arquivo():
+    """(modelo, nome do campo) de todos os FileFields/ImageFields do app."""
+    for modelo in apps.get_app_config("api").get_models():
+        for campo in modelo._meta.get_fields():
+            if isinstance(campo, models.FileField):
+                yield modelo, campo.name
+
+
+def prefixos_monitorados():
+    prefixos = set()
+    for modelo, nome in campos_de_arquivo():
+        upload_to = modelo._meta.get_field(nome).upload_to
+        if isinstance(upload_to, str) and upload_to:
+            prefixos.add(upload_to if upload_to.endswith("/") else upload_to + "/")
+    return sorted(prefixos)
+
+
+def carregar_referencias(conjunto, proteger_removidos=True, lote=TAMANHO_LOTE):
+    """
+    Preenche o conjunto com os nomes referenciados. proteger_removidos=False
+    deixa de proteger os arquivos de documentos excluídos logicamente
+    (ativo=False ou status="removido"), que passam a ser órfãos.
+    """
+    for modelo, nome in campos_de_arquivo():
+        qs = modelo._base_manager.exclude(**{nome: ""}).exclude(**{f"{nome}__isnull": True})
+        if not proteger_removidos:
+            campos = {f.name for f in modelo._meta.get_fields()}
+            removido = Q()
+            if "ativo" in campos:
+                removido |= Q(ativo=False)
+            if "status" in campos and "removido" in dict(modelo._meta.get_field("status").choices or ()):
+                removido |= Q(status="removido")
+            if removido:
+                qs = qs.exclude(removido)
+        conjunto.adicionar(qs.values_list(nome, flat=True).iterator(chunk_size=lote))
+
+    # Sessões ainda não expurgadas: o arquivo pode estar a caminho de um documento
+    conjunto.adicionar(
+        SessaoUpload.objects.filter(status__in=("concluida", "anexada"), chave__isnull=False)
+        .values_list("chave", flat=True).iterator(chunk_size=lote)
+    )
+
+
+# ============================================================
+# 🔎 VARREDURA DO STORAGE
+# ============================================================
+
+def _percorrer_local(storage, prefixo):
+    raiz = storage.path(prefixo)
+    pilha = [raiz]
+    while pilha:
+        diretorio = pilha.pop()
+        try:
+            entradas = os.scandir(diretorio)
+        except FileNotFoundError:
+            continue
+        with entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    pilha.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    st = entrada.stat()
+                    nome = os.path.relpath(entrada.path, storage.location).replace(os.sep, "/")
+                    modificado = datetime.fromtimestamp(st.st_mtime, tz=dt_timezone.utc)
+                    yield nome, st.st_size, modificado
+
+
+def _percorrer_s3(storage, prefixo):
+    cliente = storage.connection.meta.client
+    localizacao = storage._normalize_name(prefixo)
+    base = localizacao[: len(localizacao) - len(prefixo)]
+    paginas = cliente.get_paginator("list_objects_v2").paginate(Bucket=storage.bucket_name, Prefix=localizacao)
+    for pagina in paginas:
+        for objeto in pagina.get("Contents", ()):
+            yield objeto["Key"][len(base):], objeto["Size"], objeto["LastModified"]
+
+
+def percorrer(storage, prefixo):
+    """(nome, tamanho, modificado_em) de cada arquivo sob o prefixo, em fluxo."""
+    if armazenamento.usa_s3(storage):
+        return _percorrer_s3(storage, prefixo)
+    return _percorrer_local(storage, prefixo)
+
+
+def _mover_para_quarentena(storage, nome, data):
+    destino = f"{PREFIXO_QUARENTENA}{data:%Y%m%d}/{nome}"
+    if armazenamento.usa_s3(storage):
+        cliente = storage.connection.meta.client
+        origem = storage._normalize_name(nome)
+        cliente.copy_object(
+            Bucket=storage.bucket_name,
+            Key=storage._normalize_name(destino),
+            CopySource={"Bucket": storage.bucket_name, "Key": origem},
+        )
+        cliente.delete_object(Bucket=storage.bucket_name, Key=origem)
+    else:
+        caminho = storage.path(destino)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        os.replace(storage.path(nome), caminho)
+    return destino
+
+
+# ============================================================
+# 🧹 COLETA
+# ============================================================
+
+class Relatorio:
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.referencias = 0
+        self.verificados = 0
+        self.bytes_verificados = 0
+        self.orfaos = 0
+        self.bytes_orfaos = 0
+        self.em_carencia = 0
+        self.falhas = 0
+
+    @property
+    def duracao(self):
+        return time.monotonic() - self.inicio
+
+    def resumo(self):
+        duracao = max(self.duracao, 1e-6)
+        return (
+            f"{self.verificados} arquivo(s) verificados ({self.bytes_verificados / 1048576:.1f} MB) "
+            f"em {duracao:.1f}s ({self.verificados / duracao:.0f} arquivos/s, "
+            f"{self.bytes_verificados / 1048576 / duracao:.1f} MB/s); "
+            f"{self.referencias} referência(s); "
+            f"{self.orfaos} órfão(s) ({self.bytes_orfaos / 1048576:.1f} MB); "
+            f"{self.em_carencia} órfão(s) recente(s) mantido(s) pela carência; "
+            f"{self.falhas} falha(s)."
+        )
+
+
+def coletar_orfaos(
+    *,
+    carencia_horas=24,
+    quarentena=False,
+    dry_run=False,
+    proteger_removidos=True,
+    prefixos=None,
+    storage=None,
+    ao_encontrar=None,
+    lote=TAMANHO_LOTE,
+):
+    """
+    Remove (ou move para quarentena/) arquivos sem referência mais antigos
+    que a carência (pela data de modificação no storage). dry_run só
+    relata. ao_encontrar(nome, tamanho, acao) é chamado para cada órfão
+    (para log detalhado). Devolve o Relatorio.
+    """
+    storage = storage or default_storage
+    relatorio = Relatorio()
+    limite = timezone.now() - timedelta(hours=carencia_horas)
+    agora = timezone.now()
+
+    with ConjuntoEmDisco() as referenciados:
+        carregar_referencias(referenciados, proteger_removidos=proteger_removidos, lote=lote)
+        relatorio.referencias = len(referenciados)
+
+        def processar(bloco):
+            presentes = referenciados.contidos(nome for nome, _, _ in bloco)
+            for nome, tamanho, modificado in bloco:
+                if nome in presentes:
+                    continue
+                if modificado > limite:
+                    relatorio.em_carencia += 1
+                    continue
+                acao = "simulado" if dry_run else ("quarentena" if quarentena else "removido")
+                if not dry_run:
+                    try:
+                        if quarentena:
+                            _mover_para_quarentena(storage, nome, agora)
+                        else:
+                            storage.delete(nome)
+                    except Exception:
+                        relatorio.falhas += 1
+                        acao = "falha"
+                if acao != "falha":
+                    relatorio.orfaos += 1
+                    relatorio.bytes_orfaos += tamanho
+                if ao_encontrar:
+                    ao_encontrar(nome, tamanho, acao)
+
+        for prefixo in prefixos or prefixos_monitorados():
+            bloco = []
+            for nome, tamanho, modificado in percorrer(storage, prefixo):
+                relatorio.verificados += 1
+                relatorio.bytes_verificados += tamanho
+                bloco.append((nome, tamanho, modificado))
+                if len(bloco) >= lote:
+                    processar(bloco)
+                    bloco = []
+            if bloco:
+                processar(bloco)
+
+    return relatorio
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.sincronizacao import RETENCAO, expurgar_registros_exclusao
+
+
+class Command(BaseCommand):
+    help = "Remove registros de exclusão do feed de sincronização além do período de retenção."
+
+    def handle(self, *args, **options):
+        removidos = expurgar_registros_exclusao()
+        self.stdout.write(
+            self.style.SUCCESS(f"{removidos} registro(s) removido(s) (retenção: {RETENCAO.days} dias).")
+        )
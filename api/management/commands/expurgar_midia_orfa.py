@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.limpeza_midia import coletar_orfaos
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove (ou move para quarentena/) arquivos do storage que nenhum registro referencia "
+        "e que são mais antigos que a carência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=getattr(settings, "MIDIA_ORFA_CARENCIA_HORAS", 24),
+            help="Idade mínima (em horas desde a última modificação) dos arquivos órfãos tratados.",
+        )
+        parser.add_argument(
+            "--quarentena",
+            action="store_true",
+            default=getattr(settings, "MIDIA_ORFA_QUARENTENA", False),
+            help="Move os órfãos para quarentena/AAAAMMDD/ em vez de removê-los.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas relata os órfãos, sem remover nem mover nada.",
+        )
+        parser.add_argument(
+            "--incluir-removidos",
+            action="store_true",
+            help="Trata como órfãos também os arquivos de documentos excluídos logicamente (ativo=False/removido).",
+        )
+        parser.add_argument(
+            "--prefixo",
+            action="append",
+            dest="prefixos",
+            help="Limita a varredura a este prefixo (pode repetir). Padrão: os upload_to dos modelos.",
+        )
+
+    def handle(self, *args, **options):
+        detalhar = options["verbosity"] >= 2
+
+        def ao_encontrar(nome, tamanho, acao):
+            if detalhar:
+                self.stdout.write(f"  [{acao}] {nome} ({tamanho} bytes)")
+
+        relatorio = coletar_orfaos(
+            carencia_horas=options["horas"],
+            quarentena=options["quarentena"],
+            dry_run=options["dry_run"],
+            proteger_removidos=not options["incluir_removidos"],
+            prefixos=options["prefixos"],
+            ao_encontrar=ao_encontrar,
+        )
+        prefixo = "[dry-run] " if options["dry_run"] else ""
+        estilo = self.style.WARNING if relatorio.falhas else self.style.SUCCESS
+        self.stdout.write(estilo(f"{prefixo}{relatorio.resumo()}"))
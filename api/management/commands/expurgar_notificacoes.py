@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Notificacao
+
+
+class Command(BaseCommand):
+    help = "Remove, em lotes, notificações lidas mais antigas que o período de retenção."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=getattr(settings, "NOTIFICACOES_RETENCAO_DIAS", 90),
+            help="Idade mínima (em dias) das notificações lidas removidas.",
+        )
+        parser.add_argument("--lote", type=int, default=1000, help="Linhas removidas por DELETE.")
+
+    def handle(self, *args, **options):
+        removidas = Notificacao.expurgar_lidas(options["dias"], tamanho_lote=options["lote"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{removidas} notificação(ões) lida(s) removida(s) (retenção: {options['dias']} dias).")
+        )
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.armazenamento import expurgar_sessoes
+
+
+class Command(BaseCommand):
+    help = "Remove sessões de upload em partes abandonadas (e seus arquivos parciais) e as já anexadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=getattr(settings, "ARMAZENAMENTO_UPLOAD_RETENCAO_HORAS", 48),
+            help="Idade mínima (em horas desde a última parte) das sessões removidas.",
+        )
+
+    def handle(self, *args, **options):
+        removidas = expurgar_sessoes(options["horas"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{removidas} sessão(ões) de upload removida(s) (retenção: {options['horas']} horas).")
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.models import EntidadeFornecedor, Fornecedor
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o vínculo materializado entidade ↔ fornecedor a partir dos processos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Fornecedores recalculados por vez.")
+
+    def handle(self, *args, **options):
+        tamanho = options["lote"]
+        ids = list(Fornecedor.objects.order_by("pk").values_list("pk", flat=True))
+        criados = removidos = 0
+        for inicio in range(0, len(ids), tamanho):
+            c, r = EntidadeFornecedor.sincronizar(ids[inicio:inicio + tamanho])
+            criados += c
+            removidos += r
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(ids)} fornecedor(es) verificados: {criados} vínculo(s) criado(s), {removidos} removido(s).")
+        )
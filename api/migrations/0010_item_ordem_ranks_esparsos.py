@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INTERVALO_ORDEM = 1024
+
+
+def espacar_ordem_itens(apps, schema_editor):
+    """Converte a ordem densa (1, 2, 3...) em ranks esparsos (1024, 2048...)."""
+    Item = apps.get_model("api", "Item")
+
+    processo_ids = (
+        Item.objects.order_by().values_list("processo_id", flat=True).distinct()
+    )
+    for processo_id in processo_ids.iterator():
+        itens = list(
+            Item.objects.filter(processo_id=processo_id)
+            .order_by("ordem", "id")
+            .only("id", "ordem")
+        )
+        ranks_atuais = [i.ordem for i in itens]
+        extensao = INTERVALO_ORDEM * len(itens)
+        # Faixa de destino disjunta da atual para respeitar uniq_item_processo_ordem
+        base = 0 if extensao < min(ranks_atuais) else max(ranks_atuais)
+        for idx, item in enumerate(itens, start=1):
+            item.ordem = base + idx * INTERVALO_ORDEM
+        Item.objects.bulk_update(itens, ["ordem"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_contratoempenho_pncp_campos_obrigatorios"),
+    ]
+
+    operations = [
+        migrations.RunPython(espacar_ordem_itens, migrations.RunPython.noop),
+    ]
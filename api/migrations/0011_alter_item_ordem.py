@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_item_ordem_ranks_esparsos"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="item",
+            name="ordem",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,66 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_alter_item_ordem"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TarefaProcessamento",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tipo", models.CharField(choices=[("importacao_xlsx", "Importação de planilha")], max_length=40)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pendente", "Pendente"),
+                            ("executando", "Em execução"),
+                            ("concluida", "Concluída"),
+                            ("erro", "Erro"),
+                        ],
+                        db_index=True,
+                        default="pendente",
+                        max_length=20,
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("processados", models.PositiveIntegerField(default=0)),
+                ("mensagem", models.CharField(blank=True, default="", max_length=255)),
+                ("resultado", models.JSONField(blank=True, null=True)),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+                ("concluido_em", models.DateTimeField(blank=True, null=True)),
+                (
+                    "processo",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="tarefas",
+                        to="api.processolicitatorio",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="tarefas",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tarefa de Processamento",
+                "verbose_name_plural": "Tarefas de Processamento",
+                "ordering": ["-criado_em"],
+            },
+        ),
+    ]
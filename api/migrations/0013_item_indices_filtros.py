@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_tarefaprocessamento"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["lote", "ordem"], name="item_lote_ordem_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["processo", "situacao_item", "ordem"], name="item_proc_situacao_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["processo", "categoria_item", "ordem"], name="item_proc_categoria_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(fields=["fornecedor", "processo"], name="item_fornecedor_proc_idx"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_item_indices_filtros"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="processolicitatorio",
+            name="versao",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="processolicitatorio",
+            name="atualizado_em",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,63 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_processo_versao"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="atualizado_em",
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="lote",
+            name="atualizado_em",
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="itemfornecedor",
+            name="atualizado_em",
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="ataregistroprecos",
+            name="atualizado_em",
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name="contratoempenho",
+            name="atualizado_em",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name="processolicitatorio",
+            index=models.Index(fields=["entidade", "atualizado_em"], name="processo_entidade_atualiz_idx"),
+        ),
+        migrations.CreateModel(
+            name="RegistroExclusao",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("modelo", models.CharField(choices=[("processo", "Processo"), ("item", "Item"), ("lote", "Lote"), ("proposta", "Proposta"), ("contrato", "Contrato"), ("ata", "Ata de Registro de Preços")], max_length=20)),
+                ("objeto_id", models.PositiveBigIntegerField()),
+                ("processo_id", models.PositiveBigIntegerField(blank=True, null=True)),
+                ("excluido_em", models.DateTimeField(default=django.utils.timezone.now)),
+                ("entidade", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="registros_exclusao", to="api.entidade")),
+            ],
+            options={
+                "verbose_name": "Registro de Exclusão",
+                "verbose_name_plural": "Registros de Exclusão",
+                "ordering": ["excluido_em"],
+                "indexes": [models.Index(fields=["entidade", "excluido_em"], name="exclusao_entidade_data_idx")],
+            },
+        ),
+    ]
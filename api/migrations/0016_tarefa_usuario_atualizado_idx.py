@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_sincronizacao_atualizado_em"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tarefaprocessamento",
+            index=models.Index(fields=["usuario", "atualizado_em"], name="tarefa_usuario_atualiz_idx"),
+        ),
+    ]
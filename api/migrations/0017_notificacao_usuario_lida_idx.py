@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_tarefa_usuario_atualizado_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notificacao",
+            index=models.Index(fields=["usuario", "lida", "criado_em"], name="notif_usuario_lida_idx"),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_notificacao_usuario_lida_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="anotacao",
+            index=models.Index(fields=["usuario", "criado_em"], name="anotacao_usuario_criado_idx"),
+        ),
+    ]
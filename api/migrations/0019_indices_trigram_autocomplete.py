@@ -0,0 +1,51 @@
+"""
+Índices trigram (pg_trgm) para o autocomplete de usuários e fornecedores.
+
+Só no Postgres; nos demais bancos a migração não faz nada. As expressões
+indexadas são as que o Django gera para icontains/istartswith
+(UPPER(coluna::text) LIKE UPPER(...)), para o planejador poder usá-las.
+"""
+
+from django.db import migrations
+
+INDICES = (
+    ("api_customuser", "username"),
+    ("api_customuser", "first_name"),
+    ("api_customuser", "last_name"),
+    ("api_fornecedor", "razao_social"),
+    ("api_fornecedor", "nome_fantasia"),
+    ("api_fornecedor", "cnpj"),
+)
+
+
+def _nome(tabela, coluna):
+    return f"{tabela}_{coluna}_trgm_idx"
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for tabela, coluna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {_nome(tabela, coluna)} '
+            f'ON {tabela} USING gin ((UPPER("{coluna}"::text)) gin_trgm_ops)'
+        )
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for tabela, coluna in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {_nome(tabela, coluna)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_anotacao_usuario_criado_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
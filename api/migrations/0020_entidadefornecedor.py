@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_vinculos(apps, schema_editor):
+    FornecedorProcesso = apps.get_model("api", "FornecedorProcesso")
+    EntidadeFornecedor = apps.get_model("api", "EntidadeFornecedor")
+    pares = (
+        FornecedorProcesso.objects.filter(processo__entidade_id__isnull=False)
+        .values_list("processo__entidade_id", "fornecedor_id")
+        .distinct()
+        .iterator(chunk_size=2000)
+    )
+    lote = []
+    for entidade_id, fornecedor_id in pares:
+        lote.append(EntidadeFornecedor(entidade_id=entidade_id, fornecedor_id=fornecedor_id))
+        if len(lote) >= 2000:
+            EntidadeFornecedor.objects.bulk_create(lote, ignore_conflicts=True)
+            lote = []
+    if lote:
+        EntidadeFornecedor.objects.bulk_create(lote, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_indices_trigram_autocomplete"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntidadeFornecedor",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "entidade",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fornecedores_vinculados",
+                        to="api.entidade",
+                    ),
+                ),
+                (
+                    "fornecedor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entidades_vinculadas",
+                        to="api.fornecedor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Fornecedor da Entidade",
+                "verbose_name_plural": "Fornecedores da Entidade",
+                "constraints": [
+                    models.UniqueConstraint(fields=("entidade", "fornecedor"), name="entidade_fornecedor_unico")
+                ],
+            },
+        ),
+        migrations.RunPython(preencher_vinculos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_entidadefornecedor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SessaoUpload",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("tipo", models.CharField(max_length=40)),
+                ("nome", models.CharField(max_length=255)),
+                ("content_type", models.CharField(blank=True, default="", max_length=100)),
+                ("tamanho", models.PositiveBigIntegerField()),
+                ("recebido", models.PositiveBigIntegerField(default=0)),
+                ("arquivo_hash", models.CharField(blank=True, max_length=80, null=True)),
+                ("chave", models.CharField(blank=True, max_length=500, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("recebendo", "Recebendo partes"),
+                            ("concluida", "Concluída"),
+                            ("anexada", "Anexada a um documento"),
+                        ],
+                        default="recebendo",
+                        max_length=20,
+                    ),
+                ),
+                ("criado_em", models.DateTimeField(auto_now_add=True)),
+                ("atualizado_em", models.DateTimeField(auto_now=True)),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sessoes_upload",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Sessão de Upload",
+                "verbose_name_plural": "Sessões de Upload",
+                "ordering": ["-criado_em"],
+                "indexes": [
+                    models.Index(fields=["status", "atualizado_em"], name="sessao_upload_status_idx"),
+                ],
+            },
+        ),
+    ]
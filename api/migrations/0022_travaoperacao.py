@@ -0,0 +1,51 @@
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_sessaoupload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TravaOperacao",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("operacao", models.CharField(max_length=40)),
+                ("dono", models.UUIDField(default=uuid.uuid4)),
+                ("iniciada_em", models.DateTimeField(default=django.utils.timezone.now)),
+                ("expira_em", models.DateTimeField()),
+                (
+                    "processo",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="travas_operacao",
+                        to="api.processolicitatorio",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Trava de Operação",
+                "verbose_name_plural": "Travas de Operações",
+                "constraints": [
+                    models.UniqueConstraint(fields=("processo", "operacao"), name="trava_operacao_unica"),
+                ],
+            },
+        ),
+    ]
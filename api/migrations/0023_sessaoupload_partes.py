@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_travaoperacao"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sessaoupload",
+            name="upload_id",
+            field=models.CharField(blank=True, max_length=1024, null=True),
+        ),
+        migrations.AddField(
+            model_name="sessaoupload",
+            name="partes",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="sessaoupload",
+            name="gravacao",
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="sessaoupload",
+            name="gravando_ate",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+"""
+Índices trigram (pg_trgm) para a busca por descrição dos itens e lotes do
+processo (filtro 'search' de /processos/{id}/itens/ e /lotes/).
+
+Mesmo esquema da 0019: só no Postgres, sobre a expressão que o Django gera
+para icontains (UPPER(coluna::text) LIKE UPPER(...)).
+"""
+
+from django.db import migrations
+
+INDICES = (
+    ("api_item", "descricao"),
+    ("api_lote", "descricao"),
+)
+
+
+def _nome(tabela, coluna):
+    return f"{tabela}_{coluna}_trgm_idx"
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for tabela, coluna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {_nome(tabela, coluna)} '
+            f'ON {tabela} USING gin ((UPPER("{coluna}"::text)) gin_trgm_ops)'
+        )
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for tabela, coluna in INDICES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {_nome(tabela, coluna)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_sessaoupload_partes"),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
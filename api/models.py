@@ -1,7 +1,14 @@
 # api/models.py
 
-from django.db import models, transaction
+import threading
+import uuid
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db.models import Q
@@ -117,6 +124,10 @@ class Orgao(models.Model):
 # 📄 PROCESSO LICITATÓRIO
 # ============================================================
 
+# Processos alterados na transação corrente, por thread (ver registrar_alteracao)
+_alteracoes_pendentes = threading.local()
+
+
 class ProcessoLicitatorio(models.Model):
     # --- Identificação ---
     numero_processo = models.CharField(max_length=50, blank=True, null=True)
@@ -181,8 +192,18 @@ class ProcessoLicitatorio(models.Model):
 
     pncp_link = models.URLField(blank=True, null=True)
     pncp_ultimo_retorno = models.JSONField(blank=True, null=True)
+
+    # --- Controle de versão (ETag / Last-Modified) ---
+    # Incrementados a cada escrita no processo ou em seus filhos (ver registrar_alteracao)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+    atualizado_em = models.DateTimeField(default=timezone.now, editable=False)
+
     class Meta:
         ordering = ['-data_processo']
+        indexes = [
+            # Feed de sincronização por entidade (ver api/sincronizacao.py)
+            models.Index(fields=['entidade', 'atualizado_em'], name='processo_entidade_atualiz_idx'),
+        ]
         verbose_name = "Processo Licitatório"
         verbose_name_plural = "Processos Licitatórios"
 
@@ -198,46 +219,98 @@ class ProcessoLicitatorio(models.Model):
     def registro_precos(self, value):
         self.registro_preco = bool(value)
 
+    # Só mudam pelo incremento em _aplicar_alteracoes_pendentes
+    CAMPOS_VERSAO = ('versao', 'atualizado_em')
+
+    def save(self, *args, **kwargs):
+        # Um save() completo de uma instância antiga regravaria a versão lida
+        # por ela, desfazendo incrementos já entregues a clientes (ETag)
+        if not self._state.adding and not kwargs.get('force_insert'):
+            campos = kwargs.get('update_fields')
+            if campos is None:
+                campos = [
+                    f.name for f in self._meta.concrete_fields
+                    if not f.primary_key and f.name not in self.CAMPOS_VERSAO
+                ]
+            else:
+                campos = [c for c in campos if c not in self.CAMPOS_VERSAO]
+                if not campos:
+                    return
+            kwargs['update_fields'] = campos
+        super().save(*args, **kwargs)
+
     # --- Lógica de Negócio (Fat Model) ---
 
+    @classmethod
+    def registrar_alteracao(cls, *processo_ids):
+        """
+        Agenda o incremento de 'versao'/'atualizado_em' dos processos para o
+        commit da transação atual. Várias escritas na mesma transação resultam
+        numa única UPDATE. Ids de uma transação desfeita são aplicados no
+        próximo commit da thread (incremento a mais, sem efeito colateral).
+        """
+        ids = {pid for pid in processo_ids if pid}
+        if not ids:
+            return
+        pendentes = getattr(_alteracoes_pendentes, "ids", None)
+        if pendentes is None:
+            pendentes = _alteracoes_pendentes.ids = set()
+        pendentes.update(ids)
+        transaction.on_commit(cls._aplicar_alteracoes_pendentes)
+
+    @classmethod
+    def _aplicar_alteracoes_pendentes(cls):
+        ids = getattr(_alteracoes_pendentes, "ids", None)
+        if not ids:
+            return
+        _alteracoes_pendentes.ids = set()
+        cls.objects.filter(pk__in=ids).update(
+            versao=models.F('versao') + 1,
+            atualizado_em=timezone.now(),
+        )
+
+    def travar(self):
+        """Trava a linha do processo até o fim da transação (SELECT ... FOR UPDATE)."""
+        ProcessoLicitatorio.objects.select_for_update().filter(pk=self.pk).values_list('pk', flat=True).get()
+
     def next_lote_numero(self) -> int:
         """Calcula o próximo número de lote disponível."""
-        ultimo = self.lotes.order_by('-numero').first()
-        return (ultimo.numero + 1) if ultimo else 1
+        ultimo = self.lotes.aggregate(maior=models.Max('numero'))['maior']
+        return (ultimo or 0) + 1
 
     @transaction.atomic
     def criar_lotes(self, quantidade: int = None, descricao_prefixo: str = "Lote ",
                     *, lotes: list = None, numero: int = None, descricao: str = ""):
         """
         Cria lotes de forma flexível: em massa (quantidade), lista explícita ou individual.
+        Os números são alocados uma única vez e os lotes gravados num só INSERT;
+        conflitos com a constraint (processo, numero) continuam gerando IntegrityError.
         """
-        created = []
-
         # 1. Criação via lista de objetos/dicts
         if isinstance(lotes, list) and lotes:
+            maior = self.next_lote_numero() - 1
+            novos = []
             for item in lotes:
-                n = item.get('numero') or self.next_lote_numero()
-                d = item.get('descricao') or ""
-                obj = Lote.objects.create(processo=self, numero=n, descricao=d)
-                created.append(obj)
-            return created
+                n = int(item.get('numero') or maior + 1)
+                maior = max(maior, n)
+                novos.append(Lote(processo=self, numero=n, descricao=item.get('descricao') or ""))
+            ProcessoLicitatorio.registrar_alteracao(self.pk)
+            return Lote.objects.bulk_create(novos)
 
         # 2. Criação individual
         if numero is not None or descricao:
             n = numero or self.next_lote_numero()
-            obj = Lote.objects.create(processo=self, numero=n, descricao=descricao or "")
-            created.append(obj)
-            return created
+            return [Lote.objects.create(processo=self, numero=n, descricao=descricao or "")]
 
         # 3. Criação em massa (ex: criar 10 lotes de uma vez)
         if quantidade and quantidade > 0:
             start = self.next_lote_numero()
-            for i in range(quantidade):
-                n = start + i
-                d = f"{descricao_prefixo}{n}"
-                obj = Lote.objects.create(processo=self, numero=n, descricao=d)
-                created.append(obj)
-            return created
+            novos = [
+                Lote(processo=self, numero=start + i, descricao=f"{descricao_prefixo}{start + i}")
+                for i in range(quantidade)
+            ]
+            ProcessoLicitatorio.registrar_alteracao(self.pk)
+            return Lote.objects.bulk_create(novos)
 
         raise ValidationError("Parâmetros insuficientes para criação de lotes.")
 
@@ -245,47 +318,229 @@ class ProcessoLicitatorio(models.Model):
     def organizar_lotes(self, ordem_ids: list = None, normalizar: bool = False,
                         inicio: int = 1, mapa: list = None):
         """
-        Reordena ou renomeia os números dos lotes.
+        Reordena ou renomeia os números dos lotes (gravação em lote).
         """
         # Caso 1: Reordenar baseado em lista de IDs
         if isinstance(ordem_ids, list) and ordem_ids:
-            qs = list(self.lotes.filter(id__in=ordem_ids))
-            id2obj = {o.id: o for o in qs}
+            id2obj = {o.id: o for o in self.lotes.filter(id__in=ordem_ids)}
+            novos = {}
             numero = inicio or 1
             for _id in ordem_ids:
-                obj = id2obj.get(_id)
-                if obj:
-                    obj.numero = numero
-                    obj.save(update_fields=['numero'])
+                if _id in id2obj:
+                    novos[_id] = numero
                     numero += 1
+            self._renumerar_lotes(id2obj, novos)
             return self.lotes.order_by('numero')
 
         # Caso 2: Normalizar sequência (1, 2, 3...)
         if normalizar:
-            numero = inicio or 1
-            for obj in self.lotes.order_by('numero', 'id'):
-                if obj.numero != numero:
-                    obj.numero = numero
-                    obj.save(update_fields=['numero'])
-                numero += 1
+            lotes = list(self.lotes.order_by('numero', 'id'))
+            id2obj = {o.id: o for o in lotes}
+            novos = {o.id: numero for numero, o in enumerate(lotes, start=inicio or 1)}
+            self._renumerar_lotes(id2obj, novos)
             return self.lotes.order_by('numero')
 
         # Caso 3: Mapa explícito (ID -> Novo Número)
         if isinstance(mapa, list) and mapa:
             ids = [m.get('id') for m in mapa if m.get('id') is not None]
-            qs = self.lotes.filter(id__in=ids)
-            id2obj = {o.id: o for o in qs}
+            id2obj = {o.id: o for o in self.lotes.filter(id__in=ids)}
+            novos = {}
             for m in mapa:
                 _id = m.get('id')
                 num = m.get('numero')
                 if _id in id2obj and isinstance(num, int) and num > 0:
-                    obj = id2obj[_id]
-                    obj.numero = num
-                    obj.save(update_fields=['numero'])
+                    novos[_id] = num
+            self._renumerar_lotes(id2obj, novos)
             return self.lotes.order_by('numero')
 
         raise ValidationError("Parâmetros insuficientes para organização de lotes.")
 
+    def _renumerar_lotes(self, id2obj: dict, novos: dict) -> None:
+        """
+        Grava os novos números em dois UPDATEs em lote: primeiro numa faixa
+        temporária acima de todos os números envolvidos (permite permutações
+        sem colisão intermediária), depois nos números definitivos. Colisões
+        com lotes não renumerados ainda violam a constraint e desfazem tudo.
+        """
+        alterados = [id2obj[_id] for _id, num in novos.items() if id2obj[_id].numero != num]
+        if not alterados:
+            return
+
+        teto = max(self.next_lote_numero(), max(novos.values()) + 1)
+        for i, obj in enumerate(alterados):
+            obj.numero = teto + i
+        Lote.objects.bulk_update(alterados, ['numero'])
+
+        agora = timezone.now()
+        for obj in alterados:
+            obj.numero = novos[obj.id]
+            obj.atualizado_em = agora
+        Lote.objects.bulk_update(alterados, ['numero', 'atualizado_em'])
+        ProcessoLicitatorio.registrar_alteracao(self.pk)
+
+    # --- Ordenação dos itens (ranks esparsos) ---
+    #
+    # O campo Item.ordem guarda um rank com intervalos (1024, 2048, ...), de modo
+    # que mover um item só regrava o próprio item. A numeração densa 1..N
+    # (exibição e numeroItem do PNCP) é derivada da ordem dos ranks.
+
+    def numeracao_itens(self) -> dict:
+        """Mapa {item_id: número sequencial 1..N} segundo a ordem atual dos itens."""
+        ids = self.itens.order_by('ordem', 'id').values_list('id', flat=True)
+        return {item_id: idx for idx, item_id in enumerate(ids, start=1)}
+
+    @transaction.atomic
+    def reordenar_itens(self, item_ids: list) -> int:
+        """
+        Aplica a nova ordem informada (lista de IDs) regravando apenas os itens
+        que saíram da posição relativa. Itens do processo ausentes da lista
+        mantêm suas posições. Retorna a quantidade de itens regravados.
+        """
+        self.travar()
+        atuais = list(self.itens.order_by('ordem', 'id').only('id', 'ordem'))
+        id2obj = {o.id: o for o in atuais}
+        pedidos = [id2obj[_id] for _id in dict.fromkeys(item_ids) if _id in id2obj]
+        if not pedidos:
+            return 0
+
+        # Encaixa a sequência pedida nas posições que esses itens ocupam hoje
+        ids_pedidos = {o.id for o in pedidos}
+        fila = iter(pedidos)
+        sequencia = [next(fila) if o.id in ids_pedidos else o for o in atuais]
+        return self._aplicar_sequencia_itens(sequencia)
+
+    @transaction.atomic
+    def mover_item(self, item, *, antes_de=None, depois_de=None) -> int:
+        """
+        Move um único item para antes/depois de outro (ou para o fim, se nenhum
+        vizinho for informado). Regrava só o item movido, salvo quando o
+        intervalo entre os vizinhos se esgota e é preciso rebalancear.
+        Os ranks do item e do vizinho são relidos sob a trava do processo;
+        Item.DoesNotExist se algum deles foi excluído nesse meio tempo.
+        """
+        self.travar()
+        envolvidos = [o for o in (item, antes_de, depois_de) if o is not None]
+        ranks_atuais = dict(self.itens.filter(pk__in=[o.pk for o in envolvidos]).values_list('pk', 'ordem'))
+        for obj in envolvidos:
+            if obj.pk not in ranks_atuais:
+                raise Item.DoesNotExist("Item não encontrado.")
+            obj.ordem = ranks_atuais[obj.pk]
+
+        outros = self.itens.exclude(pk=item.pk)
+
+        if depois_de is not None:
+            inferior = depois_de.ordem
+            superior = (
+                outros.filter(ordem__gt=inferior)
+                .order_by('ordem').values_list('ordem', flat=True).first()
+            )
+        elif antes_de is not None:
+            superior = antes_de.ordem
+            inferior = (
+                outros.filter(ordem__lt=superior)
+                .order_by('-ordem').values_list('ordem', flat=True).first()
+            ) or 0
+        else:
+            inferior = (
+                outros.order_by('-ordem').values_list('ordem', flat=True).first()
+            ) or 0
+            superior = None
+
+        ranks = _ranks_entre(inferior, superior, 1)
+        if ranks is None:
+            sequencia = list(outros.order_by('ordem', 'id').only('id', 'ordem'))
+            vizinho = depois_de or antes_de
+            if vizinho is None:
+                posicao = len(sequencia)
+            else:
+                posicao = next(i for i, o in enumerate(sequencia) if o.id == vizinho.id)
+                if depois_de is not None:
+                    posicao += 1
+            sequencia.insert(posicao, item)
+            return self.rebalancear_itens(sequencia)
+
+        if ranks[0] != item.ordem:
+            item.ordem = ranks[0]
+            Item.objects.filter(pk=item.pk).update(ordem=item.ordem, atualizado_em=timezone.now())
+            ProcessoLicitatorio.registrar_alteracao(self.pk)
+        return 1
+
+    @transaction.atomic
+    def rebalancear_itens(self, sequencia: list = None) -> int:
+        """
+        Redistribui os ranks de todos os itens com intervalos uniformes a partir
+        de INTERVALO_ORDEM, em lote. Os ranks atuais são relidos do banco (a
+        sequência recebida pode já ter ranks alterados em memória); se a faixa
+        de destino cruzar algum deles, os itens passam antes por valores
+        temporários livres, para não violar a constraint única (processo, ordem).
+        """
+        if sequencia is None:
+            sequencia = list(self.itens.order_by('ordem', 'id').only('id', 'ordem'))
+        if not sequencia:
+            return 0
+
+        ocupados = set(Item.objects.filter(processo_id=self.pk).values_list('ordem', flat=True))
+        passo = min(Item.INTERVALO_ORDEM, Item.ORDEM_MAXIMA // len(sequencia))
+        destino = [idx * passo for idx in range(1, len(sequencia) + 1)]
+
+        agora = timezone.now()
+        if ocupados.intersection(destino):
+            reservados = ocupados.union(destino)
+            livres = (v for v in range(1, Item.ORDEM_MAXIMA + 1) if v not in reservados)
+            for obj, temporario in zip(sequencia, livres):
+                obj.ordem = temporario
+            Item.objects.bulk_update(sequencia, ['ordem'])
+
+        for obj, rank in zip(sequencia, destino):
+            obj.ordem = rank
+            obj.atualizado_em = agora
+        Item.objects.bulk_update(sequencia, ['ordem', 'atualizado_em'])
+        ProcessoLicitatorio.registrar_alteracao(self.pk)
+        return len(sequencia)
+
+    def _aplicar_sequencia_itens(self, sequencia: list) -> int:
+        """
+        Mantém a maior subsequência já ordenada e atribui novos ranks apenas
+        aos demais itens, dentro dos intervalos entre os vizinhos mantidos.
+        """
+        mantidos = _indices_subsequencia_crescente([o.ordem for o in sequencia])
+        movidos = [o for i, o in enumerate(sequencia) if i not in mantidos]
+        if not movidos:
+            return 0
+
+        # Ranks antigos dos itens movidos ainda existem até o fim do UPDATE
+        proibidos = {o.ordem for o in movidos}
+        alterados = []
+        inferior = 0
+        i = 0
+        while i < len(sequencia):
+            if i in mantidos:
+                inferior = sequencia[i].ordem
+                i += 1
+                continue
+
+            j = i
+            while j < len(sequencia) and j not in mantidos:
+                j += 1
+            superior = sequencia[j].ordem if j < len(sequencia) else None
+
+            ranks = _ranks_entre(inferior, superior, j - i, proibidos)
+            if ranks is None:
+                return self.rebalancear_itens(sequencia)
+
+            for obj, rank in zip(sequencia[i:j], ranks):
+                obj.ordem = rank
+                alterados.append(obj)
+            inferior = ranks[-1]
+            i = j
+
+        agora = timezone.now()
+        for obj in alterados:
+            obj.atualizado_em = agora
+        Item.objects.bulk_update(alterados, ['ordem', 'atualizado_em'])
+        ProcessoLicitatorio.registrar_alteracao(self.pk)
+        return len(alterados)
+
 
 
 class DocumentoPNCP(models.Model):
@@ -374,6 +629,7 @@ class Lote(models.Model):
     processo = models.ForeignKey(ProcessoLicitatorio, related_name='lotes', on_delete=models.CASCADE)
     numero = models.PositiveIntegerField()
     descricao = models.TextField(blank=True, null=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['numero']
@@ -460,7 +716,7 @@ class Item(models.Model):
         help_text="Valor unitário homologado após definição do fornecedor vencedor."
     )
     
-    ordem = models.PositiveIntegerField(default=1)
+    ordem = models.PositiveIntegerField(default=0)
     
     # Classificadores (Atualizados para PNCP)
     natureza = models.CharField(max_length=8, choices=NATUREZAS_DESPESA_CHOICES, blank=True, null=True)
@@ -472,11 +728,26 @@ class Item(models.Model):
 
     pncp_numero_item = models.PositiveIntegerField(blank=True, null=True)
     pncp_ultima_atualizacao = models.DateTimeField(blank=True, null=True)
+
+    # auto_now não vale para bulk_update/update(): incluir o campo explicitamente
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Intervalo entre ranks consecutivos de 'ordem' (ver ProcessoLicitatorio.reordenar_itens)
+    INTERVALO_ORDEM = 1024
+    ORDEM_MAXIMA = 2147483647
+
     class Meta:
         ordering = ['ordem']
         constraints = [
             models.UniqueConstraint(fields=['processo', 'ordem'], name='uniq_item_processo_ordem'),
         ]
+        # Filtros da grade de itens do processo (ver ItemProcessoFilter)
+        indexes = [
+            models.Index(fields=['lote', 'ordem'], name='item_lote_ordem_idx'),
+            models.Index(fields=['processo', 'situacao_item', 'ordem'], name='item_proc_situacao_idx'),
+            models.Index(fields=['processo', 'categoria_item', 'ordem'], name='item_proc_categoria_idx'),
+            models.Index(fields=['fornecedor', 'processo'], name='item_fornecedor_proc_idx'),
+        ]
 
     def __str__(self):
         return f"{self.descricao} ({self.processo.numero_processo})"
@@ -487,13 +758,65 @@ class Item(models.Model):
             raise ValidationError("O lote selecionado pertence a outro processo.")
 
     def save(self, *args, **kwargs):
-        """Auto-numeração do campo 'ordem' se não fornecido."""
+        """Auto-numeração do campo 'ordem' (próximo rank livre) se não fornecido."""
         if self._state.adding and (self.ordem is None or self.ordem <= 0):
-            last = Item.objects.filter(processo=self.processo).order_by('-ordem').first()
-            self.ordem = (last.ordem + 1) if last else 1
+            with transaction.atomic():
+                # Inserções concorrentes no mesmo processo aguardam a trava
+                self.processo.travar()
+                last = Item.objects.filter(processo=self.processo).order_by('-ordem').first()
+                self.ordem = (last.ordem + self.INTERVALO_ORDEM) if last else self.INTERVALO_ORDEM
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
 
+def _ranks_entre(inferior: int, superior: int = None, quantidade: int = 1, proibidos=()) -> list:
+    """
+    Gera `quantidade` ranks crescentes no intervalo aberto (inferior, superior),
+    distribuídos uniformemente e evitando os valores em `proibidos`.
+    Retorna None quando o intervalo não comporta os ranks (hora de rebalancear).
+    """
+    if superior is None:
+        passo = Item.INTERVALO_ORDEM
+    else:
+        passo = (superior - inferior) // (quantidade + 1)
+
+    ranks = []
+    atual = inferior
+    for k in range(1, quantidade + 1):
+        rank = max(inferior + passo * k, atual + 1)
+        while rank in proibidos:
+            rank += 1
+        if (superior is not None and rank >= superior) or rank > Item.ORDEM_MAXIMA:
+            return None
+        ranks.append(rank)
+        atual = rank
+    return ranks
+
+
+def _indices_subsequencia_crescente(valores: list) -> set:
+    """Índices de uma maior subsequência estritamente crescente (O(n log n))."""
+    caudas = []        # menor valor final de uma subsequência de cada tamanho
+    caudas_idx = []    # índice desse valor em `valores`
+    anterior = [-1] * len(valores)
+    for i, valor in enumerate(valores):
+        pos = bisect_left(caudas, valor)
+        if pos == len(caudas):
+            caudas.append(valor)
+            caudas_idx.append(i)
+        else:
+            caudas[pos] = valor
+            caudas_idx[pos] = i
+        anterior[i] = caudas_idx[pos - 1] if pos > 0 else -1
+
+    indices = set()
+    i = caudas_idx[-1] if caudas_idx else -1
+    while i >= 0:
+        indices.add(i)
+        i = anterior[i]
+    return indices
+
+
 # ============================================================
 # 🔗 FORNECEDOR ↔ PROCESSO (Participantes)
 # ============================================================
@@ -521,6 +844,96 @@ class FornecedorProcesso(models.Model):
         return f"{self.fornecedor} - {self.processo.numero_processo}"
 
 
+# Fornecedores com vínculos removidos na transação corrente, por thread
+_fornecedores_pendentes = threading.local()
+
+
+class EntidadeFornecedor(models.Model):
+    """
+    Vínculo materializado entidade ↔ fornecedor: existe enquanto o fornecedor
+    participar de ao menos um processo da entidade (FornecedorProcesso).
+    Permite filtrar fornecedores por entidade com um único semijoin indexado.
+
+    Mantido pelos signals de FornecedorProcesso/ProcessoLicitatorio e pela
+    importação em lote; `manage.py sincronizar_entidade_fornecedor` reconstrói.
+    """
+
+    entidade = models.ForeignKey(Entidade, on_delete=models.CASCADE, related_name="fornecedores_vinculados")
+    fornecedor = models.ForeignKey(Fornecedor, on_delete=models.CASCADE, related_name="entidades_vinculadas")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entidade", "fornecedor"], name="entidade_fornecedor_unico"),
+        ]
+        verbose_name = "Fornecedor da Entidade"
+        verbose_name_plural = "Fornecedores da Entidade"
+
+    def __str__(self):
+        return f"{self.entidade_id} - {self.fornecedor_id}"
+
+    @classmethod
+    def vincular(cls, entidade_id, fornecedor_ids):
+        """Garante o vínculo (INSERT em lote, ignorando os já existentes)."""
+        if not entidade_id:
+            return
+        cls.objects.bulk_create(
+            [cls(entidade_id=entidade_id, fornecedor_id=f) for f in set(fornecedor_ids) if f],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def registrar_alteracao(cls, *fornecedor_ids):
+        """Agenda sincronizar() dos fornecedores para o commit (coalescido por transação)."""
+        ids = {f for f in fornecedor_ids if f}
+        if not ids:
+            return
+        pendentes = getattr(_fornecedores_pendentes, "ids", None)
+        if pendentes is None:
+            pendentes = _fornecedores_pendentes.ids = set()
+        pendentes.update(ids)
+        transaction.on_commit(cls._aplicar_alteracoes_pendentes)
+
+    @classmethod
+    def _aplicar_alteracoes_pendentes(cls):
+        ids = getattr(_fornecedores_pendentes, "ids", None)
+        if not ids:
+            return
+        _fornecedores_pendentes.ids = set()
+        cls.sincronizar(ids)
+
+    @classmethod
+    def sincronizar(cls, fornecedor_ids):
+        """
+        Recalcula os vínculos dos fornecedores a partir de FornecedorProcesso.
+        Retorna (criados, removidos).
+        """
+        fornecedor_ids = list(fornecedor_ids)
+        esperados = set(
+            FornecedorProcesso.objects.filter(
+                fornecedor_id__in=fornecedor_ids, processo__entidade_id__isnull=False
+            )
+            .values_list("processo__entidade_id", "fornecedor_id")
+            .distinct()
+        )
+        atuais = {
+            (entidade_id, fornecedor_id): pk
+            for pk, entidade_id, fornecedor_id in cls.objects.filter(
+                fornecedor_id__in=fornecedor_ids
+            ).values_list("pk", "entidade_id", "fornecedor_id")
+        }
+
+        sobrando = [pk for par, pk in atuais.items() if par not in esperados]
+        faltando = esperados - atuais.keys()
+        with transaction.atomic():
+            if sobrando:
+                cls.objects.filter(pk__in=sobrando).delete()
+            cls.objects.bulk_create(
+                [cls(entidade_id=e, fornecedor_id=f) for e, f in faltando],
+                ignore_conflicts=True,
+            )
+        return len(faltando), len(sobrando)
+
+
 # ============================================================
 # 💰 ITEM ↔ FORNECEDOR (Propostas)
 # ============================================================
@@ -530,6 +943,7 @@ class ItemFornecedor(models.Model):
     fornecedor = models.ForeignKey(Fornecedor, related_name='propostas', on_delete=models.CASCADE)
     valor_proposto = models.DecimalField(max_digits=14, decimal_places=2)
     vencedor = models.BooleanField(default=False)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = (('item', 'fornecedor'),)
@@ -598,7 +1012,7 @@ class ContratoEmpenho(models.Model):
 
     ativo = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
-    atualizado_em = models.DateTimeField(auto_now=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-criado_em']
@@ -684,11 +1098,27 @@ class Anotacao(models.Model):
         ordering = ['-criado_em'] # Mais recentes primeiro
         verbose_name = "Anotação"
         verbose_name_plural = "Anotações"
+        indexes = [
+            models.Index(fields=["usuario", "criado_em"], name="anotacao_usuario_criado_idx"),
+        ]
 
     def __str__(self):
         base = self.titulo or (self.texto[:30] if self.texto else "Anotação")
         return f"{base} - {self.usuario.username}"
 
+    @classmethod
+    def ids_visiveis(cls, usuario_id):
+        """
+        Subconsulta com os ids das anotações do usuário (autor) UNION as
+        compartilhadas com ele. Cada lado usa o índice da sua FK e o UNION
+        já elimina repetidos, sem o JOIN + DISTINCT de um filtro com OR.
+        """
+        proprias = cls.objects.filter(usuario_id=usuario_id).order_by().values("id")
+        compartilhadas = cls.compartilhada_com.through.objects.filter(
+            customuser_id=usuario_id
+        ).values("anotacao_id")
+        return proprias.union(compartilhadas)
+
 
 class Notificacao(models.Model):
     TIPO_ACAO_CHOICES = (
@@ -736,9 +1166,71 @@ class Notificacao(models.Model):
         ordering = ["-criado_em"]
         verbose_name = "Notificação"
         verbose_name_plural = "Notificações"
+        indexes = [
+            # Contagem de não lidas, listagem por usuário e expurgo das lidas
+            models.Index(fields=["usuario", "lida", "criado_em"], name="notif_usuario_lida_idx"),
+        ]
 
     def __str__(self):
         return f"{self.titulo} -> {self.usuario.username}"
+
+    # --- Contador de não lidas (cache por usuário) ---
+
+    @staticmethod
+    def _chave_nao_lidas(usuario_id):
+        return f"notificacoes:nao_lidas:{usuario_id}"
+
+    @classmethod
+    def contar_nao_lidas(cls, usuario_id):
+        """Quantidade de não lidas do usuário, do cache quando disponível."""
+        chave = cls._chave_nao_lidas(usuario_id)
+        total = cache.get(chave)
+        if total is None:
+            total = cls.objects.filter(usuario_id=usuario_id, lida=False).count()
+            cache.set(chave, total, getattr(settings, "NOTIFICACOES_CONTADOR_TTL", 60))
+        return total
+
+    @classmethod
+    def invalidar_nao_lidas(cls, *usuario_ids):
+        """
+        Descarta o contador em cache dos usuários após o commit (antes dele,
+        uma leitura concorrente recolocaria no cache o valor antigo).
+        """
+        chaves = [cls._chave_nao_lidas(uid) for uid in set(usuario_ids) if uid]
+        if chaves:
+            transaction.on_commit(lambda: cache.delete_many(chaves))
+
+    @classmethod
+    def marcar_lidas(cls, usuario_id, ids=None, lida=True):
+        """
+        Marca as notificações do usuário (todas, ou só 'ids') como lidas ou
+        não lidas numa única UPDATE. Retorna a quantidade alterada.
+        """
+        qs = cls.objects.filter(usuario_id=usuario_id, lida=not lida)
+        if ids is not None:
+            qs = qs.filter(pk__in=ids)
+        alteradas = qs.update(lida=lida)
+        if alteradas:
+            cls.invalidar_nao_lidas(usuario_id)
+        return alteradas
+
+    @classmethod
+    def expurgar_lidas(cls, dias, tamanho_lote=1000):
+        """
+        Remove notificações lidas com mais de 'dias' dias, em lotes de
+        'tamanho_lote' (transações curtas, sem travar a tabela inteira).
+        Não lidas nunca são removidas. Retorna o total removido.
+        """
+        limite = timezone.now() - timedelta(days=dias)
+        qs = cls.objects.filter(lida=True, criado_em__lt=limite)
+        removidas = 0
+        while True:
+            ids = list(qs.values_list("pk", flat=True)[:tamanho_lote])
+            if not ids:
+                return removidas
+            # Sem FKs apontando para Notificacao nem receivers de delete:
+            # o Django executa um único DELETE por lote
+            removidas += cls.objects.filter(pk__in=ids).delete()[0]
     
 
 # ============================================================
@@ -816,6 +1308,7 @@ class AtaRegistroPrecos(models.Model):
 
     ativo = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["-criado_em"]
@@ -865,3 +1358,266 @@ class DocumentoAtaRegistroPrecos(models.Model):
 
     def __str__(self):
         return f"Doc Ata {self.titulo} ({self.ata})"
+
+
+# ============================================================
+# ⚙️ TAREFAS EM SEGUNDO PLANO
+# ============================================================
+
+class TarefaProcessamento(models.Model):
+    """Acompanhamento de processamentos longos executados fora da requisição."""
+
+    TIPO_CHOICES = (
+        ("importacao_xlsx", "Importação de planilha"),
+    )
+    STATUS_CHOICES = (
+        ("pendente", "Pendente"),
+        ("executando", "Em execução"),
+        ("concluida", "Concluída"),
+        ("erro", "Erro"),
+    )
+
+    tipo = models.CharField(max_length=40, choices=TIPO_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pendente", db_index=True)
+
+    usuario = models.ForeignKey(
+        CustomUser,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tarefas",
+    )
+    processo = models.ForeignKey(
+        ProcessoLicitatorio,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tarefas",
+    )
+
+    total = models.PositiveIntegerField(default=0)
+    processados = models.PositiveIntegerField(default=0)
+    mensagem = models.CharField(max_length=255, blank=True, default="")
+    resultado = models.JSONField(blank=True, null=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        verbose_name = "Tarefa de Processamento"
+        verbose_name_plural = "Tarefas de Processamento"
+        indexes = [
+            # Consulta periódica do stream de eventos (api/eventos.py)
+            models.Index(fields=["usuario", "atualizado_em"], name="tarefa_usuario_atualiz_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.status})"
+
+    @property
+    def progresso(self) -> int:
+        """Percentual concluído (0-100)."""
+        if self.status == "concluida":
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.processados * 100 / self.total))
+
+
+# ============================================================
+# 🪦 EXCLUSÕES (feed de sincronização)
+# ============================================================
+
+class RegistroExclusao(models.Model):
+    """
+    Marca (tombstone) de um registro excluído, para que o feed de
+    sincronização informe exclusões aos clientes. A exclusão de um processo
+    gera só a marca do processo: os filhos saem junto no cliente.
+    """
+    MODELO_CHOICES = (
+        ("processo", "Processo"),
+        ("item", "Item"),
+        ("lote", "Lote"),
+        ("proposta", "Proposta"),
+        ("contrato", "Contrato"),
+        ("ata", "Ata de Registro de Preços"),
+    )
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.PositiveBigIntegerField()
+    entidade = models.ForeignKey(
+        Entidade,
+        on_delete=models.CASCADE,
+        related_name="registros_exclusao",
+        null=True,
+        blank=True,
+    )
+    processo_id = models.PositiveBigIntegerField(blank=True, null=True)
+    excluido_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["excluido_em"]
+        indexes = [
+            models.Index(fields=["entidade", "excluido_em"], name="exclusao_entidade_data_idx"),
+        ]
+        verbose_name = "Registro de Exclusão"
+        verbose_name_plural = "Registros de Exclusão"
+
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} excluído em {self.excluido_em:%d/%m/%Y %H:%M}"
+
+
+# ============================================================
+# 🧩 UPLOADS EM PARTES (retomáveis)
+# ============================================================
+
+class SessaoUpload(models.Model):
+    """
+    Upload retomável de um arquivo grande, enviado em partes sequenciais
+    (ver api/armazenamento.py). 'recebido' é o próximo offset esperado: após
+    uma falha o cliente consulta a sessão e reenvia só a partir dali.
+
+    As partes ficam no storage compartilhado (multipart upload do bucket ou
+    um arquivo por parte), de modo que cada parte pode chegar a um servidor
+    diferente.
+    """
+    STATUS_CHOICES = (
+        ("recebendo", "Recebendo partes"),
+        ("concluida", "Concluída"),
+        ("anexada", "Anexada a um documento"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="sessoes_upload")
+    # Destino do arquivo: chave de api.downloads.TIPOS (ex.: "documentos-pncp")
+    tipo = models.CharField(max_length=40)
+    nome = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    tamanho = models.PositiveBigIntegerField()
+    recebido = models.PositiveBigIntegerField(default=0)
+    # Informado pelo cliente (opcional) e conferido ao concluir; depois, o calculado
+    arquivo_hash = models.CharField(max_length=80, blank=True, null=True)
+    # Nome do arquivo no storage (no bucket, definido já ao iniciar o multipart upload)
+    chave = models.CharField(max_length=500, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="recebendo")
+    # Multipart upload do bucket (S3) e partes já gravadas, em ordem:
+    # [{"numero", "tamanho", "etag" (S3) ou "nome" (arquivo da parte no storage)}]
+    upload_id = models.CharField(max_length=1024, blank=True, null=True)
+    partes = models.JSONField(default=list, blank=True)
+    # Parte em gravação: reserva curta para que duas requisições não gravem a
+    # mesma parte (a linha só fica travada para conferir/avançar 'recebido')
+    gravacao = models.UUIDField(blank=True, null=True)
+    gravando_ate = models.DateTimeField(blank=True, null=True)
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-criado_em"]
+        indexes = [
+            # Expurgo de sessões abandonadas (manage.py expurgar_uploads)
+            models.Index(fields=["status", "atualizado_em"], name="sessao_upload_status_idx"),
+        ]
+        verbose_name = "Sessão de Upload"
+        verbose_name_plural = "Sessões de Upload"
+
+    def __str__(self):
+        return f"{self.nome} ({self.recebido}/{self.tamanho} bytes, {self.status})"
+
+
+class UploadAnexado(models.Model):
+    """
+    Chave de um upload direto ao bucket já anexada a um documento: o token
+    de upload vale uma única vez (ver api/armazenamento.finalizar_upload).
+    Registros mais velhos que a validade do token podem ser expurgados.
+    """
+    chave = models.CharField(max_length=500, unique=True)
+    usuario = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="uploads_anexados")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Upload Anexado"
+        verbose_name_plural = "Uploads Anexados"
+
+    def __str__(self):
+        return self.chave
+
+
+# ============================================================
+# 🔐 TRAVAS DE OPERAÇÕES LONGAS (PNCP)
+# ============================================================
+
+class TravaOperacao(models.Model):
+    """
+    Trava por (processo, operação) para operações longas no PNCP
+    (publicação, sincronização de resultados), para que dois cliques ou dois
+    usuários não rodem a mesma sequência de chamadas em paralelo.
+
+    A trava é um arrendamento (lease): vale até 'expira_em' e é renovada
+    periodicamente enquanto a operação roda (ver api/travas.py). Se o
+    processo que a detinha morrer, ela vence e a próxima execução assume.
+    'dono' identifica a execução em andamento.
+    """
+    processo = models.ForeignKey(
+        ProcessoLicitatorio, on_delete=models.CASCADE, related_name="travas_operacao"
+    )
+    operacao = models.CharField(max_length=40)
+    dono = models.UUIDField(default=uuid.uuid4)
+    usuario = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    iniciada_em = models.DateTimeField(default=timezone.now)
+    expira_em = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["processo", "operacao"], name="trava_operacao_unica"),
+        ]
+        verbose_name = "Trava de Operação"
+        verbose_name_plural = "Travas de Operações"
+
+    def __str__(self):
+        return f"{self.operacao} do processo {self.processo_id} (até {self.expira_em:%H:%M:%S})"
+
+    @classmethod
+    def adquirir(cls, processo_id, operacao, dono, usuario=None, duracao=60):
+        """
+        Cria a trava (ou assume uma vencida) em nome da execução 'dono' e a
+        devolve; None se outra execução ainda a detém. Deve rodar fora de
+        transação: a trava só vale para os demais depois de gravada.
+        """
+        agora = timezone.now()
+        campos = {
+            "dono": dono,
+            "usuario": usuario,
+            "iniciada_em": agora,
+            "expira_em": agora + timedelta(seconds=duracao),
+        }
+        try:
+            with transaction.atomic():
+                return cls.objects.create(processo_id=processo_id, operacao=operacao, **campos)
+        except IntegrityError:
+            pass
+
+        # UPDATE condicional: só uma das execuções concorrentes assume a vencida
+        assumidas = cls.objects.filter(
+            processo_id=processo_id, operacao=operacao, expira_em__lt=agora
+        ).update(**campos)
+        if assumidas:
+            return cls.objects.get(processo_id=processo_id, operacao=operacao, dono=campos["dono"])
+        return None
+
+    @classmethod
+    def renovar(cls, pk, dono, duracao=60):
+        """Estende o arrendamento; False se a trava não é mais deste dono."""
+        return bool(
+            cls.objects.filter(pk=pk, dono=dono).update(
+                expira_em=timezone.now() + timedelta(seconds=duracao)
+            )
+        )
+
+    @classmethod
+    def liberar(cls, pk, dono):
+        cls.objects.filter(pk=pk, dono=dono).delete()
@@ -0,0 +1,210 @@
+# api/pncp_async.py
+"""
+Leituras no PNCP com cliente HTTP assíncrono (httpx), para as views de
+consulta que só repassam a resposta do portal.
+
+Sob ASGI (uvicorn/daphne) a espera pelo PNCP (até DEFAULT_TIMEOUT s) não
+prende um worker: o event loop atende outras requisições enquanto isso.
+Um AsyncClient por event loop reaproveita as conexões (keep-alive/TLS) entre
+requisições, limitado a settings.PNCP_ASYNC_MAX_CONEXOES.
+
+Sob WSGI cada requisição assíncrona roda num event loop próprio; nesse caso
+o cliente é aberto e fechado na própria chamada (sem pool).
+
+Erros seguem o PNCPService: ValueError com mensagem amigável. Os timeouts
+respeitam o prazo total da requisição (api/prazos.py).
+"""
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import prazos
+from .services import PNCPService
+
+MAX_CONEXOES = getattr(settings, "PNCP_ASYNC_MAX_CONEXOES", 100)
+
+# Um cliente por event loop (um AsyncClient não pode ser usado em outro loop)
+_clientes = weakref.WeakKeyDictionary()
+
+
+def _novo_cliente() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        verify=PNCPService.VERIFY_SSL,
+        timeout=PNCPService.DEFAULT_TIMEOUT,
+        limits=httpx.Limits(max_connections=MAX_CONEXOES, max_keepalive_connections=MAX_CONEXOES // 4 or 1),
+        follow_redirects=False,
+    )
+
+
+@asynccontextmanager
+async def cliente(compartilhado: bool = True):
+    """
+    AsyncClient para as chamadas. compartilhado=True (servidor ASGI) usa o
+    pool do event loop corrente; False abre um cliente só para este uso.
+    """
+    if not compartilhado:
+        async with _novo_cliente() as c:
+            yield c
+        return
+    loop = asyncio.get_running_loop()
+    c = _clientes.get(loop)
+    if c is None or c.is_closed:
+        c = _clientes[loop] = _novo_cliente()
+    yield c
+
+
+async def _token() -> str:
+    # Token em cache no PNCPService; o login (raro) roda numa thread
+    if PNCPService._cached_token and time.time() < PNCPService._token_expires_at:
+        return PNCPService._cached_token
+    return await sync_to_async(PNCPService._get_token, thread_sensitive=False)()
+
+
+async def _get(c: httpx.AsyncClient, caminho: str, descricao: str) -> httpx.Response:
+    """
+    GET em caminho relativo (ex.: /orgaos/...), tentando as bases de
+    consulta como o PNCPService (301 -> próxima base). Devolve a resposta
+    200 ou a última recebida. Com PNCPService.HEDGE_ATRASO, a base
+    alternativa é consultada em paralelo se a preferida demorar (ver _get_hedge).
+    """
+    headers = {"Authorization": f"Bearer {await _token()}", "accept": "*/*"}
+    urls = [f"{base}{caminho}" for base in PNCPService._candidate_consulta_base_urls()]
+    if PNCPService.HEDGE_ATRASO > 0 and len(urls) > 1:
+        return await _get_hedge(c, urls, headers, descricao)
+
+    ultima: Optional[httpx.Response] = None
+    for url in urls:
+        PNCPService._log(f"{descricao}: {url}")
+        try:
+            resp = await c.get(url, headers=headers, timeout=prazos.timeout(PNCPService.DEFAULT_TIMEOUT))
+        except httpx.HTTPError as exc:
+            raise _falha(descricao, exc) from exc
+
+        ultima = resp
+        if resp.status_code != 301:
+            return resp
+        PNCPService._log(f"{descricao} retornou 301; tentando base alternativa.", "error")
+
+    if ultima is None:
+        raise ValueError(f"Falha ao consultar o PNCP ({descricao.lower()}): nenhuma resposta recebida.")
+    return ultima
+
+
+def _falha(descricao: str, exc: Exception) -> ValueError:
+    msg = f"Falha de comunicação com PNCP ({descricao.lower()}): {exc}"
+    PNCPService._log(msg, "error")
+    return ValueError(msg)
+
+
+async def _get_hedge(c: httpx.AsyncClient, urls: List[str], headers: Dict[str, str], descricao: str) -> httpx.Response:
+    """
+    Versão com hedge de _get: decide na ordem das bases, como o laço
+    sequencial (erro de rede ou resposta diferente de 301 encerra; 301 segue
+    para a próxima). A próxima base só é chamada antes disso se a corrente
+    não responder em HEDGE_ATRASO segundos; uma 200 dela vence na hora e as
+    demais requisições são canceladas.
+    """
+    pendentes: Dict[asyncio.Task, int] = {}
+    resultados: Dict[int, Any] = {}
+    disparadas = 0
+
+    def disparar(hedge: bool = False):
+        nonlocal disparadas
+        url = urls[disparadas]
+        PNCPService._log(f"{descricao}: {url}" + (" (hedge)" if hedge else ""))
+        tarefa = asyncio.ensure_future(
+            c.get(url, headers=headers, timeout=prazos.timeout(PNCPService.DEFAULT_TIMEOUT))
+        )
+        pendentes[tarefa] = disparadas
+        disparadas += 1
+
+    ultima: Optional[httpx.Response] = None
+    try:
+        for atual in range(len(urls)):
+            if atual >= disparadas:
+                disparar()
+            while atual not in resultados:
+                feitas, _ = await asyncio.wait(
+                    pendentes,
+                    timeout=PNCPService.HEDGE_ATRASO if disparadas < len(urls) else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not feitas:
+                    disparar(hedge=True)
+                    continue
+                for tarefa in feitas:
+                    indice = pendentes.pop(tarefa)
+                    try:
+                        resp = tarefa.result()
+                    except httpx.HTTPError as exc:
+                        resultados[indice] = exc
+                        continue
+                    if resp.status_code == 200:
+                        return resp
+                    resultados[indice] = resp
+
+            resultado = resultados[atual]
+            if isinstance(resultado, Exception):
+                raise _falha(descricao, resultado) from resultado
+            ultima = resultado
+            if resultado.status_code != 301:
+                return resultado
+            PNCPService._log(f"{descricao} retornou 301; tentando base alternativa.", "error")
+    finally:
+        for tarefa in pendentes:
+            tarefa.cancel()
+    return ultima
+
+
+def _compra(cnpj_orgao: str, ano_compra: int, sequencial_compra: int) -> str:
+    return f"/orgaos/{cnpj_orgao}/compras/{int(ano_compra)}/{int(sequencial_compra)}"
+
+
+# ============================================================
+# 📄 CONSULTAS
+# ============================================================
+
+async def listar_documentos_compra(
+    c: httpx.AsyncClient, *, cnpj_orgao: str, ano_compra: int, sequencial_compra: int
+) -> List[Dict[str, Any]]:
+    """Equivalente assíncrono de PNCPService.listar_documentos_compra (6.3.8)."""
+    resp = await _get(
+        c, _compra(cnpj_orgao, ano_compra, sequencial_compra) + "/arquivos", "Listando documentos da contratação"
+    )
+    if resp.status_code != 200:
+        PNCPService._handle_error(resp)
+
+    try:
+        data = resp.json()
+    except ValueError:
+        return [{"raw_response": resp.text}]
+
+    # Lista direta ou envelope, como no serviço síncrono
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        docs = data.get("documentos") or data.get("Documentos")
+        if isinstance(docs, list):
+            return docs
+    return [data]
+
+
+async def consultar_atas(
+    c: httpx.AsyncClient, *, cnpj_orgao: str, ano_compra: int, sequencial_compra: int,
+    sequencial_ata: Optional[int] = None,
+) -> httpx.Response:
+    """
+    Atas da contratação (ou uma ata, com sequencial_ata). Devolve a resposta
+    crua: as views repassam status e corpo do PNCP ao cliente.
+    """
+    caminho = _compra(cnpj_orgao, ano_compra, sequencial_compra) + "/atas"
+    if sequencial_ata:
+        caminho += f"/{int(sequencial_ata)}"
+    return await _get(c, caminho, "Consultando atas da contratação")
@@ -0,0 +1,86 @@
+# api/prazos.py
+"""
+Prazo total (deadline) para requisições que chamam o PNCP.
+
+Um envio pode encadear login, concessão de permissão, publicação (com nova
+tentativa) e a sincronização item a item, cada passo com timeout próprio.
+Sem um teto, o proxy da frente derruba a requisição no meio e o usuário
+não fica sabendo o que foi feito.
+
+O prazo vive numa ContextVar (vale para a thread da requisição e para
+corrotinas/threads derivadas via asgiref). O PrazoMiddleware
+(backend/middleware.py) abre um prazo de settings.PNCP_PRAZO_TOTAL_SEGUNDOS
+por requisição; tarefas em segundo plano podem abrir o seu com
+`with prazos.prazo(segundos):`.
+
+- timeout(padrao): timeout da próxima chamada HTTP, encolhido ao que resta
+  do prazo; PrazoEsgotado se não sobra o mínimo para uma chamada útil.
+- dormir(segundos): pausa entre chamadas sem ultrapassar o prazo.
+- esgotado(): para loops longos pararem entre um passo e outro e
+  devolverem o resultado parcial.
+
+Sem prazo aberto (comandos, shell), tudo se comporta como antes.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+
+PRAZO_TOTAL = getattr(settings, "PNCP_PRAZO_TOTAL_SEGUNDOS", 100)
+MINIMO_CHAMADA = getattr(settings, "PNCP_PRAZO_MINIMO_CHAMADA_SEGUNDOS", 2)
+
+# Instante (time.monotonic) em que o prazo corrente acaba; None = sem prazo
+_limite: ContextVar[Optional[float]] = ContextVar("prazo_limite", default=None)
+
+
+class PrazoEsgotado(ValueError):
+    """O prazo total da requisição acabou antes do próximo passo."""
+
+    def __init__(self, mensagem="Tempo limite da operação esgotado antes da conclusão."):
+        super().__init__(mensagem)
+
+
+@contextmanager
+def prazo(segundos=None):
+    """Abre um prazo; dentro de outro, vale o que acabar primeiro."""
+    limite = time.monotonic() + (PRAZO_TOTAL if segundos is None else segundos)
+    atual = _limite.get()
+    token = _limite.set(limite if atual is None else min(atual, limite))
+    try:
+        yield
+    finally:
+        _limite.reset(token)
+
+
+def restante() -> Optional[float]:
+    """Segundos que restam do prazo corrente (None = sem prazo)."""
+    limite = _limite.get()
+    if limite is None:
+        return None
+    return max(0.0, limite - time.monotonic())
+
+
+def esgotado(minimo: float = MINIMO_CHAMADA) -> bool:
+    """True se não sobra tempo para mais uma chamada útil."""
+    sobra = restante()
+    return sobra is not None and sobra < minimo
+
+
+def timeout(padrao: float) -> float:
+    """Timeout para a próxima chamada: o menor entre o padrão e o que resta."""
+    sobra = restante()
+    if sobra is None:
+        return padrao
+    if sobra < MINIMO_CHAMADA:
+        raise PrazoEsgotado()
+    return min(padrao, sobra)
+
+
+def dormir(segundos: float) -> None:
+    """time.sleep que não passa do prazo."""
+    sobra = restante()
+    time.sleep(segundos if sobra is None else min(segundos, sobra))
+
@@ -0,0 +1,122 @@
+# api/processamento.py
+"""
+Pool de processos compartilhado para trabalho pesado de CPU disparado por
+requisições (hoje: leitura e interpretação de planilhas XLSX).
+
+Código Python puro (ex.: o parser XML do openpyxl) segura o GIL: rodando na
+thread da requisição, trava as demais threads do mesmo worker (gthread) e
+todos os usuários atendidos por ele sentem a lentidão. Aqui o trabalho roda
+em processos filhos; a thread da requisição só espera o resultado.
+
+- Tamanho do pool: settings.PROCESSAMENTO_MAX_PROCESSOS por processo web
+  (0 = executa na própria thread, útil em desenvolvimento).
+- Contrapressão: no máximo settings.PROCESSAMENTO_FILA_MAXIMA trabalhos
+  em andamento ou na fila por processo web. Com a fila cheia, executar()
+  espera até 'espera' segundos por uma vaga e levanta PoolOcupado.
+- Tempo limite: executar() levanta TempoEsgotado após 'timeout' segundos.
+  O trabalho já iniciado não é interrompido (um processo do pool não pode
+  ser cancelado), mas continua ocupando a vaga da fila até terminar, de
+  modo que trabalhos travados não se acumulam sem limite.
+- Os filhos sobem com forkserver (sem herdar threads/conexões do processo
+  web) e rodam django.setup(); não devem acessar o banco.
+
+As funções enviadas e seus argumentos/retornos precisam ser serializáveis
+com pickle (funções de módulo ou classmethods).
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturoTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger("api")
+
+MAX_PROCESSOS = getattr(settings, "PROCESSAMENTO_MAX_PROCESSOS", 2)
+FILA_MAXIMA = getattr(settings, "PROCESSAMENTO_FILA_MAXIMA", 8)
+TIMEOUT = getattr(settings, "PROCESSAMENTO_TIMEOUT_SEGUNDOS", 300)
+ESPERA_FILA = getattr(settings, "PROCESSAMENTO_ESPERA_FILA_SEGUNDOS", 5)
+
+
+class PoolOcupado(ValueError):
+    """Fila do pool cheia: o chamador deve responder 503 / tentar depois."""
+
+
+class TempoEsgotado(ValueError):
+    """O trabalho não terminou dentro do tempo limite."""
+
+
+_trava = threading.Lock()
+_vagas = threading.BoundedSemaphore(FILA_MAXIMA)
+_pool = None
+_pool_pid = None
+
+
+def _inicializar_filho():
+    import django
+
+    django.setup()
+
+
+def _contexto():
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+
+def _obter_pool():
+    global _pool, _pool_pid
+    with _trava:
+        # Depois de um fork (gunicorn --preload) o pool herdado não serve
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_PROCESSOS,
+                mp_context=_contexto(),
+                initializer=_inicializar_filho,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _descartar_pool(pool):
+    global _pool
+    with _trava:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def executar(funcao, *args, timeout=TIMEOUT, espera=ESPERA_FILA, **kwargs):
+    """
+    Executa funcao(*args, **kwargs) num processo do pool e devolve o
+    resultado (exceções da função são relançadas aqui). espera=None aguarda
+    vaga na fila indefinidamente (tarefas em segundo plano).
+    """
+    if MAX_PROCESSOS <= 0:
+        return funcao(*args, **kwargs)
+
+    if not _vagas.acquire(timeout=espera):
+        raise PoolOcupado("Servidor ocupado processando outros arquivos; tente novamente em instantes.")
+
+    pool = _obter_pool()
+    try:
+        futuro = pool.submit(funcao, *args, **kwargs)
+    except BaseException:
+        _vagas.release()
+        raise
+    # A vaga só é devolvida quando o trabalho termina de fato (mesmo após timeout)
+    futuro.add_done_callback(lambda _: _vagas.release())
+
+    try:
+        return futuro.result(timeout=timeout)
+    except FuturoTimeout:
+        futuro.cancel()
+        logger.warning("Trabalho %s excedeu %ss no pool de processos", getattr(funcao, "__qualname__", funcao), timeout)
+        raise TempoEsgotado("O processamento excedeu o tempo limite.")
+    except BrokenProcessPool:
+        # Um filho morreu (OOM, sinal): recria o pool na próxima chamada
+        logger.exception("Pool de processos quebrado; será recriado")
+        _descartar_pool(pool)
+        raise
@@ -2,6 +2,7 @@ import re
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Prefetch
 from .models import (
     CustomUser,
     Entidade,
@@ -21,6 +22,8 @@ from .models import (
     ProcessoDocumentoLinha,
     AtaRegistroPrecos,
     DocumentoAtaRegistroPrecos,
+    TarefaProcessamento,
+    SessaoUpload,
 )
 from .choices import (
     MAP_MODALIDADE_PNCP,
@@ -33,6 +36,7 @@ from .choices import (
     MAP_CRITERIO_JULGAMENTO_PNCP,
     MAP_INSTRUMENTO_CONVOCATORIO_PNCP,
 )
+from . import downloads
 
 User = get_user_model()
 
@@ -320,6 +324,8 @@ class ProcessoLicitatorioSerializer(serializers.ModelSerializer):
             "pncp_link",
             "pncp_ultimo_retorno",
             "data_criacao_sistema",
+            "versao",
+            "atualizado_em",
         )
 
     def get_modalidade_nome(self, obj):
@@ -345,7 +351,7 @@ class ProcessoLicitatorioSerializer(serializers.ModelSerializer):
 class LoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lote
-        fields = ("id", "processo", "numero", "descricao")
+        fields = ("id", "processo", "numero", "descricao", "atualizado_em")
 
 
 # ============================================================
@@ -382,6 +388,7 @@ class ItemSerializer(serializers.ModelSerializer):
     processo_numero = serializers.CharField(source="processo.numero_processo", read_only=True)
     lote_numero = serializers.IntegerField(source="lote.numero", read_only=True)
     fornecedor_nome = serializers.CharField(source="fornecedor.razao_social", read_only=True)
+    numero_item = serializers.SerializerMethodField()
 
     situacao_item_nome = serializers.SerializerMethodField()
     tipo_beneficio_nome = serializers.SerializerMethodField()
@@ -404,6 +411,7 @@ class ItemSerializer(serializers.ModelSerializer):
             "valor_estimado",
             "valor_homologado",
             "ordem",
+            "numero_item",
             "natureza",
             "situacao_item",
             "situacao_item_nome",
@@ -413,8 +421,17 @@ class ItemSerializer(serializers.ModelSerializer):
             "categoria_item_nome",
             "pncp_numero_item",
             "pncp_ultima_atualizacao",
+            "atualizado_em",
         )
 
+    def get_numero_item(self, obj):
+        """Número sequencial (1..N) do item no processo; 'ordem' é só a chave de ordenação."""
+        # Cache por processo compartilhado entre os itens de uma mesma listagem
+        cache = self.context.setdefault("_numeracao_itens", {})
+        if obj.processo_id not in cache:
+            cache[obj.processo_id] = obj.processo.numeracao_itens()
+        return cache[obj.processo_id].get(obj.id)
+
     def get_situacao_item_nome(self, obj):
         return MAP_SITUACAO_ITEM_PNCP.get(obj.situacao_item)
 
@@ -425,6 +442,36 @@ class ItemSerializer(serializers.ModelSerializer):
         return MAP_CATEGORIA_ITEM_PNCP.get(obj.categoria_item)
 
 
+class ItemBulkSerializer(serializers.ModelSerializer):
+    """
+    Linha do cadastro em lote de itens (ItemViewSet.bulk).
+    Lote e fornecedor chegam como IDs simples e são conferidos em lote pela
+    view, sem uma consulta por linha. Linhas com 'id' atualizam o item.
+    """
+    id = serializers.IntegerField(required=False)
+    lote = serializers.IntegerField(required=False, allow_null=True)
+    fornecedor = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Item
+        fields = (
+            "id",
+            "lote",
+            "fornecedor",
+            "descricao",
+            "especificacao",
+            "unidade",
+            "quantidade",
+            "valor_estimado",
+            "valor_homologado",
+            "natureza",
+            "situacao_item",
+            "tipo_beneficio",
+            "categoria_item",
+        )
+        validators = []
+
+
 # ============================================================
 # 🔗 FORNECEDOR ↔ PROCESSO
 # ============================================================
@@ -464,6 +511,7 @@ class ItemFornecedorSerializer(serializers.ModelSerializer):
             "fornecedor_razao_social",
             "valor_proposto",
             "vencedor",
+            "atualizado_em",
         )
 
 
@@ -542,11 +590,15 @@ class ContratoEmpenhoSerializer(serializers.ModelSerializer):
         if not cnpj or not obj.processo_id:
             return None
 
-        queryset = Fornecedor.objects.filter(processos__processo=obj.processo).distinct()
-        for fornecedor in queryset:
-            if _clean_digits(fornecedor.cnpj) == cnpj:
-                return fornecedor
-        return None
+        # Fornecedores do processo indexados por CNPJ, uma consulta por processo na listagem
+        cache = self.context.setdefault("_fornecedores_por_processo", {})
+        if obj.processo_id not in cache:
+            por_cnpj = {}
+            queryset = Fornecedor.objects.filter(processos__processo_id=obj.processo_id).distinct().order_by("pk")
+            for fornecedor in queryset:
+                por_cnpj.setdefault(_clean_digits(fornecedor.cnpj), fornecedor)
+            cache[obj.processo_id] = por_cnpj
+        return cache[obj.processo_id].get(cnpj)
 
     def get_fornecedor(self, obj):
         fornecedor = self._get_fornecedor_obj(obj)
@@ -563,14 +615,28 @@ class ContratoEmpenhoSerializer(serializers.ModelSerializer):
     def get_unidade_nome(self, obj):
         if not obj.unidade_codigo or not obj.processo_id or not obj.processo.entidade_id:
             return None
-        orgao = obj.processo.entidade.orgaos.filter(codigo_unidade=obj.unidade_codigo).first()
-        return orgao.nome if orgao else None
+        entidade_id = obj.processo.entidade_id
+        cache = self.context.setdefault("_unidades_por_entidade", {})
+        if entidade_id not in cache:
+            nomes = {}
+            orgaos = (
+                Orgao.objects.filter(entidade_id=entidade_id, codigo_unidade__isnull=False)
+                .order_by("pk")
+                .values_list("codigo_unidade", "nome")
+            )
+            for codigo, nome in orgaos:
+                nomes.setdefault(codigo, nome)
+            cache[entidade_id] = nomes
+        return cache[entidade_id].get(obj.unidade_codigo)
 
     def get_valor_contratado(self, obj):
         return obj.valor_global if obj.valor_global is not None else obj.valor_inicial
 
     def get_documentos_pendentes(self, obj):
-        docs = obj.documentos.filter(ativo=True).exclude(status="removido")
+        # 'documentos_ativos' vem do Prefetch das listagens; sem ele, consulta direto
+        docs = getattr(obj, "documentos_ativos", None)
+        if docs is None:
+            docs = obj.documentos.filter(ativo=True).exclude(status="removido")
         presentes = {
             infer_chave_documento_contrato(doc.chave_documento, doc.titulo, doc.arquivo_nome, doc.tipo_documento_id)
             for doc in docs
@@ -585,6 +651,15 @@ class ContratoEmpenhoSerializer(serializers.ModelSerializer):
     def get_documentos_obrigatorios_ok(self, obj):
         return len(self.get_documentos_pendentes(obj)) == 0
 
+    @staticmethod
+    def prefetch_documentos():
+        """Prefetch usado pelas listagens para evitar consultas por contrato."""
+        return Prefetch(
+            "documentos",
+            queryset=DocumentoContrato.objects.filter(ativo=True).exclude(status="removido"),
+            to_attr="documentos_ativos",
+        )
+
     def validate(self, attrs):
         processo = attrs.get("processo") or getattr(self.instance, "processo", None)
         if not processo:
@@ -677,12 +752,7 @@ class DocumentoContratoSerializer(serializers.ModelSerializer):
         )
 
     def get_arquivo_url(self, obj):
-        if obj.arquivo and hasattr(obj.arquivo, "url"):
-            request = self.context.get("request")
-            if request:
-                return request.build_absolute_uri(obj.arquivo.url)
-            return obj.arquivo.url
-        return None
+        return downloads.url_download(self.context.get("request"), "documentos-contratos", obj)
 
     def get_tipo_documento_nome(self, obj):
         return CONTRATO_TIPO_DOC_MAPA.get(obj.tipo_documento_id, f"Tipo {obj.tipo_documento_id}")
@@ -706,17 +776,41 @@ class DocumentoContratoSerializer(serializers.ModelSerializer):
 # 📝 ANOTAÇÕES
 # ============================================================
 
+class UsuariosEmLoteField(serializers.ManyRelatedField):
+    """
+    Lista de ids de usuários validada com uma única consulta (in_bulk), em
+    vez de um .get() por id como no PrimaryKeyRelatedField(many=True).
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("child_relation", serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all()))
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        ids = []
+        for pk in data:
+            try:
+                ids.append(int(pk))
+            except (TypeError, ValueError):
+                self.child_relation.fail("incorrect_type", data_type=type(pk).__name__)
+        usuarios = self.child_relation.get_queryset().in_bulk(ids)
+        for pk in ids:
+            if pk not in usuarios:
+                self.child_relation.fail("does_not_exist", pk_value=pk)
+        return [usuarios[pk] for pk in dict.fromkeys(ids)]
+
+
 class AnotacaoSerializer(serializers.ModelSerializer):
     usuario_nome = serializers.CharField(source="usuario.username", read_only=True)
     # Aliases: o frontend envia/lê "text" e "date"
     text = serializers.CharField(source="texto")
     date = serializers.DateTimeField(source="criado_em", read_only=True)
     processo_numero = serializers.CharField(source="processo.numero_processo", read_only=True)
-    compartilhada_com = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=CustomUser.objects.all(),
-        required=False,
-    )
+    compartilhada_com = UsuariosEmLoteField(required=False)
     compartilhada_com_nomes = serializers.SerializerMethodField()
     shared_usernames = serializers.ListField(
         child=serializers.CharField(),
@@ -740,6 +834,11 @@ class AnotacaoSerializer(serializers.ModelSerializer):
         ]
 
     def _resolve_shared_users(self, validated_data):
+        """
+        Filtra os destinatários numa única consulta: cada candidato vem com
+        os flags "bloqueou o ator" e "compartilha entidade" anotados via
+        EXISTS, em vez de duas consultas por destinatário.
+        """
         request = self.context.get("request")
         actor = getattr(request, "user", None)
         shared_usernames = validated_data.pop("shared_usernames", None)
@@ -748,48 +847,63 @@ class AnotacaoSerializer(serializers.ModelSerializer):
 
         if shared_usernames is not None:
             usernames = [u.strip() for u in shared_usernames if str(u).strip()]
-            recipients = list(CustomUser.objects.filter(username__in=usernames))
-
-        if recipients is None:
+            candidatos = CustomUser.objects.filter(username__in=usernames)
+        elif recipients is not None:
+            candidatos = CustomUser.objects.filter(pk__in=[u.pk for u in recipients])
+        else:
             return None
 
-        actor_entidade_ids = set(actor.entidades.values_list("id", flat=True)) if actor else set()
-
-        filtered = []
-        for user in recipients:
-            if actor and user.id == actor.id:
-                continue
-            if not user.receber_anotacoes_compartilhadas:
-                continue
-            if actor and user.usuarios_bloqueados.filter(id=actor.id).exists():
-                continue
-
-            # Regra de privacidade por entidade
-            if processo and processo.entidade_id:
-                if not user.entidades.filter(id=processo.entidade_id).exists():
-                    continue
-            else:
-                # Sem processo: só compartilha com quem intersecta entidade do ator
-                if not actor_entidade_ids:
-                    continue
-                if not user.entidades.filter(id__in=actor_entidade_ids).exists():
-                    continue
-
-            filtered.append(user)
-        return filtered
+        # Regra de privacidade por entidade: a do processo ou, sem processo,
+        # qualquer entidade do ator
+        if processo and processo.entidade_id:
+            entidades = [processo.entidade_id]
+        elif actor:
+            entidades = actor.entidades.values("id")
+        else:
+            return []
+
+        candidatos = candidatos.filter(receber_anotacoes_compartilhadas=True).annotate(
+            compartilha_entidade=Exists(
+                CustomUser.entidades.through.objects.filter(
+                    customuser_id=OuterRef("pk"), entidade_id__in=entidades
+                )
+            ),
+        )
+        if actor:
+            candidatos = candidatos.exclude(pk=actor.pk).annotate(
+                bloqueou_ator=Exists(
+                    CustomUser.usuarios_bloqueados.through.objects.filter(
+                        from_customuser_id=OuterRef("pk"), to_customuser_id=actor.pk
+                    )
+                ),
+            ).filter(bloqueou_ator=False)
+
+        return list(candidatos.filter(compartilha_entidade=True))
+
+    def _gravar_compartilhamento(self, anotacao, recipients, nova):
+        if nova:
+            # Anotação recém-criada não tem vínculos: um único INSERT em lote
+            through = Anotacao.compartilhada_com.through
+            through.objects.bulk_create(
+                [through(anotacao_id=anotacao.pk, customuser_id=u.pk) for u in recipients]
+            )
+        else:
+            anotacao.compartilhada_com.set(recipients)
+        # Descarta o prefetch (se houver) para a resposta refletir a gravação
+        getattr(anotacao, "_prefetched_objects_cache", {}).pop("compartilhada_com", None)
 
     def create(self, validated_data):
         recipients = self._resolve_shared_users(validated_data)
         anotacao = super().create(validated_data)
-        if recipients is not None:
-            anotacao.compartilhada_com.set(recipients)
+        if recipients:
+            self._gravar_compartilhamento(anotacao, recipients, nova=True)
         return anotacao
 
     def update(self, instance, validated_data):
         recipients = self._resolve_shared_users(validated_data)
         anotacao = super().update(instance, validated_data)
         if recipients is not None:
-            anotacao.compartilhada_com.set(recipients)
+            self._gravar_compartilhamento(anotacao, recipients, nova=False)
         return anotacao
 
 
@@ -837,6 +951,8 @@ class NotificacaoSerializer(serializers.ModelSerializer):
 # ============================================================
 
 class ArquivoUserSerializer(serializers.ModelSerializer):
+    # Opcional: com upload direto ao bucket o arquivo chega como token (ver views)
+    arquivo = serializers.FileField(required=False)
     arquivo_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -845,10 +961,7 @@ class ArquivoUserSerializer(serializers.ModelSerializer):
         read_only_fields = ("usuario", "arquivo_url", "enviado_em")
 
     def get_arquivo_url(self, obj):
-        try:
-            return obj.arquivo.url if obj.arquivo else None
-        except Exception:
-            return None
+        return downloads.url_download(self.context.get("request"), "arquivos-user", obj)
 
 
 # ============================================================
@@ -898,10 +1011,7 @@ class DocumentoPNCPSerializer(serializers.ModelSerializer):
         )
 
     def get_arquivo_url(self, obj):
-        try:
-            return obj.arquivo.url if obj.arquivo else None
-        except Exception:
-            return None
+        return downloads.url_download(self.context.get("request"), "documentos-pncp", obj)
 
     def get_tipo_documento_nome(self, obj):
         mapa = {
@@ -973,6 +1083,7 @@ class AtaRegistroPrecosSerializer(serializers.ModelSerializer):
             "pncp_publicada_em",
             "ativo",
             "criado_em",
+            "atualizado_em",
         )
         read_only_fields = (
             "status",
@@ -1023,10 +1134,7 @@ class DocumentoAtaRegistroPrecosSerializer(serializers.ModelSerializer):
         )
 
     def get_arquivo_url(self, obj):
-        try:
-            return obj.arquivo.url if obj.arquivo else None
-        except Exception:
-            return None
+        return downloads.url_download(self.context.get("request"), "documentos-atas", obj)
 
     def get_tipo_documento_nome(self, obj):
         return TIPO_DOC_MAPA.get(obj.tipo_documento_id, f"Tipo {obj.tipo_documento_id}")
@@ -1034,4 +1142,54 @@ class DocumentoAtaRegistroPrecosSerializer(serializers.ModelSerializer):
     def get_ata_display(self, obj):
         if not obj.ata:
             return None
-        return f"Ata {obj.ata.numero_ata}/{obj.ata.ano_ata}"
\ No newline at end of file
+        return f"Ata {obj.ata.numero_ata}/{obj.ata.ano_ata}"
+
+
+# ============================================================
+# ⚙️ TAREFAS EM SEGUNDO PLANO
+# ============================================================
+
+class TarefaProcessamentoSerializer(serializers.ModelSerializer):
+    tipo_nome = serializers.CharField(source="get_tipo_display", read_only=True)
+    progresso = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = TarefaProcessamento
+        fields = (
+            "id",
+            "tipo",
+            "tipo_nome",
+            "status",
+            "processo",
+            "total",
+            "processados",
+            "progresso",
+            "mensagem",
+            "resultado",
+            "criado_em",
+            "atualizado_em",
+            "concluido_em",
+        )
+        read_only_fields = fields
+
+
+# ============================================================
+# 🧩 UPLOADS EM PARTES
+# ============================================================
+
+class SessaoUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SessaoUpload
+        fields = (
+            "id",
+            "tipo",
+            "nome",
+            "content_type",
+            "tamanho",
+            "recebido",
+            "arquivo_hash",
+            "status",
+            "criado_em",
+            "atualizado_em",
+        )
+        read_only_fields = fields
@@ -3,29 +3,74 @@
 import base64
 import json
 import logging
+import os
+import pickle
 import re
+import shutil
 import sys
+import tempfile
+import threading
 import time
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack
 from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
 from typing import Any, Dict, IO, List, Optional
 from urllib.parse import urlparse
 
 import pytz
 import requests
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
 from django.utils import timezone
 
+from . import prazos, processamento
+from .armazenamento import CorpoMultipart
 # Importação do Model para tipagem e uso no ImportacaoService
-from .models import ProcessoLicitatorio
+from .models import (
+    EntidadeFornecedor,
+    Fornecedor,
+    FornecedorProcesso,
+    Item,
+    ItemFornecedor,
+    Lote,
+    ProcessoLicitatorio,
+)
 from .choices import (
     MAP_MODALIDADE_MODO_DISPUTA,
     MAP_MODALIDADE_INSTRUMENTO,
     MAP_MODALIDADE_CRITERIO_JULGAMENTO,
     MAP_MODALIDADE_AMPARO,
+    NATUREZAS_DESPESA_CHOICES,
 )
 
 logger = logging.getLogger("api")
 
+# Threads para as leituras de hedge (base alternativa) do PNCP; a primeira
+# tentativa não passa por aqui, para não esperar na fila deste pool
+_executor_leituras = ThreadPoolExecutor(
+    max_workers=getattr(settings, "PNCP_HEDGE_MAX_THREADS", 8),
+    thread_name_prefix="pncp-leitura",
+)
+
+
+def _em_thread_propria(funcao, *args) -> Future:
+    """Executa funcao(*args) numa thread nova, já iniciada; devolve o Future."""
+    futuro = Future()
+
+    def executar():
+        if not futuro.set_running_or_notify_cancel():
+            return
+        try:
+            futuro.set_result(funcao(*args))
+        except BaseException as exc:
+            futuro.set_exception(exc)
+
+    threading.Thread(target=executar, name="pncp-leitura-principal", daemon=True).start()
+    return futuro
+
 
 class PNCPService:
     """
@@ -49,6 +94,10 @@ class PNCPService:
     DEFAULT_TIMEOUT: int = 30
     VERIFY_SSL: bool = getattr(settings, "PNCP_VERIFY_SSL", False)
 
+    # Leituras com hedge: sem resposta da base preferida em tantos segundos,
+    # a mesma consulta vai também para a base alternativa (0 = desligado)
+    HEDGE_ATRASO: float = getattr(settings, "PNCP_HEDGE_ATRASO_SEGUNDOS", 0)
+
     # Cache de token: evita re-autenticação a cada chamada
     _cached_token: Optional[str] = None
     _token_expires_at: float = 0.0  # timestamp Unix
@@ -122,7 +171,7 @@ class PNCPService:
                 url,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Erro ao conectar ao PNCP para login: {exc}"
@@ -193,7 +242,7 @@ class PNCPService:
                 headers=headers,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             cls._log(
@@ -269,6 +318,103 @@ class PNCPService:
         bases = cls._candidate_base_urls()
         return sorted(bases, key=lambda base: 0 if "/api/consulta/" in base else 1)
 
+    @classmethod
+    def _get_leitura(cls, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+        return requests.get(url, headers=headers, verify=cls.VERIFY_SSL, timeout=timeout)
+
+    @classmethod
+    def _leituras_alternativas(cls, urls: List[str], headers: Dict[str, str], descricao: Optional[str] = None):
+        """
+        GETs idempotentes da mesma consulta em bases alternativas. Gera
+        (url, resposta, erro) para o chamador decidir se para ou segue.
+
+        Sem hedge (HEDGE_ATRASO = 0): uma URL por vez, na ordem, e a próxima
+        só é chamada se o chamador seguir adiante.
+
+        Com hedge: as respostas continuam entregues na ordem das URLs, e a
+        próxima URL só é chamada antes de o chamador decidir se a corrente
+        não responder em HEDGE_ATRASO segundos. Nesse caso ela vai para o
+        pool de hedge e, se responder 200 primeiro, é entregue na hora (a
+        primeira boa vence). Uma resposta rápida da base preferida (200, 404,
+        5xx ou erro) é entregue sem disparar a alternativa. A primeira
+        tentativa roda numa thread própria, que começa na hora (o relógio do
+        hedge não inclui fila), deixando a thread do chamador livre para
+        devolver o hedge se ele vencer; a última URL, sem hedge possível,
+        roda na própria thread do chamador.
+        """
+        if cls.HEDGE_ATRASO <= 0 or len(urls) < 2:
+            for url in urls:
+                if descricao:
+                    cls._log(f"{descricao}: {url}")
+                try:
+                    resp = cls._get_leitura(url, headers, prazos.timeout(cls.DEFAULT_TIMEOUT))
+                except requests.exceptions.RequestException as exc:
+                    yield url, None, exc
+                else:
+                    yield url, resp, None
+            return
+
+        em_voo: Dict[int, Future] = {}
+        entregues = set()
+
+        def disparar(hedge: bool):
+            indice = len(em_voo)
+            url = urls[indice]
+            if descricao:
+                cls._log(f"{descricao}: {url}" + (" (hedge)" if hedge else ""))
+            # O timeout é calculado aqui: a ContextVar do prazo não chega às threads
+            timeout = prazos.timeout(cls.DEFAULT_TIMEOUT)
+            if hedge:
+                em_voo[indice] = _executor_leituras.submit(cls._get_leitura, url, headers, timeout)
+            else:
+                em_voo[indice] = _em_thread_propria(cls._get_leitura, url, headers, timeout)
+
+        def resultado(futuro):
+            try:
+                return futuro.result(), None
+            except requests.exceptions.RequestException as exc:
+                return None, exc
+
+        for atual, url in enumerate(urls):
+            if atual in entregues:
+                continue
+
+            if atual not in em_voo and atual == len(urls) - 1:
+                # Última URL e nada em paralelo: na thread do chamador
+                entregues.add(atual)
+                if descricao:
+                    cls._log(f"{descricao}: {url}")
+                try:
+                    yield url, cls._get_leitura(url, headers, prazos.timeout(cls.DEFAULT_TIMEOUT)), None
+                except requests.exceptions.RequestException as exc:
+                    yield url, None, exc
+                continue
+
+            if atual not in em_voo:
+                disparar(hedge=False)
+            limite_hedge = time.monotonic() + cls.HEDGE_ATRASO
+            while not em_voo[atual].done():
+                pendentes = [f for f in em_voo.values() if not f.done()]
+                espera = max(0.0, limite_hedge - time.monotonic()) if len(em_voo) < len(urls) else None
+                feitos, _ = wait(pendentes, timeout=espera, return_when=FIRST_COMPLETED)
+                if not feitos:
+                    disparar(hedge=True)
+                    limite_hedge = time.monotonic() + cls.HEDGE_ATRASO
+                    continue
+                # Hedge que respondeu 200 antes da corrente: entregue já
+                for indice in range(atual + 1, len(em_voo)):
+                    futuro = em_voo[indice]
+                    if indice in entregues or not futuro.done():
+                        continue
+                    resp, erro = resultado(futuro)
+                    if resp is not None and resp.status_code == 200:
+                        entregues.add(indice)
+                        yield urls[indice], resp, None
+
+            entregues.add(atual)
+            resp, erro = resultado(em_voo[atual])
+            yield url, resp, erro
+
     # ------------------------------------------------------------------ #
     # 6.3.5 – Consultar uma Contratação                                  #
     # ------------------------------------------------------------------ #
@@ -292,22 +438,13 @@ class PNCPService:
             "accept": "*/*",
         }
         last_response: Optional[requests.Response] = None
+        urls = [
+            f"{base}/orgaos/{cnpj_orgao}/compras/{int(ano_compra)}/{int(sequencial_compra)}"
+            for base in cls._candidate_consulta_base_urls()
+        ]
 
-        for base in cls._candidate_consulta_base_urls():
-            url = (
-                f"{base}/orgaos/{cnpj_orgao}/compras/"
-                f"{int(ano_compra)}/{int(sequencial_compra)}"
-            )
-            cls._log(f"Consultando contratação no PNCP: {url}")
-
-            try:
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
-                )
-            except requests.exceptions.RequestException as exc:
+        for url, resp, exc in cls._leituras_alternativas(urls, headers, "Consultando contratação no PNCP"):
+            if exc is not None:
                 msg = f"Falha de comunicação com PNCP (consultar contratação): {exc}"
                 cls._log(msg, "error")
                 raise ValueError(msg) from exc
@@ -354,23 +491,13 @@ class PNCPService:
             "accept": "*/*",
         }
         last_response: Optional[requests.Response] = None
+        urls = [
+            f"{base}/orgaos/{cnpj_orgao}/compras/{int(ano_compra)}/{int(sequencial_compra)}/arquivos"
+            for base in cls._candidate_consulta_base_urls()
+        ]
 
-        for base in cls._candidate_consulta_base_urls():
-            url = (
-                f"{base}/orgaos/{cnpj_orgao}/compras/"
-                f"{int(ano_compra)}/{int(sequencial_compra)}/arquivos"
-            )
-
-            cls._log(f"Listando documentos da contratação: {url}")
-
-            try:
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
-                )
-            except requests.exceptions.RequestException as exc:
+        for url, resp, exc in cls._leituras_alternativas(urls, headers, "Listando documentos da contratação"):
+            if exc is not None:
                 msg = f"Falha de comunicação com PNCP (listar documentos): {exc}"
                 cls._log(msg, "error")
                 raise ValueError(msg) from exc
@@ -425,9 +552,6 @@ class PNCPService:
         """
         token = cls._get_token()
 
-        if hasattr(arquivo, "seek"):
-            arquivo.seek(0)
-
         url = (
             f"{cls.BASE_URL}/orgaos/{cnpj_orgao}/compras/"
             f"{int(ano_compra)}/{int(sequencial_compra)}/arquivos"
@@ -440,13 +564,9 @@ class PNCPService:
             "accept": "*/*",
         }
 
-        files = {
-            "arquivo": (
-                getattr(arquivo, "name", "documento.pdf"),
-                arquivo,
-                content_type,
-            )
-        }
+        # Corpo em fluxo: o PDF não é carregado inteiro em memória
+        corpo = CorpoMultipart("arquivo", arquivo, content_type)
+        headers["Content-Type"] = corpo.content_type
 
         cls._log(f"Anexando documento à contratação: {url}")
 
@@ -454,9 +574,9 @@ class PNCPService:
             resp = requests.post(
                 url,
                 headers=headers,
-                files=files,
+                data=corpo,
                 verify=cls.VERIFY_SSL,
-                timeout=90,
+                timeout=prazos.timeout(90),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (anexar documento): {exc}"
@@ -527,7 +647,7 @@ class PNCPService:
                 headers=headers,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (excluir documento): {exc}"
@@ -586,7 +706,7 @@ class PNCPService:
                 headers=headers,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (atualizar documento): {exc}"
@@ -696,7 +816,7 @@ class PNCPService:
         user_id = cls._extrair_user_id(token)
         if user_id:
             cls._garantir_permissao(token, user_id, cnpj_orgao)
-            time.sleep(1)
+            prazos.dormir(1)
 
         # --- Datas (fuso São Paulo) --------------------------------------
         dt_abertura: datetime = processo.data_abertura or datetime.now()
@@ -816,7 +936,9 @@ class PNCPService:
         # Serviço(2), Obra(3), Serv.Eng(4), TIC(5), Locação(6), Obras+Eng(8)
         service_like_categories = {2, 3, 4, 5, 6, 8}
 
-        for idx, item in enumerate(itens_qs.all(), start=1):
+        # numeroItem é sempre a sequência densa 1..N (Item.ordem guarda ranks esparsos)
+        itens_publicados = []
+        for idx, item in enumerate(itens_qs.order_by("ordem", "id"), start=1):
             vl_unit = float(item.valor_estimado or 0)
             qtd = float(item.quantidade or 1)
 
@@ -843,7 +965,7 @@ class PNCPService:
             # enviado com valor incompatível com a modalidade causa 422.
             # Solução: omitir itemCategoriaId (o PNCP aceita sem ele).
             item_payload = {
-                "numeroItem": item.ordem or idx,
+                "numeroItem": idx,
                 "materialOuServico": tipo_ms,
                 "tipoBeneficioId": int(item.tipo_beneficio or 1),
                 "incentivoProdutivoBasico": False,
@@ -859,6 +981,8 @@ class PNCPService:
             }
 
             payload["itensCompra"].append(item_payload)
+            item.pncp_numero_item = idx
+            itens_publicados.append(item)
 
         if hasattr(arquivo, "seek"):
             arquivo.seek(0)
@@ -872,8 +996,11 @@ class PNCPService:
         )
 
         # ===== LOG DIAGNÓSTICO: PAYLOAD JSON COMPLETO =====
-        logger.debug("[PNCP] ======= PAYLOAD JSON COMPLETO =======")
-        logger.debug("%s", json.dumps(payload, ensure_ascii=False, indent=2))
+        # json.dumps com indent usa o codificador em Python puro (lento e
+        # segurando o GIL): só gera o texto se o nível DEBUG estiver ativo
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[PNCP] ======= PAYLOAD JSON COMPLETO =======")
+            logger.debug("%s", json.dumps(payload, ensure_ascii=False, indent=2))
 
         files = {
             "documento": (
@@ -891,12 +1018,13 @@ class PNCPService:
             "Tipo-Documento-Id": str(int(tipo_documento_id)),
         }
 
-        logger.info(
-            "[PNCP SEND] URL: %s | Payload: %s | Headers: %s",
-            url,
-            json.dumps(payload, ensure_ascii=False),
-            str(headers)[:200],
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "[PNCP SEND] URL: %s | Payload: %s | Headers: %s",
+                url,
+                json.dumps(payload, ensure_ascii=False),
+                str(headers)[:200],
+            )
 
         cls._log(f"Enviando requisição de publicação de compra para: {url}")
 
@@ -906,7 +1034,7 @@ class PNCPService:
                 headers=headers,
                 files=current_files,
                 verify=cls.VERIFY_SSL,
-                timeout=90,
+                timeout=prazos.timeout(90),
             )
 
         try:
@@ -955,6 +1083,12 @@ class PNCPService:
 
         if response.status_code in (200, 201):
             cls._log("Compra publicada com sucesso no PNCP.")
+            # Fixa a numeração enviada: reordenações posteriores não alteram o numeroItem
+            agora = timezone.now()
+            for item in itens_publicados:
+                item.atualizado_em = agora
+            Item.objects.bulk_update(itens_publicados, ["pncp_numero_item", "atualizado_em"])
+            ProcessoLicitatorio.registrar_alteracao(processo.pk)
             try:
                 return response.json()
             except ValueError:
@@ -994,8 +1128,9 @@ class PNCPService:
         }
 
         cls._log(f"Inserindo {len(itens_payload)} item(ns) no PNCP: {url}")
-        logger.debug("[PNCP] Inserir itens payload: %s",
-                       json.dumps(itens_payload, ensure_ascii=False))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[PNCP] Inserir itens payload: %s",
+                         json.dumps(itens_payload, ensure_ascii=False))
 
         try:
             resp = requests.post(
@@ -1003,7 +1138,7 @@ class PNCPService:
                 headers=headers,
                 json=itens_payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (inserir itens): {exc}"
@@ -1052,8 +1187,9 @@ class PNCPService:
         }
 
         cls._log(f"Inserindo resultado do item {numero_item} no PNCP: {url}")
-        logger.debug("[PNCP] Resultado item %s payload: %s",
-                       numero_item, json.dumps(resultado_payload, ensure_ascii=False))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[PNCP] Resultado item %s payload: %s",
+                         numero_item, json.dumps(resultado_payload, ensure_ascii=False))
 
         try:
             resp = requests.post(
@@ -1061,7 +1197,7 @@ class PNCPService:
                 headers=headers,
                 json=resultado_payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (resultado item {numero_item}): {exc}"
@@ -1119,7 +1255,7 @@ class PNCPService:
                     headers=headers,
                     json=resultado_payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = (
@@ -1183,28 +1319,20 @@ class PNCPService:
         """
         token = cls._get_token()
 
-        for base in cls._candidate_base_urls():
-            url = (
-                f"{base}/orgaos/{cnpj_orgao}/compras/"
-                f"{int(ano_compra)}/{int(sequencial_compra)}/itens/"
-                f"{int(numero_item)}/resultados"
-            )
-
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "accept": "application/json",
-            }
-
-            try:
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
-                )
-            except requests.exceptions.RequestException as exc:
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "accept": "application/json",
+        }
+        urls = [
+            f"{base}/orgaos/{cnpj_orgao}/compras/"
+            f"{int(ano_compra)}/{int(sequencial_compra)}/itens/{int(numero_item)}/resultados"
+            for base in cls._candidate_base_urls()
+        ]
+
+        for url, resp, exc in cls._leituras_alternativas(urls, headers):
+            if exc is not None:
                 logger.debug("[PNCP] Falha ao consultar resultados item %s em %s: %s",
-                               numero_item, base, exc)
+                               numero_item, url, exc)
                 continue
 
             logger.debug("[PNCP] GET resultados item %s -> %s: %s",
@@ -1237,24 +1365,18 @@ class PNCPService:
     ) -> Optional[Dict[str, Any]]:
         token = cls._get_token()
 
-        for base in cls._candidate_base_urls():
-            url = (
-                f"{base}/orgaos/{cnpj_orgao}/compras/"
-                f"{int(ano_compra)}/{int(sequencial_compra)}/itens/{int(numero_item)}"
-            )
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "accept": "application/json",
-            }
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "accept": "application/json",
+        }
+        urls = [
+            f"{base}/orgaos/{cnpj_orgao}/compras/"
+            f"{int(ano_compra)}/{int(sequencial_compra)}/itens/{int(numero_item)}"
+            for base in cls._candidate_base_urls()
+        ]
 
-            try:
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
-                )
-            except requests.exceptions.RequestException:
+        for url, resp, exc in cls._leituras_alternativas(urls, headers):
+            if exc is not None:
                 continue
 
             if resp.status_code == 200:
@@ -1311,7 +1433,7 @@ class PNCPService:
                 url,
                 headers=headers,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             logger.debug("[PNCP] Falha ao deletar resultado %s do item %s: %s",
@@ -1367,7 +1489,7 @@ class PNCPService:
                 headers=headers,
                 json=item_payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (atualizar item {numero_item}): {exc}"
@@ -1397,6 +1519,10 @@ class PNCPService:
 
         Requer que a compra já esteja publicada (pncp_ano_compra e
         pncp_sequencial_compra preenchidos).
+
+        Se o prazo da requisição (api/prazos.py) acabar, para entre um item e
+        outro e devolve o parcial com prazo_esgotado=True; como a
+        sincronização é idempotente, basta chamá-la de novo para continuar.
         """
         if not processo.pncp_ano_compra or not processo.pncp_sequencial_compra:
             raise ValueError(
@@ -1424,7 +1550,7 @@ class PNCPService:
 
         itens = processo.itens.select_related("fornecedor").prefetch_related(
             "propostas__fornecedor"
-        ).order_by("ordem")
+        ).order_by("ordem", "id")
 
         def _normalize_doc(value: Any) -> str:
             return re.sub(r"\D", "", str(value or ""))
@@ -1435,8 +1561,15 @@ class PNCPService:
             except (TypeError, ValueError):
                 return None
 
-        for item in itens:
-            numero_item = item.ordem or item.pncp_numero_item
+        prazo_esgotado = False
+        processados = 0
+
+        for idx, item in enumerate(itens, start=1):
+            if prazos.esgotado():
+                prazo_esgotado = True
+                break
+            processados = idx
+            numero_item = item.pncp_numero_item or idx
 
             if not numero_item:
                 erros.append(f"Item '{item.descricao}' sem número de ordem.")
@@ -1660,19 +1793,33 @@ class PNCPService:
                         numero_item, str(e)
                     )
 
+            except prazos.PrazoEsgotado:
+                # Item interrompido no meio: volta a ser processado na próxima chamada
+                prazo_esgotado = True
+                processados = idx - 1
+                break
             except Exception as e:
                 erros.append(f"Item {numero_item}: {str(e)}")
                 logger.error("[PNCP] Erro ao inserir resultado item %s: %s",
                              numero_item, str(e))
 
-            time.sleep(0.5)
+            prazos.dormir(0.5)
+
+        total_itens = itens.count()
+        if prazo_esgotado:
+            logger.warning(
+                "[PNCP] Prazo esgotado na sincronização do processo %s: %d de %d itens processados.",
+                processo.pk, processados, total_itens,
+            )
 
         return {
-            "total_itens": itens.count(),
+            "total_itens": total_itens,
             "resultados_enviados": len(resultados_ok),
             "erros": len(erros),
             "detalhes": resultados_ok,
             "erros_detalhes": erros,
+            "prazo_esgotado": prazo_esgotado,
+            "itens_pendentes": total_itens - processados if prazo_esgotado else 0,
         }
 
      # ------------------------------------------------------------------ #
@@ -1732,7 +1879,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (inserir ata): {exc}"
@@ -1842,7 +1989,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (retificar ata): {exc}"
@@ -1920,7 +2067,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (excluir Ata): {exc}"
@@ -1970,19 +2117,14 @@ class PNCPService:
             "accept": "*/*",
         }
 
-        files = {
-            "arquivo": (
-                getattr(arquivo, "name", "documento.pdf"),
-                arquivo,
-                content_type,
-            )
-        }
+        # Corpo em fluxo: o PDF não é carregado inteiro em memória
+        corpo = CorpoMultipart("arquivo", arquivo, content_type)
+        headers["Content-Type"] = corpo.content_type
 
         last_response: Optional[requests.Response] = None
 
         for base in cls._candidate_write_base_urls(referencias_pncp):
-            if hasattr(arquivo, "seek"):
-                arquivo.seek(0)
+            corpo.seek(0)
 
             url = (
                 f"{base}/orgaos/{cnpj_orgao}/compras/"
@@ -1995,9 +2137,9 @@ class PNCPService:
                 resp = requests.post(
                     url,
                     headers=headers,
-                    files=files,
+                    data=corpo,
                     verify=cls.VERIFY_SSL,
-                    timeout=90,
+                    timeout=prazos.timeout(90),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (anexar documento à ata): {exc}"
@@ -2075,7 +2217,7 @@ class PNCPService:
                 headers=headers,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (excluir documento de ata): {exc}"
@@ -2109,23 +2251,16 @@ class PNCPService:
             "accept": "*/*",
         }
         last_response: Optional[requests.Response] = None
-
-        for base in cls._candidate_consulta_base_urls():
-            url = (
-                f"{base}/orgaos/{cnpj_orgao}/compras/"
-                f"{int(ano_compra)}/{int(sequencial_compra)}/atas/{int(sequencial_ata)}/arquivos"
-            )
-
-            cls._log(f"Listando documentos da Ata {sequencial_ata} no PNCP: {url}")
-
-            try:
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
-                )
-            except requests.exceptions.RequestException as exc:
+        urls = [
+            f"{base}/orgaos/{cnpj_orgao}/compras/"
+            f"{int(ano_compra)}/{int(sequencial_compra)}/atas/{int(sequencial_ata)}/arquivos"
+            for base in cls._candidate_consulta_base_urls()
+        ]
+
+        for url, resp, exc in cls._leituras_alternativas(
+            urls, headers, f"Listando documentos da Ata {sequencial_ata} no PNCP"
+        ):
+            if exc is not None:
                 msg = f"Falha de comunicação com PNCP (listar documentos de ata): {exc}"
                 cls._log(msg, "error")
                 raise ValueError(msg) from exc
@@ -2245,7 +2380,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (inserir contrato): {exc}"
@@ -2373,7 +2508,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (retificar contrato): {exc}"
@@ -2448,7 +2583,7 @@ class PNCPService:
                     headers=headers,
                     json=payload,
                     verify=cls.VERIFY_SSL,
-                    timeout=cls.DEFAULT_TIMEOUT,
+                    timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (excluir contrato): {exc}"
@@ -2503,19 +2638,14 @@ class PNCPService:
             "accept": "*/*",
         }
 
-        files = {
-            "arquivo": (
-                getattr(arquivo, "name", "documento.pdf"),
-                arquivo,
-                content_type,
-            )
-        }
+        # Corpo em fluxo: o PDF não é carregado inteiro em memória
+        corpo = CorpoMultipart("arquivo", arquivo, content_type)
+        headers["Content-Type"] = corpo.content_type
 
         last_response: Optional[requests.Response] = None
 
         for base in cls._candidate_write_base_urls(referencias_pncp):
-            if hasattr(arquivo, "seek"):
-                arquivo.seek(0)
+            corpo.seek(0)
 
             url = f"{base}/orgaos/{cnpj_orgao}/contratos/{int(sequencial_contrato)}/arquivos"
 
@@ -2525,9 +2655,9 @@ class PNCPService:
                 resp = requests.post(
                     url,
                     headers=headers,
-                    files=files,
+                    data=corpo,
                     verify=cls.VERIFY_SSL,
-                    timeout=90,
+                    timeout=prazos.timeout(90),
                 )
             except requests.exceptions.RequestException as exc:
                 msg = f"Falha de comunicação com PNCP (anexar documento ao contrato): {exc}"
@@ -2610,7 +2740,7 @@ class PNCPService:
                 headers=headers,
                 json=payload,
                 verify=cls.VERIFY_SSL,
-                timeout=cls.DEFAULT_TIMEOUT,
+                timeout=prazos.timeout(cls.DEFAULT_TIMEOUT),
             )
         except requests.exceptions.RequestException as exc:
             msg = f"Falha de comunicação com PNCP (excluir documento de contrato): {exc}"
@@ -2630,31 +2760,460 @@ class PNCPService:
 # ====================================================================== #
 
 
+class ImportacaoInterrompida(Exception):
+    """
+    Falha ao gravar um bloco depois de outros já confirmados. 'resultado'
+    traz o que foi gravado até ali (mesmo formato do retorno da importação,
+    com o id do processo); reenviar a planilha duplicaria esses itens.
+    """
+
+    def __init__(self, mensagem: str, resultado: Dict[str, Any]):
+        super().__init__(mensagem)
+        self.resultado = resultado
+
+
 class ImportacaoService:
     """
     Serviço utilitário para importação de planilha padrão (.xlsx).
+
+    A planilha é lida em modo streaming (openpyxl read_only): cada linha vira
+    um Item (com Lote, Fornecedor e Proposta opcionais) e a gravação acontece
+    em blocos de TAMANHO_BLOCO linhas, cada bloco numa transação com bulk_create.
+    A memória fica limitada ao bloco corrente e aos caches de lotes/fornecedores.
+    A leitura roda no pool de processos (api/processamento.py) para não segurar
+    o GIL do worker web.
     """
 
+    TAMANHO_BLOCO = 1000
+    MAX_ERROS_DETALHADOS = 500
+    LINHAS_BUSCA_CABECALHO = 20
+
+    # Campo interno -> cabeçalhos aceitos (já normalizados: minúsculas, sem acento)
+    COLUNAS = {
+        "lote": ("lote", "numero lote", "n lote", "no lote"),
+        "descricao": ("descricao", "descricao do item", "item descricao", "objeto"),
+        "especificacao": ("especificacao", "especificacao tecnica", "detalhamento"),
+        "unidade": ("unidade", "und", "un", "unid", "unidade de medida", "unidade medida"),
+        "quantidade": ("quantidade", "qtd", "qtde", "quant"),
+        "valor_estimado": (
+            "valor unitario", "valor estimado", "valor unitario estimado",
+            "vl unitario", "preco unitario", "valor de referencia",
+        ),
+        "natureza": ("natureza", "natureza despesa", "natureza da despesa"),
+        "cnpj_fornecedor": ("cnpj", "cnpj fornecedor", "cpf cnpj", "cnpj cpf", "cnpj do fornecedor"),
+        "razao_social": ("fornecedor", "razao social", "razao social fornecedor", "nome fornecedor"),
+        "valor_proposto": ("valor proposto", "valor proposta", "valor ofertado", "valor cotado"),
+        "vencedor": ("vencedor", "vencedora"),
+    }
+    VALORES_VERDADEIROS = {"sim", "s", "x", "1", "true", "verdadeiro", "vencedor", "vencedora"}
+    NATUREZAS_VALIDAS = {codigo for codigo, _ in NATUREZAS_DESPESA_CHOICES}
+
+    @classmethod
+    def processar_planilha_padrao(
+        cls,
+        arquivo: IO[bytes],
+        *,
+        processo: Optional[ProcessoLicitatorio] = None,
+        entidade=None,
+        orgao=None,
+        progresso=None,
+        espera_fila=processamento.ESPERA_FILA,
+        timeout=processamento.TIMEOUT,
+    ) -> Dict[str, Any]:
+        """
+        Importa a planilha para `processo` (ou para um novo processo criado a
+        partir do nome do arquivo). `progresso(processados, total)` é chamado
+        ao fim de cada bloco gravado.
+
+        A leitura/interpretação (CPU) roda no pool de processos
+        (api/processamento.py), que grava as linhas interpretadas em blocos
+        num arquivo temporário; esta thread só grava os blocos no banco.
+        PoolOcupado/TempoEsgotado (ValueError) se o pool não atender.
+        """
+        with ExitStack() as limpeza:
+            caminho = cls._caminho_local(arquivo, limpeza)
+            saida = tempfile.NamedTemporaryFile(prefix="importacao_", suffix=".blocos", delete=False)
+            saida.close()
+            limpeza.callback(os.unlink, saida.name)
+
+            leitura = processamento.executar(
+                cls._ler_planilha, caminho, saida.name, timeout=timeout, espera=espera_fila
+            )
+
+            if processo is None:
+                # Nome do arquivo (sem caminho)
+                nome_arquivo = getattr(arquivo, "name", "Processo Importado")
+                nome_base = str(nome_arquivo).replace("\\", "/").rsplit("/", 1)[-1].rsplit(".", 1)[0]
+                processo = ProcessoLicitatorio.objects.create(
+                    numero_processo=nome_base[:50],
+                    numero_certame=None,
+                    objeto=f"Processo importado do arquivo {nome_base}",
+                    data_processo=timezone.now().date(),
+                    entidade=entidade,
+                    orgao=orgao,
+                )
+
+            estado = _EstadoImportacao(processo)
+            total = leitura["linhas_lidas"]
+            with open(saida.name, "rb") as blocos:
+                while True:
+                    try:
+                        bloco = pickle.load(blocos)
+                    except EOFError:
+                        break
+                    for numero_linha, mensagem in bloco["erros"]:
+                        estado.registrar_erro(numero_linha, mensagem, cls.MAX_ERROS_DETALHADOS)
+                    if bloco["linhas"]:
+                        # Contadores até o último bloco confirmado (o atual pode ser desfeito)
+                        confirmado = estado.resumo()
+                        try:
+                            cls._gravar_bloco(estado, bloco["linhas"])
+                        except Exception as exc:
+                            # Blocos anteriores já estão confirmados: informa o que ficou gravado
+                            raise ImportacaoInterrompida(
+                                f"Importação interrompida por erro de gravação após "
+                                f"{confirmado['linhas_lidas']} linha(s) da planilha; "
+                                f"{confirmado['itens_importados']} item(ns) já foram gravados: {exc}",
+                                {"processo": processo.pk, **confirmado},
+                            ) from exc
+                    estado.linhas_lidas = bloco["lidas"]
+                    if progresso:
+                        progresso(estado.linhas_lidas, total)
+
+        return {"processo": processo, **estado.resumo()}
+
     @staticmethod
-    def processar_planilha_padrao(arquivo: IO[bytes]) -> Dict[str, Any]:
+    def _caminho_local(arquivo: IO[bytes], limpeza: ExitStack) -> str:
+        """Caminho em disco da planilha, copiando-a para um temporário se preciso."""
+        if hasattr(arquivo, "temporary_file_path"):
+            return arquivo.temporary_file_path()
+        copia = tempfile.NamedTemporaryFile(prefix="importacao_", suffix=".xlsx", delete=False)
+        limpeza.callback(os.unlink, copia.name)
+        with copia:
+            if hasattr(arquivo, "seek"):
+                arquivo.seek(0)
+            shutil.copyfileobj(arquivo, copia, 1024 * 1024)
+        return copia.name
+
+    @classmethod
+    def _ler_planilha(cls, caminho: str, destino: str) -> Dict[str, Any]:
         """
-        Processa uma planilha .xlsx e cria um ProcessoLicitatorio básico.
+        Executada no pool de processos (sem acesso ao banco): lê a planilha em
+        modo streaming (openpyxl read_only) e grava em `destino`, com pickle,
+        blocos de até TAMANHO_BLOCO linhas (interpretadas ou com erro, somadas).
+        A memória fica limitada ao bloco corrente.
         """
-        # Nome do arquivo (sem caminho)
-        nome_arquivo = getattr(arquivo, "name", "Processo Importado")
-        nome_base = str(nome_arquivo).rsplit(".", 1)[0]
+        try:
+            from openpyxl import load_workbook
+        except ImportError as exc:
+            raise ValueError("Importação de planilhas indisponível: instale o pacote openpyxl.") from exc
+
+        try:
+            wb = load_workbook(caminho, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ValueError(f"Não foi possível ler a planilha: {exc}") from exc
 
-        # Criação do processo "esqueleto"
-        processo = ProcessoLicitatorio.objects.create(
-            numero_processo=nome_base,
-            numero_certame=None,
-            objeto=f"Processo importado do arquivo {nome_arquivo}",
-            data_processo=timezone.now().date(),
+        lidas = 0
+        try:
+            ws = wb.worksheets[0]
+            linhas = ws.iter_rows(values_only=True)
+            mapa, numero_linha = cls._localizar_cabecalho(linhas)
+
+            with open(destino, "wb") as saida:
+                bloco = {"linhas": [], "erros": [], "lidas": 0}
+                for valores in linhas:
+                    numero_linha += 1
+                    if not valores or all(v is None or str(v).strip() == "" for v in valores):
+                        continue
+                    try:
+                        bloco["linhas"].append(cls._interpretar_linha(valores, mapa))
+                    except ValueError as exc:
+                        bloco["erros"].append((numero_linha, str(exc)))
+                    lidas += 1
+
+                    # Linhas inválidas também contam: planilha só de erros não acumula
+                    if len(bloco["linhas"]) + len(bloco["erros"]) >= cls.TAMANHO_BLOCO:
+                        bloco["lidas"] = lidas
+                        pickle.dump(bloco, saida, pickle.HIGHEST_PROTOCOL)
+                        bloco = {"linhas": [], "erros": [], "lidas": 0}
+
+                if bloco["linhas"] or bloco["erros"]:
+                    bloco["lidas"] = lidas
+                    pickle.dump(bloco, saida, pickle.HIGHEST_PROTOCOL)
+        finally:
+            wb.close()
+
+        return {"linhas_lidas": lidas}
+
+    # ------------------------------------------------------------------ #
+    # Leitura                                                              #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _normalizar_cabecalho(valor: Any) -> str:
+        texto = unicodedata.normalize("NFKD", str(valor or "")).encode("ascii", "ignore").decode()
+        texto = re.sub(r"[^a-z0-9]+", " ", texto.lower())
+        return texto.strip()
+
+    @classmethod
+    def _localizar_cabecalho(cls, linhas) -> tuple:
+        """Procura a linha de cabeçalho nas primeiras linhas e devolve ({campo: coluna}, nº da linha)."""
+        aliases = {
+            alias: campo for campo, nomes in cls.COLUNAS.items() for alias in nomes
+        }
+        for numero, valores in enumerate(linhas, start=1):
+            mapa = {}
+            for coluna, valor in enumerate(valores or ()):
+                campo = aliases.get(cls._normalizar_cabecalho(valor))
+                if campo and campo not in mapa:
+                    mapa[campo] = coluna
+            if "descricao" in mapa and "quantidade" in mapa:
+                return mapa, numero
+            if numero >= cls.LINHAS_BUSCA_CABECALHO:
+                break
+        raise ValueError(
+            "Cabeçalho não encontrado: a planilha deve conter ao menos as colunas "
+            "'Descrição' e 'Quantidade'."
         )
 
+    @staticmethod
+    def _decimal(valor: Any, campo: str) -> Optional[Decimal]:
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            return None
+        if isinstance(valor, (int, float, Decimal)):
+            return Decimal(str(valor))
+        texto = re.sub(r"[^\d,.\-]", "", str(valor))
+        if "," in texto:
+            # Formato brasileiro: 1.234,56
+            texto = texto.replace(".", "").replace(",", ".")
+        try:
+            return Decimal(texto)
+        except InvalidOperation:
+            raise ValueError(f"Valor numérico inválido em '{campo}': {valor!r}.")
+
+    @classmethod
+    def _interpretar_linha(cls, valores: tuple, mapa: Dict[str, int]) -> Dict[str, Any]:
+        def celula(campo):
+            coluna = mapa.get(campo)
+            if coluna is None or coluna >= len(valores):
+                return None
+            valor = valores[coluna]
+            return valor.strip() if isinstance(valor, str) else valor
+
+        descricao = str(celula("descricao") or "").strip()
+        if not descricao:
+            raise ValueError("Descrição do item não informada.")
+
+        quantidade = cls._decimal(celula("quantidade"), "Quantidade")
+        if quantidade is None or quantidade <= 0:
+            raise ValueError("Quantidade deve ser maior que zero.")
+
+        lote = celula("lote")
+        if lote not in (None, ""):
+            try:
+                lote = int(Decimal(str(lote).strip()))
+            except (InvalidOperation, ValueError):
+                raise ValueError(f"Número de lote inválido: {lote!r}.")
+            if lote <= 0:
+                raise ValueError("Número de lote deve ser maior que zero.")
+        else:
+            lote = None
+
+        documento = re.sub(r"\D", "", str(celula("cnpj_fornecedor") or ""))
+        if documento and len(documento) not in (11, 14):
+            raise ValueError(f"CNPJ/CPF do fornecedor inválido: {celula('cnpj_fornecedor')!r}.")
+
+        valor_proposto = cls._decimal(celula("valor_proposto"), "Valor proposto")
+        vencedor = str(celula("vencedor") or "").strip().lower() in cls.VALORES_VERDADEIROS
+        if (valor_proposto is not None or vencedor) and not documento:
+            raise ValueError("Proposta informada sem CNPJ/CPF do fornecedor.")
+
+        natureza = celula("natureza")
+        if natureza not in (None, ""):
+            codigo = re.sub(r"\D", "", str(natureza))[:8]
+            if codigo not in cls.NATUREZAS_VALIDAS:
+                raise ValueError(f"Natureza de despesa inválida: {natureza!r}.")
+            natureza = codigo
+        else:
+            natureza = None
+
+        return {
+            "lote": lote,
+            "descricao": descricao[:255],
+            "especificacao": str(celula("especificacao") or "").strip() or None,
+            "unidade": (str(celula("unidade") or "").strip() or "UN")[:20],
+            "quantidade": quantidade,
+            "valor_estimado": cls._decimal(celula("valor_estimado"), "Valor unitário"),
+            "natureza": natureza,
+            "documento": documento or None,
+            "razao_social": str(celula("razao_social") or "").strip()[:255],
+            "valor_proposto": valor_proposto,
+            "vencedor": vencedor,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Gravação                                                             #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _mascarar_documento(documento: str) -> str:
+        if len(documento) == 14:
+            return f"{documento[:2]}.{documento[2:5]}.{documento[5:8]}/{documento[8:12]}-{documento[12:]}"
+        return f"{documento[:3]}.{documento[3:6]}.{documento[6:9]}-{documento[9:]}"
+
+    @classmethod
+    def _gravar_bloco(cls, estado: "_EstadoImportacao", bloco: List[Dict[str, Any]]) -> None:
+        """Grava um bloco de linhas já interpretadas numa única transação."""
+        processo = estado.processo
+
+        with transaction.atomic():
+            processo.travar()
+
+            # Lotes: reaproveita os existentes e cria os que faltam num só INSERT
+            numeros = {linha["lote"] for linha in bloco if linha["lote"]} - estado.lotes.keys()
+            if numeros:
+                estado.lotes.update(
+                    processo.lotes.filter(numero__in=numeros).values_list("numero", "id")
+                )
+                faltantes = sorted(numeros - estado.lotes.keys())
+                if faltantes:
+                    try:
+                        with transaction.atomic():
+                            novos = Lote.objects.bulk_create(
+                                [Lote(processo=processo, numero=n, descricao=f"Lote {n}") for n in faltantes]
+                            )
+                        estado.lotes.update((lote.numero, lote.id) for lote in novos)
+                        estado.lotes_criados += len(novos)
+                    except IntegrityError:
+                        # Lote criado por outra requisição entre a consulta e o INSERT
+                        for n in faltantes:
+                            lote, criado = Lote.objects.get_or_create(
+                                processo=processo, numero=n, defaults={"descricao": f"Lote {n}"}
+                            )
+                            estado.lotes[n] = lote.id
+                            estado.lotes_criados += criado
+
+            # Fornecedores: busca por CNPJ com e sem máscara; cria os inexistentes
+            documentos = {linha["documento"] for linha in bloco if linha["documento"]} - estado.fornecedores.keys()
+            if documentos:
+                formatos = {cls._mascarar_documento(d): d for d in documentos}
+                formatos.update({d: d for d in documentos})
+                for fornecedor_id, cnpj in Fornecedor.objects.filter(
+                    cnpj__in=formatos.keys()
+                ).values_list("id", "cnpj"):
+                    estado.fornecedores.setdefault(formatos[cnpj], fornecedor_id)
+
+                razoes = {}
+                for linha in bloco:
+                    if linha["documento"]:
+                        razoes.setdefault(linha["documento"], linha["razao_social"])
+                faltantes = sorted(documentos - estado.fornecedores.keys())
+                if faltantes:
+                    try:
+                        with transaction.atomic():
+                            novos = Fornecedor.objects.bulk_create([
+                                Fornecedor(
+                                    cnpj=cls._mascarar_documento(d),
+                                    razao_social=razoes.get(d) or cls._mascarar_documento(d),
+                                )
+                                for d in faltantes
+                            ])
+                        estado.fornecedores.update(zip(faltantes, (f.id for f in novos)))
+                    except IntegrityError:
+                        # CNPJ cadastrado por outra requisição entre a consulta e o INSERT
+                        for d in faltantes:
+                            fornecedor, _ = Fornecedor.objects.get_or_create(
+                                cnpj=cls._mascarar_documento(d),
+                                defaults={"razao_social": razoes.get(d) or cls._mascarar_documento(d)},
+                            )
+                            estado.fornecedores[d] = fornecedor.id
+
+            # Participantes do processo
+            vincular = {
+                estado.fornecedores[linha["documento"]] for linha in bloco if linha["documento"]
+            } - estado.participantes
+            if vincular:
+                FornecedorProcesso.objects.bulk_create(
+                    [FornecedorProcesso(processo=processo, fornecedor_id=f) for f in vincular],
+                    ignore_conflicts=True,
+                )
+                EntidadeFornecedor.vincular(processo.entidade_id, vincular)
+                estado.participantes |= vincular
+                estado.fornecedores_vinculados += len(vincular)
+
+            # Itens: faixa contígua de ranks após o último item do processo
+            ultimo = processo.itens.aggregate(maior=Max("ordem"))["maior"] or 0
+            if ultimo + len(bloco) * Item.INTERVALO_ORDEM > Item.ORDEM_MAXIMA:
+                processo.rebalancear_itens()
+                ultimo = processo.itens.aggregate(maior=Max("ordem"))["maior"] or 0
+
+            itens = []
+            for k, linha in enumerate(bloco, start=1):
+                fornecedor_id = estado.fornecedores.get(linha["documento"])
+                itens.append(Item(
+                    processo=processo,
+                    lote_id=estado.lotes.get(linha["lote"]),
+                    fornecedor_id=fornecedor_id if linha["vencedor"] else None,
+                    descricao=linha["descricao"],
+                    especificacao=linha["especificacao"],
+                    unidade=linha["unidade"],
+                    quantidade=linha["quantidade"],
+                    valor_estimado=linha["valor_estimado"],
+                    valor_homologado=linha["valor_proposto"] if linha["vencedor"] else None,
+                    natureza=linha["natureza"],
+                    ordem=ultimo + k * Item.INTERVALO_ORDEM,
+                ))
+            Item.objects.bulk_create(itens)
+            estado.itens_importados += len(itens)
+
+            # Propostas (uma por linha com fornecedor e valor)
+            propostas = [
+                ItemFornecedor(
+                    item=item,
+                    fornecedor_id=estado.fornecedores[linha["documento"]],
+                    valor_proposto=linha["valor_proposto"] if linha["valor_proposto"] is not None else Decimal("0"),
+                    vencedor=linha["vencedor"],
+                )
+                for item, linha in zip(itens, bloco)
+                if linha["documento"] and (linha["valor_proposto"] is not None or linha["vencedor"])
+            ]
+            if propostas:
+                ItemFornecedor.objects.bulk_create(propostas)
+                estado.propostas_importadas += len(propostas)
+
+            ProcessoLicitatorio.registrar_alteracao(processo.pk)
+
+
+class _EstadoImportacao:
+    """Caches e contadores de uma importação em andamento."""
+
+    def __init__(self, processo: ProcessoLicitatorio):
+        self.processo = processo
+        self.lotes = dict(processo.lotes.values_list("numero", "id"))
+        self.fornecedores: Dict[str, int] = {}
+        self.participantes = set(
+            processo.fornecedores_processo.values_list("fornecedor_id", flat=True)
+        )
+        self.linhas_lidas = 0
+        self.lotes_criados = 0
+        self.itens_importados = 0
+        self.fornecedores_vinculados = 0
+        self.propostas_importadas = 0
+        self.total_erros = 0
+        self.erros: List[Dict[str, Any]] = []
+
+    def resumo(self) -> Dict[str, Any]:
         return {
-            "processo": processo,
-            "lotes_criados": 0,
-            "itens_importados": 0,
-            "fornecedores_vinculados": 0,
-        }
\ No newline at end of file
+            "linhas_lidas": self.linhas_lidas,
+            "lotes_criados": self.lotes_criados,
+            "itens_importados": self.itens_importados,
+            "fornecedores_vinculados": self.fornecedores_vinculados,
+            "propostas_importadas": self.propostas_importadas,
+            "total_erros": self.total_erros,
+            "erros": self.erros,
+        }
+
+    def registrar_erro(self, linha: int, mensagem: str, limite: int) -> None:
+        self.total_erros += 1
+        if len(self.erros) < limite:
+            self.erros.append({"linha": linha, "erro": mensagem})
@@ -0,0 +1,259 @@
+# api/signals.py
+"""
+Mantém ProcessoLicitatorio.versao/atualizado_em em dia: qualquer escrita
+no processo ou em seus filhos agenda o incremento da versão (coalescido
+por transação, ver ProcessoLicitatorio.registrar_alteracao).
+
+Escritas em massa (bulk_create/bulk_update/QuerySet.update) não disparam
+signals; esses caminhos chamam registrar_alteracao explicitamente.
+
+Exclusões dos modelos cobertos pelo feed de sincronização geram um
+RegistroExclusao na mesma transação do DELETE.
+
+Também invalida o contador de notificações não lidas em cache e mantém o
+vínculo materializado EntidadeFornecedor.
+"""
+
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    AtaRegistroPrecos,
+    ContratoEmpenho,
+    DocumentoAtaRegistroPrecos,
+    DocumentoContrato,
+    DocumentoPNCP,
+    EntidadeFornecedor,
+    Fornecedor,
+    FornecedorProcesso,
+    Item,
+    ItemFornecedor,
+    Lote,
+    Notificacao,
+    ProcessoDocumentoLinha,
+    ProcessoLicitatorio,
+    RegistroExclusao,
+)
+
+# Filhos com FK direta para o processo
+MODELOS_DO_PROCESSO = (
+    Item,
+    Lote,
+    FornecedorProcesso,
+    DocumentoPNCP,
+    ProcessoDocumentoLinha,
+    ContratoEmpenho,
+    AtaRegistroPrecos,
+)
+
+
+@receiver(post_save, sender=ProcessoLicitatorio)
+def processo_salvo(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    ProcessoLicitatorio.registrar_alteracao(instance.pk)
+
+
+def filho_alterado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ProcessoLicitatorio.registrar_alteracao(instance.processo_id)
+
+
+for _modelo in MODELOS_DO_PROCESSO:
+    post_save.connect(filho_alterado, sender=_modelo, dispatch_uid=f"versao_processo_{_modelo.__name__}")
+    post_delete.connect(filho_alterado, sender=_modelo, dispatch_uid=f"versao_processo_del_{_modelo.__name__}")
+
+
+@receiver(post_save, sender=ItemFornecedor)
+@receiver(post_delete, sender=ItemFornecedor)
+def proposta_alterada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    processo_id = Item.objects.filter(pk=instance.item_id).values_list("processo_id", flat=True).first()
+    ProcessoLicitatorio.registrar_alteracao(processo_id)
+
+
+@receiver(post_save, sender=DocumentoContrato)
+@receiver(post_delete, sender=DocumentoContrato)
+def documento_contrato_alterado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    processo_id = (
+        ContratoEmpenho.objects.filter(pk=instance.contrato_id).values_list("processo_id", flat=True).first()
+    )
+    ProcessoLicitatorio.registrar_alteracao(processo_id)
+
+
+@receiver(post_save, sender=DocumentoAtaRegistroPrecos)
+@receiver(post_delete, sender=DocumentoAtaRegistroPrecos)
+def documento_ata_alterado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    processo_id = (
+        AtaRegistroPrecos.objects.filter(pk=instance.ata_id).values_list("processo_id", flat=True).first()
+    )
+    ProcessoLicitatorio.registrar_alteracao(processo_id)
+
+
+@receiver(post_save, sender=Fornecedor)
+def fornecedor_salvo(sender, instance, created, raw=False, **kwargs):
+    # Dados do fornecedor aparecem nas listagens dos processos em que participa
+    if created or raw:
+        return
+    processo_ids = FornecedorProcesso.objects.filter(fornecedor=instance).values_list("processo_id", flat=True)
+    ProcessoLicitatorio.registrar_alteracao(*processo_ids)
+
+
+# ============================================================
+# 🪦 REGISTROS DE EXCLUSÃO
+# ============================================================
+
+# Pais sendo excluídos nesta thread: as exclusões em cascata dos filhos não
+# geram registro próprio (o cliente remove os filhos junto com o pai)
+_em_exclusao = threading.local()
+
+
+def _pais_em_exclusao(nome):
+    conjunto = getattr(_em_exclusao, nome, None)
+    if conjunto is None:
+        conjunto = set()
+        setattr(_em_exclusao, nome, conjunto)
+    return conjunto
+
+
+@receiver(pre_delete, sender=ProcessoLicitatorio)
+def processo_excluindo(sender, instance, **kwargs):
+    _pais_em_exclusao("processos").add(instance.pk)
+
+
+@receiver(pre_delete, sender=Item)
+def item_excluindo(sender, instance, **kwargs):
+    _pais_em_exclusao("itens").add(instance.pk)
+
+
+@receiver(pre_delete, sender=Lote)
+def lote_excluindo(sender, instance, **kwargs):
+    # Item.lote é SET_NULL: o Collector solta os itens com um UPDATE sem
+    # signals, e o feed de sincronização não veria a mudança de 'lote'
+    if instance.processo_id in _pais_em_exclusao("processos"):
+        return
+    instance.itens.update(atualizado_em=timezone.now())
+
+
+def _registrar_exclusao(modelo, objeto_id, processo_id, entidade_id=None):
+    if entidade_id is None and processo_id:
+        entidade_id = (
+            ProcessoLicitatorio.objects.filter(pk=processo_id).values_list("entidade_id", flat=True).first()
+        )
+    RegistroExclusao.objects.create(
+        modelo=modelo,
+        objeto_id=objeto_id,
+        processo_id=processo_id,
+        entidade_id=entidade_id,
+    )
+
+
+@receiver(post_delete, sender=ProcessoLicitatorio)
+def processo_excluido(sender, instance, **kwargs):
+    _pais_em_exclusao("processos").discard(instance.pk)
+    _registrar_exclusao("processo", instance.pk, instance.pk, instance.entidade_id)
+
+
+MODELOS_EXCLUSAO = {
+    Item: "item",
+    Lote: "lote",
+    ContratoEmpenho: "contrato",
+    AtaRegistroPrecos: "ata",
+}
+
+
+def filho_excluido(sender, instance, **kwargs):
+    if sender is Item:
+        _pais_em_exclusao("itens").discard(instance.pk)
+    if instance.processo_id in _pais_em_exclusao("processos"):
+        return
+    _registrar_exclusao(MODELOS_EXCLUSAO[sender], instance.pk, instance.processo_id)
+
+
+for _modelo in MODELOS_EXCLUSAO:
+    post_delete.connect(filho_excluido, sender=_modelo, dispatch_uid=f"exclusao_{_modelo.__name__}")
+
+
+@receiver(post_delete, sender=ItemFornecedor)
+def proposta_excluida(sender, instance, **kwargs):
+    if instance.item_id in _pais_em_exclusao("itens"):
+        return
+    processo_id, entidade_id = (
+        Item.objects.filter(pk=instance.item_id)
+        .values_list("processo_id", "processo__entidade_id")
+        .first()
+    ) or (None, None)
+    _registrar_exclusao("proposta", instance.pk, processo_id, entidade_id)
+
+
+# ============================================================
+# 🔔 CONTADOR DE NOTIFICAÇÕES NÃO LIDAS
+# ============================================================
+
+# Só post_save: um receiver de delete faria Notificacao.expurgar_lidas
+# carregar cada linha antes de apagar (e lidas não mudam o contador)
+@receiver(post_save, sender=Notificacao)
+def notificacao_salva(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Notificacao.invalidar_nao_lidas(instance.usuario_id)
+
+
+# ============================================================
+# 🏭 VÍNCULO ENTIDADE ↔ FORNECEDOR
+# ============================================================
+
+@receiver(post_save, sender=FornecedorProcesso)
+def fornecedor_processo_salvo(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        entidade_id = (
+            ProcessoLicitatorio.objects.filter(pk=instance.processo_id).values_list("entidade_id", flat=True).first()
+        )
+        EntidadeFornecedor.vincular(entidade_id, [instance.fornecedor_id])
+    else:
+        # Troca de processo/fornecedor numa edição: recalcula os dois lados
+        EntidadeFornecedor.registrar_alteracao(instance.fornecedor_id, *getattr(instance, "_fornecedor_anterior", ()))
+
+
+@receiver(pre_save, sender=FornecedorProcesso)
+def fornecedor_processo_salvando(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    anterior = FornecedorProcesso.objects.filter(pk=instance.pk).values_list("fornecedor_id", flat=True).first()
+    instance._fornecedor_anterior = (anterior,) if anterior else ()
+
+
+@receiver(post_delete, sender=FornecedorProcesso)
+def fornecedor_processo_excluido(sender, instance, **kwargs):
+    # Só desvincula se não restar outro processo da entidade com o fornecedor
+    EntidadeFornecedor.registrar_alteracao(instance.fornecedor_id)
+
+
+@receiver(pre_save, sender=ProcessoLicitatorio)
+def processo_salvando(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._entidade_anterior = (
+        ProcessoLicitatorio.objects.filter(pk=instance.pk).values_list("entidade_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=ProcessoLicitatorio)
+def processo_entidade_alterada(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    if getattr(instance, "_entidade_anterior", instance.entidade_id) != instance.entidade_id:
+        EntidadeFornecedor.registrar_alteracao(
+            *instance.fornecedores_processo.values_list("fornecedor_id", flat=True)
+        )
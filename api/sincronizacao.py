@@ -0,0 +1,166 @@
+# api/sincronizacao.py
+"""
+Feed de alterações por entidade ("o que mudou desde o cursor").
+
+O cursor é o instante (ISO 8601) em que a consulta anterior começou. Cada
+consulta volta a ler uma pequena margem antes do cursor, para não perder
+transações que gravaram antes do cursor mas só confirmaram depois; por isso
+o cliente deve aplicar as alterações de forma idempotente (upsert por id).
+
+Limite conhecido: atualizado_em vem do relógio da aplicação no momento da
+escrita, não do commit. Uma transação que confirma mais de MARGEM depois de
+carimbar as linhas (transação longa, importação grande) ou um servidor com
+relógio adiantado/atrasado em mais de MARGEM pode ter alterações puladas
+pelo feed. Mantenha os relógios sincronizados (NTP) e, se houver transações
+longas que gravam nesses modelos, aumente SINCRONIZACAO_MARGEM_SEGUNDOS
+acima da duração delas; "recarregar" periódico no cliente cobre o resto.
+
+Quando há alterações demais (ou o cursor é mais antigo que a retenção dos
+registros de exclusão), a resposta traz "recarregar": true e o cliente deve
+recarregar as listas e continuar do novo cursor.
+"""
+
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    AtaRegistroPrecos,
+    ContratoEmpenho,
+    Item,
+    ItemFornecedor,
+    Lote,
+    ProcessoLicitatorio,
+    RegistroExclusao,
+)
+from .serializers import (
+    AtaRegistroPrecosSerializer,
+    ContratoEmpenhoSerializer,
+    ItemFornecedorSerializer,
+    ItemSerializer,
+    LoteSerializer,
+    ProcessoLicitatorioSerializer,
+)
+
+MARGEM = timedelta(seconds=getattr(settings, "SINCRONIZACAO_MARGEM_SEGUNDOS", 5))
+LIMITE = getattr(settings, "SINCRONIZACAO_LIMITE", 5000)
+RETENCAO = timedelta(days=getattr(settings, "SINCRONIZACAO_RETENCAO_DIAS", 30))
+
+# Nome da coleção no feed -> nome usado em RegistroExclusao.modelo
+COLECOES = (
+    ("processos", "processo"),
+    ("itens", "item"),
+    ("lotes", "lote"),
+    ("propostas", "proposta"),
+    ("contratos", "contrato"),
+    ("atas", "ata"),
+)
+
+
+def _fontes(entidade_id):
+    """(coleção, queryset já no escopo da entidade, serializer)."""
+    return (
+        (
+            "processos",
+            ProcessoLicitatorio.objects.filter(entidade_id=entidade_id).select_related("entidade", "orgao"),
+            ProcessoLicitatorioSerializer,
+        ),
+        (
+            "itens",
+            Item.objects.filter(processo__entidade_id=entidade_id).select_related("processo", "lote", "fornecedor"),
+            ItemSerializer,
+        ),
+        (
+            "lotes",
+            Lote.objects.filter(processo__entidade_id=entidade_id),
+            LoteSerializer,
+        ),
+        (
+            "propostas",
+            ItemFornecedor.objects.filter(item__processo__entidade_id=entidade_id).select_related("item", "fornecedor"),
+            ItemFornecedorSerializer,
+        ),
+        (
+            "contratos",
+            ContratoEmpenho.objects.filter(processo__entidade_id=entidade_id)
+            .select_related("processo", "processo__entidade")
+            .prefetch_related(ContratoEmpenhoSerializer.prefetch_documentos()),
+            ContratoEmpenhoSerializer,
+        ),
+        (
+            "atas",
+            AtaRegistroPrecos.objects.filter(processo__entidade_id=entidade_id).select_related("processo"),
+            AtaRegistroPrecosSerializer,
+        ),
+    )
+
+
+def ler_cursor(valor):
+    """Converte o cursor recebido; ValueError se inválido."""
+    instante = parse_datetime(valor or "")
+    if instante is None:
+        raise ValueError("Cursor inválido.")
+    if timezone.is_naive(instante):
+        instante = timezone.make_aware(instante)
+    return instante
+
+
+def _formatar_cursor(instante):
+    # "Z" em vez de "+00:00": o "+" viraria espaço numa query string sem escape
+    return instante.astimezone(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _recarregar(inicio):
+    return {"cursor": _formatar_cursor(inicio), "recarregar": True}
+
+
+def coletar_alteracoes(entidade_id, desde, *, request=None, limite=LIMITE):
+    """
+    Alterações e exclusões da entidade desde o cursor 'desde' (datetime ou
+    None). Sem cursor, devolve só o cursor inicial com recarregar=True.
+    """
+    inicio = timezone.now()
+    if desde is None or desde < inicio - RETENCAO:
+        return _recarregar(inicio)
+
+    corte = desde - MARGEM
+    contexto = {"request": request}
+    alteracoes = {}
+    total = 0
+
+    for nome, queryset, serializer_class in _fontes(entidade_id):
+        linhas = list(
+            queryset.filter(atualizado_em__gte=corte).order_by("atualizado_em", "id")[: limite - total + 1]
+        )
+        total += len(linhas)
+        if total > limite:
+            return _recarregar(inicio)
+        alteracoes[nome] = serializer_class(linhas, many=True, context=contexto).data
+
+    registros = list(
+        RegistroExclusao.objects.filter(entidade_id=entidade_id, excluido_em__gte=corte)
+        .values_list("modelo", "objeto_id")[: limite - total + 1]
+    )
+    if total + len(registros) > limite:
+        return _recarregar(inicio)
+
+    exclusoes = {colecao: [] for colecao, _ in COLECOES}
+    colecao_do_modelo = {modelo: colecao for colecao, modelo in COLECOES}
+    for modelo, objeto_id in registros:
+        exclusoes[colecao_do_modelo[modelo]].append(objeto_id)
+
+    return {
+        "cursor": _formatar_cursor(inicio),
+        "recarregar": False,
+        "alteracoes": alteracoes,
+        "exclusoes": exclusoes,
+    }
+
+
+def expurgar_registros_exclusao():
+    """Remove registros de exclusão além da retenção (cursores mais antigos recarregam)."""
+    limite = timezone.now() - RETENCAO - MARGEM
+    removidos, _ = RegistroExclusao.objects.filter(excluido_em__lt=limite).delete()
+    return removidos
@@ -0,0 +1,155 @@
+# api/streaming.py
+"""
+Renderização JSON em streaming para coleções grandes (itens, fornecedores e
+lotes de um processo).
+
+Em vez de montar a lista inteira (instâncias, dicts e a string JSON final),
+o queryset é percorrido com .iterator() em blocos, cada linha é serializada
+individualmente e o texto vai saindo para o cliente bloco a bloco.
+
+Formatos:
+- JSON (padrão): um array, idêntico ao que o Response(serializer.data) geraria.
+- NDJSON: um objeto por linha; pedido com ?formato=ndjson ou
+  Accept: application/x-ndjson.
+
+Sob ASGI (uvicorn), o Django consome um iterador síncrono de uma vez só
+(sync_to_async(list)) antes de mandar o primeiro byte. conteudo() entrega
+então um gerador assíncrono que busca cada bloco com sync_to_async; sob
+WSGI o iterador síncrono segue como está. Vale também para as exportações
+(api/exportacao.py) e os downloads (api/downloads.py).
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+TAMANHO_BLOCO = 500
+TAMANHO_BLOCO_ARQUIVO = 64 * 1024
+CONTENT_TYPE_NDJSON = "application/x-ndjson"
+
+_FIM = object()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Permite a negociação de Accept: application/x-ndjson nas actions de
+    coleção. Respostas comuns (erros, POST) saem como uma linha por objeto.
+    """
+
+    media_type = CONTENT_TYPE_NDJSON
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        linhas = data if isinstance(data, list) else [data]
+        return "".join(encoder.encode(d) + "\n" for d in linhas).encode("utf-8")
+
+
+# Renderers das actions que usam resposta_json_streaming
+RENDERERS_COLECAO = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+
+def quer_ndjson(request):
+    formato = (request.query_params.get("formato") or "").lower()
+    if formato == "ndjson":
+        return True
+    renderer = getattr(request, "accepted_renderer", None)
+    return getattr(renderer, "format", None) == NDJSONRenderer.format
+
+
+def sob_asgi(request):
+    """True se a requisição (Django ou DRF) chegou pelo handler ASGI."""
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+async def _iterar_assincrono(iteravel):
+    iterador = iter(iteravel)
+    # Mesma thread da view (thread_sensitive): o cursor do .iterator() é dela
+    proximo = sync_to_async(next)
+    try:
+        while True:
+            bloco = await proximo(iterador, _FIM)
+            if bloco is _FIM:
+                return
+            yield bloco
+    finally:
+        fechar = getattr(iterador, "close", None)
+        if fechar is not None:
+            await sync_to_async(fechar)()
+
+
+def conteudo(request, iteravel):
+    """Conteúdo para StreamingHttpResponse adequado ao servidor da requisição."""
+    return _iterar_assincrono(iteravel) if sob_asgi(request) else iteravel
+
+
+def blocos_arquivo(arquivo, tamanho_bloco=TAMANHO_BLOCO_ARQUIVO):
+    """Lê o arquivo (qualquer objeto com read/close) em blocos e o fecha no fim."""
+    try:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                return
+            yield bloco
+    finally:
+        arquivo.close()
+
+
+def _linhas_serializadas(queryset, serializer_class, context, tamanho_bloco):
+    # Um único serializer reaproveitado: só o to_representation roda por linha
+    serializer = serializer_class(context=context)
+    for obj in queryset.iterator(chunk_size=tamanho_bloco):
+        yield serializer.to_representation(obj)
+
+
+def _gerar_array(linhas, encoder, tamanho_bloco):
+    yield "["
+    bloco, primeiro = [], True
+    for dado in linhas:
+        bloco.append(encoder.encode(dado))
+        if len(bloco) >= tamanho_bloco:
+            yield ("" if primeiro else ",") + ",".join(bloco)
+            bloco, primeiro = [], False
+    if bloco:
+        yield ("" if primeiro else ",") + ",".join(bloco)
+    yield "]"
+
+
+def _gerar_ndjson(linhas, encoder, tamanho_bloco):
+    bloco = []
+    for dado in linhas:
+        bloco.append(encoder.encode(dado))
+        if len(bloco) >= tamanho_bloco:
+            yield "\n".join(bloco) + "\n"
+            bloco = []
+    if bloco:
+        yield "\n".join(bloco) + "\n"
+
+
+def resposta_json_streaming(request, queryset, serializer_class, *, context=None,
+                            tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Devolve um StreamingHttpResponse com o queryset serializado linha a linha.
+    Prefetches no queryset continuam valendo (são feitos a cada bloco).
+    """
+    contexto = {"request": request}
+    contexto.update(context or {})
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    linhas = _linhas_serializadas(queryset, serializer_class, contexto, tamanho_bloco)
+
+    if quer_ndjson(request):
+        blocos = _gerar_ndjson(linhas, encoder, tamanho_bloco)
+        content_type = f"{CONTENT_TYPE_NDJSON}; charset=utf-8"
+    else:
+        blocos = _gerar_array(linhas, encoder, tamanho_bloco)
+        content_type = "application/json; charset=utf-8"
+
+    response = StreamingHttpResponse(conteudo(request, blocos), content_type=content_type)
+    response["X-Accel-Buffering"] = "no"
+    return response
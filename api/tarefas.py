@@ -0,0 +1,111 @@
+# api/tarefas.py
+"""
+Execução de tarefas longas em segundo plano (importações, etc.).
+
+As tarefas rodam num pool de threads do próprio processo web e registram
+andamento em TarefaProcessamento, consultável em /api/tarefas/<id>/ e
+enviado em tempo real pelo stream /api/eventos/.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import eventos
+from .models import TarefaProcessamento
+
+logger = logging.getLogger("api")
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "TAREFAS_MAX_WORKERS", 2),
+    thread_name_prefix="tarefa",
+)
+
+
+# Pool separado para trabalhos curtos (notificações etc.), para não ficarem
+# na fila atrás de importações longas
+_executor_rapido = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tarefa-rapida")
+
+
+def disparar(funcao, *args, **kwargs) -> None:
+    """
+    Executa `funcao(*args, **kwargs)` em segundo plano depois do commit da
+    transação corrente, sem registro em TarefaProcessamento. Falhas só vão
+    para o log.
+    """
+    transaction.on_commit(
+        lambda: _executor_rapido.submit(_executar_simples, funcao, args, kwargs)
+    )
+
+
+def _executar_simples(funcao, args, kwargs):
+    close_old_connections()
+    try:
+        funcao(*args, **kwargs)
+    except Exception:
+        logger.exception("Falha em trabalho de segundo plano (%s)", getattr(funcao, "__name__", funcao))
+    finally:
+        connections.close_all()
+
+
+def agendar(tarefa: TarefaProcessamento, funcao, *args, **kwargs) -> None:
+    """
+    Agenda `funcao(tarefa, *args, **kwargs)` para depois do commit da transação
+    corrente. O retorno da função (JSON serializável) vira o `resultado`.
+    """
+    transaction.on_commit(
+        lambda: _executor.submit(_executar, tarefa.pk, funcao, args, kwargs)
+    )
+
+
+def atualizar_progresso(tarefa: TarefaProcessamento, processados: int,
+                        total: int = None, mensagem: str = None) -> None:
+    """Grava o andamento da tarefa (um UPDATE, sem tocar nos demais campos)."""
+    campos = {"processados": processados, "atualizado_em": timezone.now()}
+    tarefa.processados = processados
+    if total is not None:
+        campos["total"] = tarefa.total = total
+    if mensagem is not None:
+        campos["mensagem"] = tarefa.mensagem = mensagem[:255]
+    TarefaProcessamento.objects.filter(pk=tarefa.pk).update(**campos)
+    eventos.tarefa_atualizada(tarefa.pk)
+
+
+def _executar(tarefa_id, funcao, args, kwargs):
+    close_old_connections()
+    try:
+        tarefa = TarefaProcessamento.objects.get(pk=tarefa_id)
+        TarefaProcessamento.objects.filter(pk=tarefa_id).update(
+            status="executando", atualizado_em=timezone.now()
+        )
+        tarefa.status = "executando"
+        eventos.tarefa_atualizada(tarefa_id)
+
+        try:
+            resultado = funcao(tarefa, *args, **kwargs)
+        except Exception as exc:
+            logger.exception("Falha na tarefa %s (%s)", tarefa_id, tarefa.tipo)
+            TarefaProcessamento.objects.filter(pk=tarefa_id).update(
+                status="erro",
+                mensagem=str(exc)[:255],
+                # Progresso parcial, quando a exceção informa (ex.: ImportacaoInterrompida)
+                resultado=getattr(exc, "resultado", None),
+                atualizado_em=timezone.now(),
+                concluido_em=timezone.now(),
+            )
+            eventos.tarefa_atualizada(tarefa_id)
+            return
+
+        TarefaProcessamento.objects.filter(pk=tarefa_id).update(
+            status="concluida",
+            resultado=resultado,
+            atualizado_em=timezone.now(),
+            concluido_em=timezone.now(),
+        )
+        eventos.tarefa_atualizada(tarefa_id)
+    finally:
+        # A thread do pool não passa pelo ciclo de requisição: fecha a conexão aqui
+        connections.close_all()
@@ -0,0 +1,117 @@
+# api/travas.py
+"""
+Travas por (processo, operação) para as operações longas no PNCP.
+
+Publicar e sincronizar resultados encadeiam dezenas de chamadas ao PNCP;
+duas execuções simultâneas no mesmo processo (duplo clique, dois usuários)
+dobram a carga e podem duplicar resultados. A trava fica no banco
+(TravaOperacao, vale entre workers e servidores) como arrendamento:
+
+- travar() cria a trava ou levanta OperacaoEmAndamento com a execução
+  que já está rodando (a view responde 409 com o id dela);
+- enquanto a operação roda, uma thread renova o arrendamento a cada
+  terço de settings.TRAVA_OPERACAO_DURACAO_SEGUNDOS;
+- ao sair a trava é apagada; se o processo morrer no meio, ela vence
+  sozinha e a próxima execução assume.
+"""
+
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from .models import TravaOperacao
+
+logger = logging.getLogger("api")
+
+DURACAO = getattr(settings, "TRAVA_OPERACAO_DURACAO_SEGUNDOS", 60)
+
+# Nome das operações nas mensagens
+NOMES = {"publicacao": "publicação", "sincronizacao": "sincronização de resultados"}
+
+
+class OperacaoEmAndamento(ValueError):
+    """Outra execução detém a trava; 'trava' é o registro dela (ou None se acabou de sair)."""
+
+    def __init__(self, operacao, trava=None):
+        self.operacao = operacao
+        self.trava = trava
+        super().__init__(
+            f"Já existe uma {NOMES.get(operacao, operacao)} no PNCP em andamento para este processo."
+        )
+
+    def como_resposta(self):
+        """Corpo da resposta 409."""
+        corpo = {"detail": str(self), "operacao": self.operacao}
+        if self.trava is not None:
+            corpo.update({
+                "execucao": str(self.trava.dono),
+                "usuario": self.trava.usuario.username if self.trava.usuario else None,
+                "iniciada_em": self.trava.iniciada_em,
+                "expira_em": self.trava.expira_em,
+            })
+        return corpo
+
+
+class _Renovacao(threading.Thread):
+    """Renova o arrendamento das travas até ser parada."""
+
+    def __init__(self, travas, duracao):
+        super().__init__(name="trava-renovacao", daemon=True)
+        self._travas = travas
+        self._duracao = duracao
+        self._parar = threading.Event()
+
+    def run(self):
+        try:
+            while not self._parar.wait(self._duracao / 3):
+                for trava in self._travas:
+                    if not TravaOperacao.renovar(trava.pk, trava.dono, self._duracao):
+                        logger.warning(
+                            "Trava %s do processo %s perdida durante a execução",
+                            trava.operacao, trava.processo_id,
+                        )
+        except Exception:
+            logger.exception("Falha ao renovar travas de operação")
+        finally:
+            # Thread própria: fecha a conexão que abriu
+            connection.close()
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+@contextmanager
+def travar(processo_id, *operacoes, usuario=None, duracao=DURACAO):
+    """
+    Detém as travas das operações no processo durante o bloco e devolve o
+    id (UUID) da execução. OperacaoEmAndamento se alguma já está em uso.
+    Várias operações são travadas sempre na mesma ordem (sem deadlock).
+    """
+    execucao = uuid.uuid4()
+    adquiridas = []
+    try:
+        for operacao in sorted(set(operacoes)):
+            trava = TravaOperacao.adquirir(processo_id, operacao, execucao, usuario, duracao)
+            if trava is None:
+                atual = (
+                    TravaOperacao.objects.select_related("usuario")
+                    .filter(processo_id=processo_id, operacao=operacao)
+                    .first()
+                )
+                raise OperacaoEmAndamento(operacao, atual)
+            adquiridas.append(trava)
+
+        renovacao = _Renovacao(adquiridas, duracao)
+        renovacao.start()
+        try:
+            yield execucao
+        finally:
+            renovacao.parar()
+    finally:
+        for trava in adquiridas:
+            TravaOperacao.liberar(trava.pk, trava.dono)
@@ -31,6 +31,15 @@ from .views import (
     DocumentoPNCPViewSet,
     AtaRegistroPrecosViewSet,
     DocumentoAtaRegistroPrecosViewSet,
+    TarefaProcessamentoViewSet,
+    SincronizacaoView,
+    eventos_stream,
+    baixar_arquivo,
+    UploadPresignView,
+    SessaoUploadViewSet,
+    pncp_arquivos_view,
+    consultar_ata_pncp_view,
+    listar_atas_pncp_view,
 )
 
 # ============================================================
@@ -75,17 +84,32 @@ router.register(r'processo-documento-linhas', ProcessoDocumentoLinhaViewSet, bas
 router.register(r'atas-registro-precos', AtaRegistroPrecosViewSet, basename='atas-registro-precos')
 router.register(r'documentos-atas', DocumentoAtaRegistroPrecosViewSet, basename='documento-ata')
 
+# TAREFAS EM SEGUNDO PLANO (importações, etc.)
+router.register(r'tarefas', TarefaProcessamentoViewSet, basename='tarefa')
+
+# UPLOADS RETOMÁVEIS EM PARTES
+router.register(r'uploads', SessaoUploadViewSet, basename='upload')
+
 # ============================================================
 # 🛣️ URLPATTERNS COMPLETO
 # ============================================================
 
 urlpatterns = [
+    # Leituras no PNCP como views assíncronas (antes do router, mesmos caminhos das actions)
+    path('processos/<int:pk>/pncp/arquivos/', pncp_arquivos_view, name='processo-pncp-arquivos'),
+    path('atas-registro-precos/listar-pncp/', listar_atas_pncp_view, name='atas-registro-precos-listar-pncp'),
+    path('atas-registro-precos/<int:pk>/consultar-pncp/', consultar_ata_pncp_view, name='atas-registro-precos-consultar-pncp'),
+
     # Endpoints REST padrão (registrados via router)
     path('', include(router.urls)),
 
     # Ações customizadas
     path('reorder-itens/', ReorderItensView.as_view(), name='reorder-itens'),
     path('dashboard-stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('sincronizacao/', SincronizacaoView.as_view(), name='sincronizacao'),
+    path('eventos/', eventos_stream, name='eventos'),
+    path('downloads/<str:tipo>/<int:pk>/', baixar_arquivo, name='arquivo-download'),
+    path('uploads/presign/', UploadPresignView.as_view(), name='upload-presign'),
 
     # Autenticação e gerenciamento de usuários
     path('register/', CreateUserView.as_view(), name='register'),
@@ -104,6 +128,7 @@ urlpatterns = [
     path('system/config/', SystemConfigView.as_view(), name='system-config'),
 ]
 
-# Servir MEDIA em ambiente de desenvolvimento
+# Servir MEDIA em ambiente de desenvolvimento (em produção os documentos
+# saem por /api/downloads/, com checagem de permissão)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,33 +1,50 @@
 # api/views.py
 
+import functools
 import logging
 import json
+import mimetypes
 import re
+import httpx
 import requests
 import hashlib
+import uuid
+from collections import defaultdict
 
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, Max, OuterRef, Q
 from django.db.utils import ProgrammingError, OperationalError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import update_last_login
 from django.conf import settings
+from django.core.files.storage import default_storage
 
-from rest_framework import viewsets, permissions, filters, status, parsers, generics
+from rest_framework import viewsets, mixins, permissions, filters, status, parsers, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from asgiref.sync import sync_to_async
 
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
-from .services import PNCPService, ImportacaoService
+from .services import PNCPService, ImportacaoService, ImportacaoInterrompida
+from . import armazenamento, autocomplete, downloads, eventos, exportacao, pncp_async, prazos, processamento, sincronizacao, streaming, tarefas, travas, workspace
+from .filters import FornecedorProcessoFilter, ItemProcessoFilter, LoteProcessoFilter
 
 from django.shortcuts import get_object_or_404
 
@@ -37,6 +54,7 @@ from django.shortcuts import get_object_or_404
 from .models import (
     CustomUser,
     Entidade,
+    EntidadeFornecedor,
     Orgao,
     ProcessoLicitatorio,
     Lote,
@@ -52,7 +70,9 @@ from .models import (
     Notificacao,
     ArquivoUser,
     AtaRegistroPrecos,
-    DocumentoAtaRegistroPrecos
+    DocumentoAtaRegistroPrecos,
+    TarefaProcessamento,
+    SessaoUpload,
 )
 
 # Imports Locais - Serializers
@@ -66,6 +86,7 @@ from .serializers import (
     ProcessoLicitatorioSerializer,
     LoteSerializer,
     ItemSerializer,
+    ItemBulkSerializer,
     FornecedorSerializer,
     FornecedorProcessoSerializer,
     ItemFornecedorSerializer,
@@ -78,6 +99,8 @@ from .serializers import (
     DocumentoPNCPSerializer,
     AtaRegistroPrecosSerializer,
     DocumentoAtaRegistroPrecosSerializer,
+    TarefaProcessamentoSerializer,
+    SessaoUploadSerializer,
     infer_chave_documento_contrato,
 )
 
@@ -203,6 +226,53 @@ def parse_pncp_id(raw, slug_map, field_name="campo"):
     return int(_id)
 
 
+def formato_exportacao(request):
+    """Formato pedido em ?formato= (csv por padrão) ou None se inválido."""
+    formato = (request.query_params.get("formato") or "csv").lower()
+    return formato if formato in exportacao.FORMATOS else None
+
+
+ERRO_FORMATO_EXPORTACAO = {"detail": "Formato inválido. Use 'csv' ou 'xlsx'."}
+
+
+def status_erro_pncp(exc):
+    """
+    Status para um ValueError vindo do PNCPService: 504 se a falha veio do
+    prazo total da requisição ter acabado (ver api/prazos.py), 400 nos demais.
+    Conta como prazo o PrazoEsgotado e o timeout de uma chamada cujo tempo
+    foi encolhido pelo prazo (o prazo já está no fim); respostas de erro do
+    PNCP perto do fim do prazo continuam 400.
+    """
+    causa = exc
+    while causa is not None:
+        if isinstance(causa, prazos.PrazoEsgotado):
+            return status.HTTP_504_GATEWAY_TIMEOUT
+        if isinstance(causa, (requests.exceptions.Timeout, httpx.TimeoutException)) and prazos.esgotado():
+            return status.HTTP_504_GATEWAY_TIMEOUT
+        causa = causa.__cause__ or causa.__context__
+    return status.HTTP_400_BAD_REQUEST
+
+
+def com_trava_pncp(*operacoes):
+    """
+    Decorador de actions de detalhe do processo que falam com o PNCP: roda a
+    action com as travas (processo, operação) de api/travas.py. Se outra
+    execução já as detém, responde 409 com o id dela em vez de repetir as
+    chamadas ao PNCP.
+    """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltorio(self, request, *args, **kwargs):
+            processo = self.get_object()  # permissão antes de tocar na trava
+            try:
+                with travas.travar(processo.pk, *operacoes, usuario=request.user):
+                    return metodo(self, request, *args, **kwargs)
+            except travas.OperacaoEmAndamento as exc:
+                return Response(exc.como_resposta(), status=status.HTTP_409_CONFLICT)
+        return envoltorio
+    return decorador
+
+
 def get_documentos_contrato_ativos(contrato):
     return contrato.documentos.filter(ativo=True).exclude(status="removido").order_by("-criado_em")
 
@@ -268,7 +338,7 @@ def enviar_documentos_obrigatorios_contrato_para_pncp(contrato, cnpj_orgao):
             enviados.append({"chave": spec["chave"], "titulo": doc.titulo, "status": "ja_enviado"})
             continue
 
-        content_type = getattr(getattr(doc.arquivo, "file", None), "content_type", "application/pdf")
+        content_type = mimetypes.guess_type(doc.arquivo.name)[0] or "application/pdf"
 
         try:
             result = PNCPService.anexar_documento_contrato(
@@ -472,7 +542,7 @@ class OrgaoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         url = f"https://pncp.gov.br/api/pncp/v1/orgaos/{cnpj_digits}/unidades"
 
         try:
-            resp = requests.get(url, timeout=20)
+            resp = requests.get(url, timeout=prazos.timeout(20))
 
             if resp.status_code != 200:
                 return Response(
@@ -615,13 +685,56 @@ class FornecedorViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_superuser or user.is_staff:
             return qs
-        entidade_ids = list(user.entidades.values_list("id", flat=True))
-        if not entidade_ids:
-            return qs.none()
-        # Filtra fornecedores vinculados a processos das entidades do usuário
+        # Fornecedores que participam de processos das entidades do usuário
+        # (vínculo materializado: semijoin indexado, sem DISTINCT)
         return qs.filter(
-            processos__processo__entidade_id__in=entidade_ids
-        ).distinct()
+            Exists(
+                EntidadeFornecedor.objects.filter(
+                    fornecedor_id=OuterRef("pk"),
+                    entidade_id__in=user.entidades.values("id"),
+                )
+            )
+        )
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """Autocomplete: GET /fornecedores/autocomplete/?q=&limite= (ver api/autocomplete.py)."""
+        user = request.user
+        entidade_ids = None
+        if not (user.is_superuser or user.is_staff):
+            entidade_ids = list(user.entidades.values_list("id", flat=True))
+        return Response(
+            autocomplete.buscar_fornecedores(
+                request.query_params.get("q"),
+                entidade_ids,
+                limite=autocomplete.ler_limite(request.query_params.get("limite")),
+            )
+        )
+
+
+def _executar_importacao_xlsx(tarefa, nome_salvo, nome_original, *, processo_id=None,
+                              entidade_id=None, orgao_id=None):
+    """Corpo da tarefa de importação em segundo plano (ver importar_xlsx)."""
+    processo = ProcessoLicitatorio.objects.filter(pk=processo_id).first() if processo_id else None
+    try:
+        with default_storage.open(nome_salvo, "rb") as arquivo:
+            arquivo.name = nome_original
+            resultado = ImportacaoService.processar_planilha_padrao(
+                arquivo,
+                processo=processo,
+                entidade=Entidade.objects.filter(pk=entidade_id).first() if entidade_id else None,
+                orgao=Orgao.objects.filter(pk=orgao_id).first() if orgao_id else None,
+                progresso=lambda feitos, total: tarefas.atualizar_progresso(tarefa, feitos, total),
+                # Em segundo plano: aguarda vaga no pool e não tem tempo limite
+                espera_fila=None,
+                timeout=None,
+            )
+    finally:
+        default_storage.delete(nome_salvo)
+
+    processo = resultado.pop("processo")
+    TarefaProcessamento.objects.filter(pk=tarefa.pk).update(processo=processo)
+    return {"processo": processo.pk, **resultado}
 
 
 # ============================================================
@@ -645,6 +758,10 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         )
         return self.filter_by_entidade(qs)
 
+    def retrieve(self, request, *args, **kwargs):
+        detalhar = super().retrieve
+        return self._resposta_condicional(request, lambda: detalhar(request, *args, **kwargs))
+
     # ----------------------------------------------------------------------
     # IMPORTAÇÃO XLSX
     # ----------------------------------------------------------------------
@@ -655,6 +772,14 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         parser_classes=[parsers.MultiPartParser, parsers.FormParser],
     )
     def importar_xlsx(self, request):
+        """
+        Importa lotes/itens/fornecedores/propostas de uma planilha padrão.
+
+        Campos opcionais: 'processo' (importa num processo existente),
+        'entidade'/'orgao' (para o processo criado) e 'assincrono'. Planilhas
+        grandes (> IMPORTACAO_LIMITE_SINCRONO_BYTES) sempre rodam em segundo
+        plano: a resposta é 202 com a tarefa para acompanhar em /tarefas/<id>/.
+        """
         arquivo = request.FILES.get("arquivo")
         if not arquivo:
             return Response(
@@ -668,23 +793,91 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        entidade_ids = self.get_user_entidades_ids()
+        processo = entidade = orgao = None
+
+        processo_id = request.data.get("processo")
+        if processo_id:
+            processo = self.get_queryset().filter(pk=processo_id).first()
+            if not processo:
+                return Response({"detail": "Processo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            entidade_id = request.data.get("entidade")
+            if not entidade_id and entidade_ids and len(entidade_ids) == 1:
+                entidade_id = entidade_ids[0]
+            if entidade_id:
+                entidade = Entidade.objects.filter(pk=entidade_id).first()
+                if not entidade or (entidade_ids is not None and entidade.pk not in entidade_ids):
+                    return Response({"detail": "Entidade inválida."}, status=status.HTTP_400_BAD_REQUEST)
+            orgao_id = request.data.get("orgao")
+            if orgao_id:
+                orgao = Orgao.objects.filter(pk=orgao_id, entidade=entidade).first() if entidade else None
+                if not orgao:
+                    return Response({"detail": "Órgão inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        assincrono = (
+            str(request.data.get("assincrono", "")).lower() in ("1", "true", "sim")
+            or arquivo.size > getattr(settings, "IMPORTACAO_LIMITE_SINCRONO_BYTES", 2 * 1024 * 1024)
+        )
+
+        if assincrono:
+            nome_salvo = default_storage.save(f"importacoes/{uuid.uuid4().hex}.xlsx", arquivo)
+            with transaction.atomic():
+                tarefa = TarefaProcessamento.objects.create(
+                    tipo="importacao_xlsx",
+                    usuario=request.user,
+                    processo=processo,
+                    mensagem=f"Importação de {arquivo.name}"[:255],
+                )
+                tarefas.agendar(
+                    tarefa,
+                    _executar_importacao_xlsx,
+                    nome_salvo,
+                    arquivo.name,
+                    processo_id=processo.pk if processo else None,
+                    entidade_id=entidade.pk if entidade else None,
+                    orgao_id=orgao.pk if orgao else None,
+                )
+            return Response(
+                {
+                    "detail": "Importação agendada.",
+                    "tarefa": TarefaProcessamentoSerializer(tarefa).data,
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         try:
-            resultado = ImportacaoService.processar_planilha_padrao(arquivo)
-            processo_serializer = self.get_serializer(resultado["processo"])
+            resultado = ImportacaoService.processar_planilha_padrao(
+                arquivo, processo=processo, entidade=entidade, orgao=orgao
+            )
+            processo_serializer = self.get_serializer(resultado.pop("processo"))
 
             return Response(
                 {
                     "detail": "Importação concluída.",
                     "processo": processo_serializer.data,
-                    "lotes_criados": resultado.get("lotes_criados", 0),
-                    "itens_importados": resultado.get("itens_importados", 0),
-                    "fornecedores_vinculados": resultado.get(
-                        "fornecedores_vinculados", 0
-                    ),
+                    **resultado,
                 },
                 status=status.HTTP_201_CREATED,
             )
 
+        except processamento.PoolOcupado as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "10"},
+            )
+        except processamento.TempoEsgotado:
+            return Response(
+                {"detail": "A importação excedeu o tempo limite; envie com 'assincrono' para processar em segundo plano."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+        except ImportacaoInterrompida as e:
+            logger.exception("Importação XLSX interrompida")
+            return Response(
+                {"detail": str(e), "parcial": True, **e.resultado},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
         except ValueError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception:
@@ -694,6 +887,20 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    # ----------------------------------------------------------------------
+    # EXPORTAÇÃO DA GRADE (CSV/XLSX)
+    # ----------------------------------------------------------------------
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        """Exporta a grade de processos, respeitando filtros e busca (?formato=csv|xlsx)."""
+        formato = formato_exportacao(request)
+        if not formato:
+            return Response(ERRO_FORMATO_EXPORTACAO, status=status.HTTP_400_BAD_REQUEST)
+        qs = self.filter_queryset(self.get_queryset())
+        return exportacao.resposta_exportacao(
+            request, formato, "processos", exportacao.CABECALHO_PROCESSOS, exportacao.linhas_processos(qs)
+        )
+
     # ----------------------------------------------------------------------
     # STATUS PNCP (usado pelo modal no front)
     # ----------------------------------------------------------------------
@@ -763,12 +970,16 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         if not processo.orgao_id or not (processo.orgao and processo.orgao.codigo_unidade):
             erros.append("Processo sem Órgão/código da unidade compradora.")
 
-        itens = processo.itens.prefetch_related("propostas__fornecedor").select_related("fornecedor")
+        itens = (
+            processo.itens.prefetch_related("propostas__fornecedor")
+            .select_related("fornecedor")
+            .order_by("ordem", "id")
+        )
         if not itens.exists():
             erros.append("O processo não possui itens cadastrados.")
         else:
-            for item in itens:
-                numero_item = item.ordem or item.pncp_numero_item
+            for idx, item in enumerate(itens, start=1):
+                numero_item = item.pncp_numero_item or idx
                 if not numero_item:
                     erros.append(f"Item '{item.descricao or item.id}' sem número de ordem.")
 
@@ -836,6 +1047,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         url_path="enviar-pncp",
         parser_classes=[parsers.MultiPartParser, parsers.FormParser],
     )
+    @com_trava_pncp("publicacao", "sincronizacao")
     def enviar_pncp(self, request, pk=None):
         """
         Fluxo unificado do botão "Enviar PNCP":
@@ -890,7 +1102,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                     tipo_documento_id=tipo_documento_id,
                 )
             except ValueError as e:
-                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                return Response({"detail": str(e), "validacao": validacao}, status=status_erro_pncp(e))
 
             updated_fields = []
             ano_compra = pncp_resultado_publicacao.get("anoCompra") or pncp_resultado_publicacao.get("ano_compra")
@@ -987,7 +1199,10 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             try:
                 pncp_resultado_sync = PNCPService.sincronizar_resultados(processo)
             except ValueError as e:
-                return Response({"detail": str(e), "validacao": validacao}, status=status.HTTP_400_BAD_REQUEST)
+                return Response(
+                    {"detail": str(e), "validacao": validacao, "publicacao": pncp_resultado_publicacao},
+                    status=status_erro_pncp(e),
+                )
 
         detail_parts = []
         if pncp_resultado_publicacao:
@@ -1001,6 +1216,11 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                     f"sincronização: {pncp_resultado_sync.get('resultados_enviados', 0)}/"
                     f"{pncp_resultado_sync.get('total_itens', 0)}"
                 )
+                if pncp_resultado_sync.get("prazo_esgotado"):
+                    detail_parts.append(
+                        f"tempo limite atingido com {pncp_resultado_sync['itens_pendentes']} item(ns) "
+                        "pendente(s); envie novamente para continuar"
+                    )
             else:
                 detail_parts.append("sincronização solicitada")
 
@@ -1023,6 +1243,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         url_path="publicar-pncp",
         parser_classes=[parsers.MultiPartParser, parsers.FormParser],
     )
+    @com_trava_pncp("publicacao")
     def publicar_pncp(self, request, pk=None):
         """
         Publica a contratação no PNCP (cria a compra + envia um documento inicial).
@@ -1160,7 +1381,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             )
 
         except ValueError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"detail": str(e)}, status=status_erro_pncp(e))
 
         except Exception as e:
             logger.exception("Erro interno PNCP (publicar_pncp)")
@@ -1177,6 +1398,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         methods=["post"],
         url_path="sincronizar-pncp",
     )
+    @com_trava_pncp("sincronizacao")
     def sincronizar_pncp(self, request, pk=None):
         """
         Sincroniza os resultados dos itens (fornecedores vencedores)
@@ -1252,20 +1474,22 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 processo.pncp_ultimo_retorno = resultado
                 processo.save(update_fields=["pncp_ultimo_retorno"])
 
-            return Response(
-                {
-                    "detail": (
-                        f"Sincronização concluída: "
-                        f"{resultado['resultados_enviados']}/{resultado['total_itens']} "
-                        f"resultados enviados."
-                    ),
-                    "resultado": resultado,
-                },
-                status=status.HTTP_200_OK,
-            )
+            detail = (
+                f"Sincronização concluída: "
+                f"{resultado['resultados_enviados']}/{resultado['total_itens']} "
+                f"resultados enviados."
+            )
+            if resultado.get("prazo_esgotado"):
+                detail = (
+                    f"Sincronização parcial (tempo limite atingido): "
+                    f"{resultado['resultados_enviados']}/{resultado['total_itens']} "
+                    f"resultados enviados, {resultado['itens_pendentes']} item(ns) pendente(s). "
+                    f"Sincronize novamente para continuar."
+                )
+            return Response({"detail": detail, "resultado": resultado}, status=status.HTTP_200_OK)
 
         except ValueError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"detail": str(e)}, status=status_erro_pncp(e))
 
         except Exception as e:
             logger.exception("Erro interno PNCP (sincronizar_pncp)")
@@ -1797,19 +2021,130 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    # ----------------------------------------------------------------------
+    # COLEÇÕES DO PROCESSO (itens / fornecedores / lotes)
+    # ----------------------------------------------------------------------
+    def _resposta_condicional(self, request, gerar_resposta):
+        """
+        GET condicional pela versão do processo: uma consulta indexada
+        (pk + escopo de entidade) decide o 304 antes de montar a resposta.
+        O ETag também varia com a query string e o Accept (filtros/formato).
+        """
+        marca = (
+            self.get_queryset()
+            .filter(pk=self.kwargs["pk"])
+            .values_list("pk", "versao", "atualizado_em")
+            .first()
+        )
+        if marca is None:
+            raise Http404
+        pk, versao, atualizado_em = marca
+        variante = hashlib.sha1(
+            f"{request.get_full_path()}|{request.headers.get('Accept', '')}".encode("utf-8")
+        ).hexdigest()[:12]
+        etag = f'W/"{pk}-{versao}-{variante}"'
+
+        nao_modificado = get_conditional_response(request, etag=etag, last_modified=int(atualizado_em.timestamp()))
+        if nao_modificado is not None:
+            response = nao_modificado
+        else:
+            response = gerar_resposta()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(int(atualizado_em.timestamp()))
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def _processo_da_colecao(self):
+        """get_object sem os filtros da listagem: ?search etc. valem para a coleção."""
+        processo = get_object_or_404(self.get_queryset(), pk=self.kwargs["pk"])
+        self.check_object_permissions(self.request, processo)
+        return processo
+
+    def _responder_colecao(self, request, queryset, filterset_class, serializer_class, context=None):
+        """
+        Aplica filtros/ordenação do filterset e responde paginado quando
+        ?page ou ?page_size forem informados; sem eles, a coleção inteira
+        (já filtrada) é enviada em streaming.
+        """
+        filtro = filterset_class(request.query_params, queryset=queryset, request=request)
+        if not filtro.is_valid():
+            return Response(filtro.errors, status=status.HTTP_400_BAD_REQUEST)
+        qs = filtro.qs
+
+        if "page" in request.query_params or "page_size" in request.query_params:
+            paginator = StandardPagination()
+            pagina = paginator.paginate_queryset(qs, request, view=self)
+            contexto = {"request": request, **(context or {})}
+            serializer = serializer_class(pagina, many=True, context=contexto)
+            return paginator.get_paginated_response(serializer.data)
+
+        return streaming.resposta_json_streaming(request, qs, serializer_class, context=context)
+
+    # ----------------------------------------------------------------------
+    # WORKSPACE (tela do processo em uma requisição)
+    # ----------------------------------------------------------------------
+    @action(detail=True, methods=["get"], url_path="workspace")
+    def workspace(self, request, *args, **kwargs):
+        """
+        Processo, itens, lotes, fornecedores, propostas, documentos, contratos
+        e atas em uma resposta. ?include= escolhe as seções; ?etags=secao:etag
+        omite os dados das seções que o cliente já tem.
+        """
+        secoes, desconhecidas = workspace.secoes_pedidas(request.query_params.get("include"))
+        if desconhecidas:
+            return Response(
+                {
+                    "detail": f"Seções inválidas: {', '.join(desconhecidas)}.",
+                    "secoes_disponiveis": list(workspace.SECOES),
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def montar():
+            payload = workspace.montar_workspace(
+                self._processo_da_colecao(),
+                secoes,
+                request=request,
+                conhecidas=workspace.etags_conhecidas(request.query_params.get("etags")),
+            )
+            return Response(payload, status=status.HTTP_200_OK)
+
+        return self._resposta_condicional(request, montar)
+
     # ----------------------------------------------------------------------
     # ITENS DO PROCESSO
     # ----------------------------------------------------------------------
-    @action(detail=True, methods=["get"])
+    @action(detail=True, methods=["get"], renderer_classes=streaming.RENDERERS_COLECAO)
     def itens(self, request, *args, **kwargs):
+        def listar():
+            processo = self._processo_da_colecao()
+            itens = (
+                Item.objects.filter(processo=processo)
+                .select_related("processo", "lote", "fornecedor")
+                .order_by("ordem", "id")
+            )
+            # Numeração 1..N calculada uma vez (só ids) em vez de por item
+            contexto = {"_numeracao_itens": {processo.pk: processo.numeracao_itens()}}
+            return self._responder_colecao(
+                request, itens, ItemProcessoFilter, ItemSerializer, context=contexto
+            )
+
+        return self._resposta_condicional(request, listar)
+
+    @action(detail=True, methods=["get"], url_path="itens/exportar")
+    def exportar_itens(self, request, *args, **kwargs):
+        """Exporta os itens do processo com propostas e vencedor (?formato=csv|xlsx)."""
         processo = self.get_object()
-        itens = (
-            Item.objects.filter(processo=processo)
-            .select_related("lote", "fornecedor")
-            .order_by("ordem", "id")
+        formato = formato_exportacao(request)
+        if not formato:
+            return Response(ERRO_FORMATO_EXPORTACAO, status=status.HTTP_400_BAD_REQUEST)
+        nome = re.sub(r"[^\w.-]+", "_", f"itens_{processo.numero_processo or processo.pk}")
+        return exportacao.resposta_exportacao(
+            request, formato, nome, exportacao.CABECALHO_ITENS,
+            exportacao.linhas_itens(Item.objects.filter(processo=processo)),
         )
-        serializer = ItemSerializer(itens, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
     # ----------------------------------------------------------------------
     # VINCULAR FORNECEDORES AO PROCESSO
@@ -1848,14 +2183,17 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED,
         )
 
-    @action(detail=True, methods=["get"], url_path="fornecedores")
+    @action(detail=True, methods=["get"], url_path="fornecedores", renderer_classes=streaming.RENDERERS_COLECAO)
     def fornecedores(self, request, *args, **kwargs):
-        processo = self.get_object()
-        fornecedores = Fornecedor.objects.filter(
-            processos__processo=processo
-        ).order_by("razao_social")
-        serializer = FornecedorSerializer(fornecedores, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def listar():
+            fornecedores = Fornecedor.objects.filter(
+                processos__processo=self._processo_da_colecao()
+            ).order_by("razao_social")
+            return self._responder_colecao(
+                request, fornecedores, FornecedorProcessoFilter, FornecedorSerializer
+            )
+
+        return self._resposta_condicional(request, listar)
 
     @action(detail=True, methods=["post"], url_path="remover_fornecedor")
     def remover_fornecedor(self, request, *args, **kwargs):
@@ -1886,13 +2224,21 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
     # ----------------------------------------------------------------------
     # GERENCIAMENTO DE LOTES
     # ----------------------------------------------------------------------
-    @action(detail=True, methods=["get", "post"], url_path="lotes")
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        url_path="lotes",
+        renderer_classes=streaming.RENDERERS_COLECAO,
+    )
     def lotes(self, request, *args, **kwargs):
-        processo = self.get_object()
-
         if request.method == "GET":
-            qs = processo.lotes.order_by("numero")
-            return Response(LoteSerializer(qs, many=True).data)
+            def listar():
+                qs = self._processo_da_colecao().lotes.order_by("numero")
+                return self._responder_colecao(request, qs, LoteProcessoFilter, LoteSerializer)
+
+            return self._resposta_condicional(request, listar)
+
+        processo = self._processo_da_colecao()
 
         # POST
         payload = request.data
@@ -1980,6 +2326,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        numeracao = processo.numeracao_itens()
         resultados = []
         for v in vencedores:
             cnpj_forn = re.sub(r"\D", "", v.fornecedor.cnpj or "")
@@ -1989,7 +2336,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 else float(v.valor_proposto or 0)
             )
             resultados.append({
-                "numeroItem": v.item.pncp_numero_item or v.item.ordem,
+                "numeroItem": v.item.pncp_numero_item or numeracao.get(v.item_id),
                 "niFornecedor": cnpj_forn,
                 "tipoPessoaFornecedor": "PJ" if len(cnpj_forn) == 14 else "PF",
                 "valorUnitario": valor_unitario_homologado,
@@ -2014,7 +2361,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 headers=headers,
                 json=payload,
                 verify=PNCPService.VERIFY_SSL,
-                timeout=60,
+                timeout=prazos.timeout(60),
             )
 
             if resp.status_code in (200, 201):
@@ -2060,7 +2407,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             )
             return Response(result, status=status.HTTP_200_OK)
         except ValueError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"detail": str(exc)}, status=status_erro_pncp(exc))
 
     # ------------------------------------------------------------------
     # EXCLUIR CONTRATAÇÃO NO PNCP
@@ -2088,7 +2435,7 @@ class ProcessoLicitatorioViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 justificativa=justificativa,
             )
         except ValueError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"detail": str(exc)}, status=status_erro_pncp(exc))
 
         processo.pncp_ano_compra = None
         processo.pncp_sequencial_compra = None
@@ -2126,7 +2473,7 @@ class LoteViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             return Response({"error": "Envie uma lista de IDs."}, status=status.HTTP_400_BAD_REQUEST)
         qs = self.get_queryset().filter(id__in=ids)
         # desvincula itens antes de deletar
-        Item.objects.filter(lote__in=qs).update(lote=None)
+        Item.objects.filter(lote__in=qs).update(lote=None, atualizado_em=timezone.now())
         deleted, _ = qs.delete()
         return Response({"deleted": deleted}, status=status.HTTP_200_OK)
 
@@ -2157,6 +2504,149 @@ class ItemViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         deleted, _ = self.get_queryset().filter(id__in=ids).delete()
         return Response({"deleted": deleted}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        """
+        Exporta itens com propostas e vencedor de todos os processos visíveis
+        (filtros da listagem + ?entidade=), em streaming (?formato=csv|xlsx).
+        """
+        formato = formato_exportacao(request)
+        if not formato:
+            return Response(ERRO_FORMATO_EXPORTACAO, status=status.HTTP_400_BAD_REQUEST)
+        qs = self.filter_queryset(self.get_queryset())
+        entidade = request.query_params.get("entidade")
+        if entidade:
+            qs = qs.filter(processo__entidade_id=entidade)
+        return exportacao.resposta_exportacao(
+            request, formato, "itens", exportacao.CABECALHO_ITENS, exportacao.linhas_itens(qs)
+        )
+
+    BULK_MAX_LINHAS = 10000
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Cria/atualiza itens de um processo em lote.
+
+        Payload: {"processo": id, "itens": [{...}, {"id": 10, ...}], "atomico": true}
+        Linhas com "id" atualizam o item existente; as demais são criadas no fim
+        da lista, com a faixa de 'ordem' alocada de uma vez sob trava do processo.
+        Com "atomico" (padrão) qualquer linha inválida cancela o lote; sem ele,
+        as linhas válidas são gravadas e os erros devolvidos por índice.
+        """
+        processo_id = request.data.get("processo")
+        linhas = request.data.get("itens")
+        atomico = request.data.get("atomico", True) not in (False, "false", "0", 0)
+
+        if not processo_id:
+            return Response({"detail": "processo é obrigatório."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(linhas, list) or not linhas:
+            return Response({"detail": "itens deve ser uma lista não vazia."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(linhas) > self.BULK_MAX_LINHAS:
+            return Response(
+                {"detail": f"Limite de {self.BULK_MAX_LINHAS} itens por requisição."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        processos = ProcessoLicitatorio.objects.filter(pk=processo_id)
+        entidade_ids = self.get_user_entidades_ids()
+        if entidade_ids is not None:
+            processos = processos.filter(entidade_id__in=entidade_ids)
+        processo = processos.first()
+        if not processo:
+            return Response({"detail": "Processo não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        # 1. Validação de campos, linha a linha (sem consultas)
+        erros = {}
+        validas = []
+        for indice, linha in enumerate(linhas):
+            if not isinstance(linha, dict):
+                erros[indice] = {"non_field_errors": ["Linha inválida."]}
+                continue
+            ser = ItemBulkSerializer(data=linha, partial=linha.get("id") is not None)
+            if ser.is_valid():
+                validas.append((indice, ser.validated_data))
+            else:
+                erros[indice] = ser.errors
+
+        # 2. Conferência das referências em lote (uma consulta por tipo)
+        lote_ids = {d["lote"] for _, d in validas if d.get("lote")}
+        fornecedor_ids = {d["fornecedor"] for _, d in validas if d.get("fornecedor")}
+        item_ids = {d["id"] for _, d in validas if d.get("id") is not None}
+
+        lotes_ok = set(processo.lotes.filter(id__in=lote_ids).values_list("id", flat=True))
+        fornecedores_ok = set(Fornecedor.objects.filter(id__in=fornecedor_ids).values_list("id", flat=True))
+        existentes = processo.itens.in_bulk(item_ids)
+
+        criar, atualizar = [], []
+        for indice, dados in validas:
+            falhas = {}
+            if dados.get("lote") and dados["lote"] not in lotes_ok:
+                falhas["lote"] = ["O lote selecionado não pertence a este processo."]
+            if dados.get("fornecedor") and dados["fornecedor"] not in fornecedores_ok:
+                falhas["fornecedor"] = ["Fornecedor não encontrado."]
+            if dados.get("id") is not None and dados["id"] not in existentes:
+                falhas["id"] = ["Item não encontrado neste processo."]
+            if falhas:
+                erros[indice] = falhas
+                continue
+
+            campos = dict(dados)
+            for fk in ("lote", "fornecedor"):
+                if fk in campos:
+                    campos[f"{fk}_id"] = campos.pop(fk)
+            if "id" in campos:
+                atualizar.append((existentes[campos.pop("id")], campos))
+            else:
+                criar.append(campos)
+
+        lista_erros = [{"indice": i, "erros": e} for i, e in sorted(erros.items())]
+        if lista_erros and atomico:
+            return Response(
+                {"detail": "Existem linhas inválidas; nenhum item foi gravado.", "erros": lista_erros},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 3. Gravação: faixa de 'ordem' alocada uma única vez sob trava do processo
+        with transaction.atomic():
+            processo.travar()
+            novos = []
+            if criar:
+                ultimo = processo.itens.aggregate(maior=Max("ordem"))["maior"] or 0
+                if ultimo + len(criar) * Item.INTERVALO_ORDEM > Item.ORDEM_MAXIMA:
+                    processo.rebalancear_itens()
+                    ultimo = processo.itens.aggregate(maior=Max("ordem"))["maior"] or 0
+                novos = [
+                    Item(processo=processo, ordem=ultimo + k * Item.INTERVALO_ORDEM, **campos)
+                    for k, campos in enumerate(criar, start=1)
+                ]
+                Item.objects.bulk_create(novos, batch_size=500)
+
+            if atualizar:
+                # Um UPDATE por conjunto de campos enviados: cada linha grava só
+                # o que mandou (os demais campos foram lidos antes da trava)
+                grupos = defaultdict(list)
+                agora = timezone.now()
+                for item, campos in atualizar:
+                    for campo, valor in campos.items():
+                        setattr(item, campo, valor)
+                    item.atualizado_em = agora
+                    grupos[tuple(sorted(campos))].append(item)
+                for campos, itens in grupos.items():
+                    Item.objects.bulk_update(itens, [*campos, "atualizado_em"], batch_size=500)
+            if novos or atualizar:
+                ProcessoLicitatorio.registrar_alteracao(processo.pk)
+
+        return Response(
+            {
+                "criados": len(novos),
+                "atualizados": len(atualizar),
+                "ids_criados": [i.pk for i in novos],
+                "erros": lista_erros,
+            },
+            status=status.HTTP_201_CREATED if novos else status.HTTP_200_OK,
+        )
+
     @action(detail=True, methods=["post"], url_path="definir-fornecedor")
     def definir_fornecedor(self, request, pk=None):
         """
@@ -2241,35 +2731,112 @@ class ItemFornecedorViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
 
 
 class ReorderItensView(APIView):
-    permission_classes = [IsAuthenticated]
+    """
+    Reordena itens usando ranks esparsos em Item.ordem.
 
-    def post(self, request, _format=None):
-        item_ids = request.data.get("item_ids", [])
-        if not isinstance(item_ids, list) or not item_ids:
-            return Response(
-                {"error": "item_ids deve ser uma lista não vazia."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    Aceita dois formatos:
+      - {"item_ids": [...]}: nova ordem completa (ou parcial) da lista; apenas
+        os itens que mudaram de posição relativa são regravados.
+      - {"item_id": X, "antes_de": Y} / {"item_id": X, "depois_de": Y}: move um
+        único item (sem vizinho, vai para o fim), regravando uma linha.
+    """
+    permission_classes = [IsAuthenticated]
 
-        user = request.user
+    def _itens_permitidos(self, user, ids):
         # Filtra apenas itens que o usuário tem acesso (multi-tenant)
-        qs = Item.objects.filter(id__in=item_ids)
+        qs = Item.objects.filter(id__in=ids)
         if not user.is_superuser and not user.is_staff:
             entidade_ids = list(user.entidades.values_list("id", flat=True))
             if entidade_ids:
                 qs = qs.filter(processo__entidade_id__in=entidade_ids)
             else:
                 qs = qs.none()
+        return qs
 
-        allowed_ids = set(qs.values_list("id", flat=True))
+    def post(self, request, _format=None):
+        if request.data.get("item_id") is not None:
+            return self._mover_item(request)
 
+        item_ids = request.data.get("item_ids", [])
+        if not isinstance(item_ids, list) or not item_ids:
+            return Response(
+                {"error": "item_ids deve ser uma lista não vazia."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            item_ids = [int(i) for i in item_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "item_ids deve conter apenas IDs numéricos."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        allowed = self._itens_permitidos(request.user, item_ids).values_list("id", "processo_id")
+        por_processo = {}
+        for item_id, processo_id in allowed:
+            por_processo.setdefault(processo_id, set()).add(item_id)
+
+        regravados = 0
         with transaction.atomic():
-            for index, item_id in enumerate(item_ids):
-                if item_id in allowed_ids:
-                    Item.objects.filter(id=item_id).update(ordem=index + 1)
+            # Ordem fixa de travamento entre processos (sem deadlock)
+            for processo in ProcessoLicitatorio.objects.filter(id__in=por_processo.keys()).order_by('id'):
+                ids_processo = por_processo[processo.id]
+                regravados += processo.reordenar_itens([i for i in item_ids if i in ids_processo])
 
         return Response(
-            {"status": "Itens reordenados com sucesso."},
+            {"status": "Itens reordenados com sucesso.", "itens_regravados": regravados},
+            status=status.HTTP_200_OK,
+        )
+
+    def _mover_item(self, request):
+        ids = {
+            "item_id": request.data.get("item_id"),
+            "antes_de": request.data.get("antes_de"),
+            "depois_de": request.data.get("depois_de"),
+        }
+        if ids["antes_de"] is not None and ids["depois_de"] is not None:
+            return Response(
+                {"error": "Informe apenas um entre 'antes_de' e 'depois_de'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ids = {k: int(v) for k, v in ids.items() if v is not None}
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "IDs de item inválidos."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        itens = {i.id: i for i in self._itens_permitidos(request.user, ids.values())}
+        item = itens.get(ids["item_id"])
+        vizinho_id = ids.get("antes_de") or ids.get("depois_de")
+        vizinho = itens.get(vizinho_id) if vizinho_id else None
+        if not item or (vizinho_id and not vizinho):
+            return Response(
+                {"error": "Item não encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if vizinho and (vizinho.processo_id != item.processo_id or vizinho.id == item.id):
+            return Response(
+                {"error": "O item de referência deve ser outro item do mesmo processo."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                regravados = item.processo.mover_item(
+                    item,
+                    antes_de=vizinho if "antes_de" in ids else None,
+                    depois_de=vizinho if "depois_de" in ids else None,
+                )
+        except Item.DoesNotExist:
+            return Response(
+                {"error": "Item não encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(
+            {"status": "Item movido com sucesso.", "itens_regravados": regravados},
             status=status.HTTP_200_OK,
         )
 
@@ -2293,12 +2860,13 @@ class DashboardStatsView(APIView):
             itens_qs = Item.objects.filter(processo__entidade_id__in=entidade_ids)
             orgaos_qs = Orgao.objects.filter(entidade_id__in=entidade_ids)
             # Conta fornecedores vinculados a processos das entidades do usuário
-            total_fornecedores = (
-                Fornecedor.objects
-                .filter(processos__processo__entidade_id__in=entidade_ids)
-                .distinct()
-                .count()
-            )
+            total_fornecedores = Fornecedor.objects.filter(
+                Exists(
+                    EntidadeFornecedor.objects.filter(
+                        fornecedor_id=OuterRef("pk"), entidade_id__in=entidade_ids
+                    )
+                )
+            ).count()
         else:
             # Usuário sem entidades: não vê nada
             processos_qs = ProcessoLicitatorio.objects.none()
@@ -2317,6 +2885,505 @@ class DashboardStatsView(APIView):
         return Response(data)
 
 
+class SincronizacaoView(EntidadeFilterMixin, APIView):
+    """
+    Feed de alterações da entidade desde um cursor (ver api/sincronizacao.py).
+
+    GET /api/sincronizacao/?entidade=<id>&cursor=<cursor anterior>
+    Sem cursor, devolve o cursor inicial com "recarregar": true.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        entidade_ids = self.get_user_entidades_ids()
+        entidade_id = request.query_params.get("entidade")
+        if not entidade_id and entidade_ids and len(entidade_ids) == 1:
+            entidade_id = entidade_ids[0]
+        if not entidade_id:
+            return Response({"detail": "Informe a entidade."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            entidade_id = int(entidade_id)
+        except (TypeError, ValueError):
+            return Response({"detail": "Entidade inválida."}, status=status.HTTP_400_BAD_REQUEST)
+        if entidade_ids is not None and entidade_id not in entidade_ids:
+            raise PermissionDenied("Você não tem acesso a esta entidade.")
+
+        cursor = request.query_params.get("cursor")
+        try:
+            desde = sincronizacao.ler_cursor(cursor) if cursor else None
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(sincronizacao.coletar_alteracoes(entidade_id, desde, request=request))
+
+
+async def _usuario_jwt(request, aceitar_query=False):
+    """
+    Autenticação JWT para views assíncronas (fora do DRF).
+    Devolve (usuario, token, None) ou (None, None, resposta 401).
+    """
+    autenticacao = JWTAuthentication()
+    bruto = request.GET.get("token") if aceitar_query else None
+    if not bruto:
+        cabecalho = autenticacao.get_header(request)
+        bruto = autenticacao.get_raw_token(cabecalho) if cabecalho else None
+    if not bruto:
+        return None, None, JsonResponse({"detail": "As credenciais de autenticação não foram fornecidas."}, status=401)
+    try:
+        token = autenticacao.get_validated_token(bruto)
+        usuario = await sync_to_async(autenticacao.get_user)(token)
+    except (InvalidToken, AuthenticationFailed) as exc:
+        return None, None, JsonResponse({"detail": str(exc)}, status=401)
+    return usuario, token, None
+
+
+async def eventos_stream(request):
+    """
+    Stream SSE do usuário: novas notificações e andamento das tarefas
+    (ver api/eventos.py). View assíncrona: servir com ASGI (uvicorn/daphne).
+
+    GET /api/eventos/  (Authorization: Bearer <access> ou ?token=<access>,
+    já que o EventSource do navegador não envia cabeçalhos)
+    O stream encerra ao expirar o token; o cliente reconecta com um novo.
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": "Método não permitido."}, status=405)
+
+    usuario, token, erro = await _usuario_jwt(request, aceitar_query=True)
+    if erro:
+        return erro
+
+    ultimo_id = request.headers.get("Last-Event-ID") or request.GET.get("ultimo_id")
+    try:
+        ultimo_id = int(ultimo_id) if ultimo_id else None
+    except ValueError:
+        ultimo_id = None
+
+    response = StreamingHttpResponse(
+        eventos.stream(usuario.pk, ultimo_id, expira_em=token.get("exp")),
+        content_type="text/event-stream; charset=utf-8",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+# ============================================================
+# ☁️ UPLOAD DIRETO AO ARMAZENAMENTO
+# ============================================================
+
+def _tem_arquivo(request):
+    return bool(
+        request.FILES.get("arquivo") or request.data.get("upload") or request.data.get("sessao_upload")
+    )
+
+
+def _nome_arquivo_recebido(request):
+    arquivo = request.FILES.get("arquivo")
+    if arquivo:
+        return arquivo.name
+    if request.data.get("upload"):
+        return armazenamento.nome_do_upload(request.data.get("upload"))
+    try:
+        return (
+            SessaoUpload.objects.filter(pk=request.data.get("sessao_upload"), usuario=request.user)
+            .values_list("nome", flat=True).first()
+        )
+    except DjangoValidationError:
+        return None
+
+
+def _arquivo_recebido(request, tipo):
+    """
+    Arquivo de um documento: multipart ('arquivo'), upload direto ao bucket
+    ('upload' + 'arquivo_hash') ou upload em partes já finalizado
+    ('sessao_upload'); ver api/armazenamento.py.
+    Devolve (arquivo, nome, hash), em que arquivo é o UploadedFile ou a chave
+    já gravada no storage; (None, None, None) se nada foi enviado.
+    ValueError se o upload não confere.
+    """
+    arquivo = request.FILES.get("arquivo")
+    if arquivo:
+        return arquivo, arquivo.name, armazenamento.sha256(arquivo)
+    sessao_id = request.data.get("sessao_upload")
+    if sessao_id:
+        return armazenamento.anexar_sessao(sessao_id, request.user.pk, tipo)
+    token = request.data.get("upload")
+    if not token:
+        return None, None, None
+    enviado = armazenamento.finalizar_upload(token, tipo, request.user.pk, request.data.get("arquivo_hash"))
+    return enviado.chave, enviado.nome, enviado.hash
+
+
+class UploadEmUso(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Este upload já foi anexado a outro documento."
+
+
+def _campos_upload_direto(request, tipo, metadados=True):
+    """Campos para serializer.save() quando o arquivo veio do armazenamento ({} no multipart)."""
+    if request.FILES.get("arquivo") or not (request.data.get("upload") or request.data.get("sessao_upload")):
+        return {}
+    try:
+        arquivo, nome, file_hash = _arquivo_recebido(request, tipo)
+    except armazenamento.UploadJaAnexado as exc:
+        raise UploadEmUso(str(exc))
+    except ValueError as exc:
+        raise ValidationError({"detail": str(exc)})
+    if not metadados:
+        return {"arquivo": arquivo}
+    return {"arquivo": arquivo, "arquivo_nome": nome, "arquivo_hash": file_hash}
+
+
+class UploadPresignView(APIView):
+    """
+    URL pré-assinada para enviar um arquivo direto ao bucket S3/compatível.
+
+    POST /api/uploads/presign/ {"tipo": "documentos-pncp", "nome", "tamanho", "content_type"}
+    O cliente faz o POST multipart em 'url' com 'campos' + o arquivo e depois
+    cria o documento no endpoint do tipo com {"upload": ..., "arquivo_hash": ...}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        tipo = request.data.get("tipo")
+        if tipo not in downloads.TIPOS:
+            return Response(
+                {"detail": f"Tipo inválido. Use um de: {', '.join(downloads.TIPOS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            dados = armazenamento.preparar_upload(
+                downloads.TIPOS[tipo][0],
+                tipo,
+                request.user.pk,
+                request.data.get("nome"),
+                request.data.get("tamanho"),
+                request.data.get("content_type"),
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dados, status=status.HTTP_201_CREATED)
+
+
+class SessaoUploadViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Upload retomável em partes (api/armazenamento.py):
+
+    1. POST   /api/uploads/ {"tipo", "nome", "tamanho", "content_type", "arquivo_hash"?}
+    2. PUT    /api/uploads/<id>/partes/  corpo = bytes da parte,
+              cabeçalho Upload-Offset (ou ?offset=) e, opcional, X-Parte-SHA256;
+              partes entre 'parte_minima' e 'parte_maxima' (só a última menor)
+    3. POST   /api/uploads/<id>/finalizar/
+    4. criar o documento no endpoint do tipo com {"sessao_upload": <id>}
+
+    Após uma queda, GET /api/uploads/<id>/ informa 'recebido' (próximo
+    offset) e o cliente reenvia só o restante. 409 em offset fora de ordem.
+    """
+    serializer_class = SessaoUploadSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_value_regex = "[0-9a-fA-F-]{36}"
+
+    def get_queryset(self):
+        return SessaoUpload.objects.filter(usuario=self.request.user)
+
+    def _resposta(self, sessao, status_code=status.HTTP_200_OK):
+        response = Response(self.get_serializer(sessao).data, status=status_code)
+        response["Upload-Offset"] = str(sessao.recebido)
+        return response
+
+    @staticmethod
+    def _erro(exc):
+        if isinstance(exc, SessaoUpload.DoesNotExist):
+            return Response({"detail": "Sessão de upload não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        if isinstance(exc, armazenamento.OffsetInvalido):
+            return Response({"detail": str(exc), "recebido": exc.recebido}, status=status.HTTP_409_CONFLICT)
+        if isinstance(exc, armazenamento.SessaoOcupada):
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def create(self, request, *args, **kwargs):
+        tipo = request.data.get("tipo")
+        if tipo not in downloads.TIPOS:
+            return Response(
+                {"detail": f"Tipo inválido. Use um de: {', '.join(downloads.TIPOS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            sessao = armazenamento.iniciar_sessao(
+                request.user.pk,
+                tipo,
+                downloads.TIPOS[tipo][0],
+                request.data.get("nome"),
+                request.data.get("tamanho"),
+                request.data.get("content_type"),
+                request.data.get("arquivo_hash"),
+            )
+        except ValueError as exc:
+            return self._erro(exc)
+        response = self._resposta(sessao, status.HTTP_201_CREATED)
+        response.data["parte_maxima"] = armazenamento.PARTE_MAXIMA
+        response.data["parte_minima"] = armazenamento.parte_minima(sessao)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        armazenamento.cancelar_sessao(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["put"], url_path="partes")
+    def partes(self, request, pk=None):
+        try:
+            offset = int(request.headers.get("Upload-Offset") or request.query_params.get("offset"))
+            tamanho = int(request.headers.get("Content-Length") or 0)
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "Informe o offset da parte (cabeçalho Upload-Offset ou ?offset=)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            # Corpo cru lido em blocos direto do stream (sem parser nem cópia em memória)
+            sessao = armazenamento.receber_parte(
+                pk, request.user.pk, offset, request.stream, tamanho, request.headers.get("X-Parte-SHA256")
+            )
+        except (SessaoUpload.DoesNotExist, ValueError) as exc:
+            return self._erro(exc)
+        return self._resposta(sessao)
+
+    @action(detail=True, methods=["post"], url_path="finalizar")
+    def finalizar(self, request, pk=None):
+        sessao = self.get_object()
+        try:
+            sessao = armazenamento.finalizar_sessao(pk, request.user.pk, downloads.TIPOS[sessao.tipo][0])
+        except (SessaoUpload.DoesNotExist, ValueError) as exc:
+            return self._erro(exc)
+        return self._resposta(sessao)
+
+
+# ============================================================
+# 📥 DOWNLOAD DE ARQUIVOS
+# ============================================================
+
+def baixar_arquivo(request, tipo, pk):
+    """
+    Download autenticado de documentos e arquivos enviados (api/downloads.py).
+
+    GET /api/downloads/<tipo>/<pk>/  (Authorization: Bearer <access> ou
+    ?assinatura=..., a URL assinada exposta em arquivo_url)
+    ?download=1 força "salvar como" (Content-Disposition: attachment).
+    Com DOWNLOAD_SERVIDOR configurado quem transmite é o nginx/apache/litespeed.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return JsonResponse({"detail": "Método não permitido."}, status=405)
+
+    usuario = None
+    assinatura = request.GET.get("assinatura")
+    if assinatura:
+        usuario_id = downloads.ler_assinatura(assinatura, tipo, pk)
+        if usuario_id is None:
+            return JsonResponse({"detail": "Link de download inválido ou expirado."}, status=403)
+        usuario = User.objects.filter(pk=usuario_id, is_active=True).first()
+    else:
+        try:
+            autenticado = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed) as exc:
+            return JsonResponse({"detail": str(exc)}, status=401)
+        usuario = autenticado[0] if autenticado else None
+    if usuario is None:
+        return JsonResponse({"detail": "As credenciais de autenticação não foram fornecidas."}, status=401)
+
+    obj = downloads.localizar(tipo, pk, usuario)
+    if obj is None or not obj.arquivo:
+        return _nao_encontrado()
+    try:
+        return downloads.resposta_arquivo(request, obj, como_anexo=request.GET.get("download") == "1")
+    except FileNotFoundError:
+        logger.error("Arquivo ausente no storage: %s (%s #%s)", obj.arquivo.name, tipo, pk)
+        return _nao_encontrado()
+
+
+# ============================================================
+# 🌐 PNCP — LEITURAS ASSÍNCRONAS
+# ============================================================
+# Consultas que só repassam a resposta do PNCP rodam como views assíncronas
+# (api/pncp_async.py): sob ASGI a espera pelo portal não ocupa um worker.
+# As rotas ficam em urls.py antes do router, nos mesmos caminhos das actions.
+
+def _sob_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+
+def _nao_encontrado():
+    return JsonResponse({"detail": "Não encontrado."}, status=404)
+
+
+def _processo_do_usuario(usuario, pk):
+    # Mesmo escopo do EntidadeFilterMixin: só superuser vê todas as entidades
+    qs = ProcessoLicitatorio.objects.select_related("entidade").filter(pk=pk)
+    if not usuario.is_superuser:
+        qs = qs.filter(entidade_id__in=usuario.entidades.values("id"))
+    return qs.first()
+
+
+def _ata_do_usuario(usuario, pk):
+    qs = AtaRegistroPrecos.objects.select_related("processo", "processo__entidade").filter(pk=pk, ativo=True)
+    if not usuario.is_superuser:
+        qs = qs.filter(processo__entidade_id__in=usuario.entidades.values("id"))
+    return qs.first()
+
+
+def _processo_das_atas(usuario, pk):
+    qs = ProcessoLicitatorio.objects.select_related("entidade").filter(pk=pk)
+    if not usuario.is_superuser and not usuario.is_staff:
+        qs = qs.filter(entidade_id__in=usuario.entidades.values("id"))
+    return qs.first()
+
+
+def _resposta_repassada(resp):
+    """Repassa a resposta do PNCP como as actions síncronas faziam."""
+    if resp.status_code == 200:
+        return JsonResponse(resp.json(), status=200, safe=False)
+    return JsonResponse(
+        {"detail": f"PNCP retornou {resp.status_code}", "body": resp.text},
+        status=resp.status_code,
+    )
+
+
+# POST (anexar documento) continua na action síncrona do ViewSet
+_pncp_arquivos_sincrono = ProcessoLicitatorioViewSet.as_view(
+    {"post": "pncp_arquivos"}, detail=True, basename="processo", **ProcessoLicitatorioViewSet.pncp_arquivos.kwargs
+)
+
+
+@csrf_exempt
+async def pncp_arquivos_view(request, pk):
+    """GET /processos/{id}/pncp/arquivos/ — ver ProcessoLicitatorioViewSet.pncp_arquivos."""
+    if request.method != "GET":
+        return await sync_to_async(_pncp_arquivos_sincrono)(request, pk=pk)
+
+    usuario, _, erro = await _usuario_jwt(request)
+    if erro:
+        return erro
+    processo = await sync_to_async(_processo_do_usuario)(usuario, pk)
+    if processo is None:
+        return _nao_encontrado()
+
+    ano_compra = getattr(processo, "pncp_ano_compra", None) or request.GET.get("ano_compra")
+    sequencial_compra = getattr(processo, "pncp_sequencial_compra", None) or request.GET.get("sequencial_compra")
+    if not ano_compra or not sequencial_compra:
+        return JsonResponse(
+            {"publicado": False, "detail": "Processo ainda não publicado no PNCP.", "documentos": []},
+            status=200,
+        )
+
+    if not processo.entidade or not processo.entidade.cnpj:
+        return JsonResponse(
+            {"detail": "Processo sem Entidade/CNPJ. Preencha a entidade e o CNPJ antes."}, status=400
+        )
+    cnpj_orgao = re.sub(r"\D", "", processo.entidade.cnpj or "")
+    if len(cnpj_orgao) != 14:
+        return JsonResponse({"detail": "CNPJ da entidade inválido/ausente."}, status=400)
+
+    try:
+        async with pncp_async.cliente(_sob_asgi(request)) as c:
+            documentos = await pncp_async.listar_documentos_compra(
+                c,
+                cnpj_orgao=cnpj_orgao,
+                ano_compra=int(ano_compra),
+                sequencial_compra=int(sequencial_compra),
+            )
+    except ValueError as e:
+        msg = str(e)
+        m = re.search(r"\((\d{3})\)", msg)
+        return JsonResponse({"detail": msg}, status=int(m.group(1)) if m else status_erro_pncp(e))
+    except Exception as e:
+        logger.exception("Erro interno ao listar documentos PNCP")
+        return JsonResponse({"detail": f"Erro interno ao listar documentos: {str(e)}"}, status=500)
+
+    return JsonResponse(
+        {
+            "publicado": True,
+            "ano_compra": int(ano_compra),
+            "sequencial_compra": int(sequencial_compra),
+            "documentos": documentos,
+        },
+        status=200,
+    )
+
+
+async def consultar_ata_pncp_view(request, pk):
+    """GET /atas-registro-precos/{id}/consultar-pncp/ — situação da ata no PNCP."""
+    if request.method != "GET":
+        return JsonResponse({"detail": "Método não permitido."}, status=405)
+    usuario, _, erro = await _usuario_jwt(request)
+    if erro:
+        return erro
+    ata = await sync_to_async(_ata_do_usuario)(usuario, pk)
+    if ata is None:
+        return _nao_encontrado()
+
+    processo = ata.processo
+    try:
+        require_referencia_pncp(processo)
+        cnpj = extrair_cnpj_processo(processo)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    if not ata.pncp_sequencial_ata:
+        return JsonResponse({"detail": "Ata não possui sequencial no PNCP."}, status=400)
+
+    try:
+        async with pncp_async.cliente(_sob_asgi(request)) as c:
+            resp = await pncp_async.consultar_atas(
+                c,
+                cnpj_orgao=cnpj,
+                ano_compra=processo.pncp_ano_compra,
+                sequencial_compra=processo.pncp_sequencial_compra,
+                sequencial_ata=ata.pncp_sequencial_ata,
+            )
+        return _resposta_repassada(resp)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=status_erro_pncp(e))
+    except Exception as e:
+        return JsonResponse({"detail": str(e)}, status=500)
+
+
+async def listar_atas_pncp_view(request):
+    """GET /atas-registro-precos/listar-pncp/?processo=<id> — atas do processo no PNCP."""
+    if request.method != "GET":
+        return JsonResponse({"detail": "Método não permitido."}, status=405)
+    usuario, _, erro = await _usuario_jwt(request)
+    if erro:
+        return erro
+    processo_id = request.GET.get("processo")
+    if not processo_id:
+        return JsonResponse({"detail": "Parâmetro ?processo= é obrigatório."}, status=400)
+    try:
+        processo = await sync_to_async(_processo_das_atas)(usuario, int(processo_id))
+    except ValueError:
+        processo = None
+    if processo is None:
+        return _nao_encontrado()
+
+    try:
+        require_referencia_pncp(processo)
+        cnpj = extrair_cnpj_processo(processo)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+
+    try:
+        async with pncp_async.cliente(_sob_asgi(request)) as c:
+            resp = await pncp_async.consultar_atas(
+                c,
+                cnpj_orgao=cnpj,
+                ano_compra=processo.pncp_ano_compra,
+                sequencial_compra=processo.pncp_sequencial_compra,
+            )
+        return _resposta_repassada(resp)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=status_erro_pncp(e))
+    except Exception as e:
+        return JsonResponse({"detail": str(e)}, status=500)
+
+
 # ============================================================
 # 8️⃣ AUTH (Google Login)
 # ============================================================
@@ -2448,6 +3515,7 @@ class ContratoEmpenhoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         qs = (
             ContratoEmpenho.objects.select_related("processo", "processo__entidade", "processo__orgao")
+            .prefetch_related(ContratoEmpenhoSerializer.prefetch_documentos())
             .filter(ativo=True)
             .order_by("-criado_em", "id")
         )
@@ -2458,6 +3526,17 @@ class ContratoEmpenhoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         instance.status = "cancelado"
         instance.save(update_fields=["ativo", "status"])
 
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        """Exporta os contratos/empenhos visíveis, respeitando filtros (?formato=csv|xlsx)."""
+        formato = formato_exportacao(request)
+        if not formato:
+            return Response(ERRO_FORMATO_EXPORTACAO, status=status.HTTP_400_BAD_REQUEST)
+        qs = self.filter_queryset(self.get_queryset())
+        return exportacao.resposta_exportacao(
+            request, formato, "contratos", exportacao.CABECALHO_CONTRATOS, exportacao.linhas_contratos(qs)
+        )
+
     @action(detail=False, methods=["post"], url_path="bulk-delete")
     def bulk_delete(self, request):
         ids = request.data.get("ids", [])
@@ -2466,7 +3545,9 @@ class ContratoEmpenhoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 {"error": "Envie uma lista de IDs."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        updated = self.get_queryset().filter(id__in=ids, ativo=True).update(ativo=False, status="cancelado")
+        qs = self.get_queryset().filter(id__in=ids, ativo=True)
+        ProcessoLicitatorio.registrar_alteracao(*set(qs.values_list("processo_id", flat=True)))
+        updated = qs.update(ativo=False, status="cancelado", atualizado_em=timezone.now())
         return Response({"deleted": updated}, status=status.HTTP_200_OK)
 
     # ------------------------------------------------------------------ #
@@ -2702,10 +3783,9 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         chave_documento = infer_chave_documento_contrato(
             request.data.get("chave_documento"),
             request.data.get("titulo"),
-            getattr(request.FILES.get("arquivo"), "name", None),
+            _nome_arquivo_recebido(request),
             tipo_id,
         )
-        arquivo = request.FILES.get("arquivo")
 
         if not contrato_id:
             return Response(
@@ -2713,7 +3793,7 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if not arquivo:
+        if not _tem_arquivo(request):
             return Response(
                 {"detail": "Campo 'arquivo' é obrigatório."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -2742,10 +3822,13 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # hash do arquivo
-        content = arquivo.read()
-        file_hash = hashlib.sha256(content).hexdigest()
-        arquivo.seek(0)
+        # hash do arquivo (upload direto: confere o objeto já gravado no bucket)
+        try:
+            arquivo, arquivo_nome, file_hash = _arquivo_recebido(request, "documentos-contratos")
+        except armazenamento.UploadJaAnexado as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         titulo = request.data.get("titulo") or spec["titulo"]
         existing = get_documento_contrato_por_chave(contrato, chave_documento)
@@ -2760,7 +3843,7 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
 
         if existing:
             existing.arquivo = arquivo
-            existing.arquivo_nome = arquivo.name
+            existing.arquivo_nome = arquivo_nome
             existing.arquivo_hash = file_hash
             existing.chave_documento = chave_documento
             existing.tipo_documento_id = tipo_id_int
@@ -2780,7 +3863,7 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             titulo=titulo,
             observacao=request.data.get("observacao") or None,
             arquivo=arquivo,
-            arquivo_nome=arquivo.name,
+            arquivo_nome=arquivo_nome,
             arquivo_hash=file_hash,
             status="rascunho",
             ativo=True,
@@ -2827,7 +3910,7 @@ class DocumentoContratoViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        content_type = getattr(getattr(doc.arquivo, "file", None), "content_type", "application/pdf")
+        content_type = mimetypes.guess_type(doc.arquivo.name)[0] or "application/pdf"
 
         try:
             result = PNCPService.anexar_documento_contrato(
@@ -2944,49 +4027,55 @@ class AnotacaoViewSet(viewsets.ModelViewSet):
             return []
 
     def _notify_users(self, recipients, actor, tipo_acao, titulo, mensagem, anotacao=None, processo=None):
-        try:
-            rows = []
-            for u in recipients:
-                if not u or not getattr(u, "id", None):
-                    continue
-                if actor and u.id == actor.id:
-                    continue
-                rows.append(
-                    Notificacao(
-                        usuario=u,
-                        ator=actor,
-                        tipo_acao=tipo_acao,
-                        titulo=titulo,
-                        mensagem=mensagem,
-                        anotacao=anotacao,
-                        processo=processo,
-                    )
+        """Monta as notificações e grava depois do commit, fora da requisição."""
+        rows = []
+        for u in recipients:
+            if not u or not getattr(u, "id", None):
+                continue
+            if actor and u.id == actor.id:
+                continue
+            rows.append(
+                Notificacao(
+                    usuario_id=u.id,
+                    ator_id=getattr(actor, "id", None),
+                    tipo_acao=tipo_acao,
+                    titulo=titulo,
+                    mensagem=mensagem,
+                    anotacao_id=getattr(anotacao, "id", None),
+                    processo_id=getattr(processo, "id", None),
                 )
-            if rows:
-                Notificacao.objects.bulk_create(rows)
+            )
+        if rows:
+            tarefas.disparar(self._criar_notificacoes, rows)
+
+    @staticmethod
+    def _criar_notificacoes(rows):
+        try:
+            Notificacao.objects.bulk_create(rows)
+            Notificacao.invalidar_nao_lidas(*(r.usuario_id for r in rows))
+            eventos.notificacoes_criadas(rows)
         except (ProgrammingError, OperationalError):
             logger.exception("Falha de banco ao criar notificações de anotação; ignorando para não quebrar fluxo")
         except Exception:
             logger.exception("Falha inesperada ao criar notificações de anotação; ignorando para não quebrar fluxo")
 
-    def _allowed_process_ids(self):
+    def _entidades_permitidas(self):
+        """
+        Subconsulta com as entidades do usuário (None = sem restrição).
+        Os filtros por processo viram JOIN/IN (SELECT ...) no próprio banco,
+        sem trazer a lista de processos da entidade para o Python.
+        """
         user = self.request.user
         if user.is_superuser or user.is_staff:
             return None
-        entidade_ids = list(user.entidades.values_list("id", flat=True))
-        if not entidade_ids:
-            return []
-        return list(
-            ProcessoLicitatorio.objects.filter(entidade_id__in=entidade_ids).values_list("id", flat=True)
-        )
+        return user.entidades.values("id")
 
     def get_queryset(self):
         user = self.request.user
         qs = (
-            Anotacao.objects.select_related("usuario", "processo")
+            Anotacao.objects.filter(pk__in=Anotacao.ids_visiveis(user.pk))
+            .select_related("usuario", "processo")
             .prefetch_related("compartilhada_com")
-            .filter(Q(usuario=user) | Q(compartilhada_com=user))
-            .distinct()
             .order_by('-criado_em')
         )
 
@@ -2994,23 +4083,22 @@ class AnotacaoViewSet(viewsets.ModelViewSet):
         if processo_id:
             qs = qs.filter(processo_id=processo_id)
 
-        allowed_process_ids = self._allowed_process_ids()
-        if allowed_process_ids is not None:
-            qs = qs.filter(Q(processo__isnull=True) | Q(processo_id__in=allowed_process_ids))
-
+        entidades = self._entidades_permitidas()
+        if entidades is not None:
+            qs = qs.filter(Q(processo__isnull=True) | Q(processo__entidade_id__in=entidades))
         return qs
 
     def _assert_processo_permitido(self, processo_id):
         if not processo_id:
             return
-        allowed_process_ids = self._allowed_process_ids()
-        if allowed_process_ids is None:
+        entidades = self._entidades_permitidas()
+        if entidades is None:
             return
         try:
             processo_id = int(processo_id)
         except (TypeError, ValueError):
             raise PermissionDenied("Processo inválido.")
-        if processo_id not in set(allowed_process_ids):
+        if not ProcessoLicitatorio.objects.filter(pk=processo_id, entidade_id__in=entidades).exists():
             raise PermissionDenied("Você não tem acesso a este processo.")
 
     def perform_create(self, serializer):
@@ -3143,58 +4231,78 @@ class AnotacaoViewSet(viewsets.ModelViewSet):
 
 
 class UsuarioLookupView(APIView):
+    """Autocomplete de usuários (ver api/autocomplete.py). ?q=&processo=&limite="""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        term = (request.query_params.get("q") or "").strip()
+        term = request.query_params.get("q")
         processo_id = (request.query_params.get("processo") or "").strip()
-        qs = User.objects.all().order_by("username")
+        limite = autocomplete.ler_limite(request.query_params.get("limite"))
 
-        if request.user.is_superuser or request.user.is_staff:
-            pass
-        else:
+        entidade_ids = None
+        if not (request.user.is_superuser or request.user.is_staff):
             entidade_ids = list(request.user.entidades.values_list("id", flat=True))
             if processo_id:
                 try:
-                    processo = ProcessoLicitatorio.objects.get(pk=int(processo_id))
-                    if not entidade_ids or processo.entidade_id not in entidade_ids:
-                        qs = qs.none()
-                    else:
-                        qs = qs.filter(entidades__id=processo.entidade_id).distinct()
-                except Exception:
-                    qs = qs.none()
-            else:
-                if entidade_ids:
-                    qs = qs.filter(entidades__id__in=entidade_ids).distinct()
-                else:
-                    qs = qs.filter(id=request.user.id)
-
-        if term:
-            qs = qs.filter(
-                Q(username__icontains=term)
-                | Q(first_name__icontains=term)
-                | Q(last_name__icontains=term)
-            )
+                    processo_entidade = (
+                        ProcessoLicitatorio.objects.filter(pk=int(processo_id))
+                        .values_list("entidade_id", flat=True)
+                        .first()
+                    )
+                except (TypeError, ValueError):
+                    processo_entidade = None
+                if processo_entidade is None or processo_entidade not in entidade_ids:
+                    return Response([])
+                entidade_ids = [processo_entidade]
 
-        data = [
-            {
-                "id": u.id,
-                "username": u.username,
-                "nome": u.get_full_name() or u.username,
-            }
-            for u in qs[:20]
-        ]
-        return Response(data)
+        return Response(
+            autocomplete.buscar_usuarios(term, entidade_ids, usuario_id=request.user.id, limite=limite)
+        )
 
 
 class NotificacaoViewSet(viewsets.ModelViewSet):
     serializer_class = NotificacaoSerializer
     permission_classes = [IsAuthenticated]
-    http_method_names = ["get", "patch", "head", "options"]
+    http_method_names = ["get", "post", "patch", "head", "options"]
 
     def get_queryset(self):
         return Notificacao.objects.filter(usuario=self.request.user).order_by("-criado_em")
 
+    def create(self, request, *args, **kwargs):
+        # Notificações são geradas pelo sistema; POST só nas actions abaixo
+        return Response({"detail": "Método não permitido."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @action(detail=False, methods=["get"], url_path="nao-lidas")
+    def nao_lidas(self, request):
+        """Contador do sino: GET /notificacoes/nao-lidas/ -> {"nao_lidas": n}"""
+        return Response({"nao_lidas": Notificacao.contar_nao_lidas(request.user.pk)})
+
+    @action(detail=False, methods=["post"], url_path="marcar-lidas")
+    def marcar_lidas(self, request):
+        """
+        Marca em lote numa única UPDATE.
+        Body: {"ids": [1, 2, ...]} (omitido = todas) e "lida": true|false (padrão true).
+        """
+        ids = request.data.get("ids")
+        if ids is not None:
+            if not isinstance(ids, list):
+                return Response({"detail": "'ids' deve ser uma lista."}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                ids = [int(i) for i in ids]
+            except (TypeError, ValueError):
+                return Response({"detail": "'ids' deve conter apenas números."}, status=status.HTTP_400_BAD_REQUEST)
+
+        lida = request.data.get("lida", True)
+        if not isinstance(lida, bool):
+            return Response({"detail": "'lida' deve ser true ou false."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            atualizadas = Notificacao.marcar_lidas(request.user.pk, ids=ids, lida=lida)
+        return Response({
+            "atualizadas": atualizadas,
+            "nao_lidas": Notificacao.contar_nao_lidas(request.user.pk),
+        })
+
 # ============================================================
 # 🗂️ ARQUIVOS USUÁRIO VIEWSET
 # ============================================================
@@ -3209,8 +4317,13 @@ class ArquivoUserViewSet(viewsets.ModelViewSet):
         return ArquivoUser.objects.filter(usuario=self.request.user).order_by('-enviado_em')
 
     def perform_create(self, serializer):
+        if not _tem_arquivo(self.request):
+            raise ValidationError({"arquivo": ["Este campo é obrigatório."]})
         # Vincula automaticamente o arquivo ao usuário logado
-        serializer.save(usuario=self.request.user)
+        serializer.save(
+            usuario=self.request.user,
+            **_campos_upload_direto(self.request, "arquivos-user", metadados=False),
+        )
 
 
 class ProcessoDocumentoLinhaViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
@@ -3315,10 +4428,11 @@ class DocumentoPNCPViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
             serializer.save(
                 tipo_documento_id=linha.tipo_documento_id,
                 titulo=serializer.validated_data.get("titulo") or linha.nome,
+                **_campos_upload_direto(self.request, "documentos-pncp"),
             )
             return
 
-        serializer.save()
+        serializer.save(**_campos_upload_direto(self.request, "documentos-pncp"))
 
     def _extrair_sequencial_location(self, location: str):
         """
@@ -3378,17 +4492,16 @@ class DocumentoPNCPViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
 
         # 5) Envio ao PNCP (6.3.6 – Inserir Documento a uma Contratação)
         try:
-            # garante ponteiro no início
-            with doc.arquivo.open("rb") as f:
-                result = PNCPService.anexar_documento_compra(
-                    cnpj_orgao=cnpj_orgao,
-                    ano_compra=int(processo.pncp_ano_compra),
-                    sequencial_compra=int(processo.pncp_sequencial_compra),
-                    arquivo=f,
-                    titulo_documento=doc.titulo or "Documento",
-                    tipo_documento_id=int(doc.tipo_documento_id),
-                    content_type="application/pdf",  # ajuste se você detectar mimetype real
-                )
+            # O serviço lê o arquivo do armazenamento em fluxo
+            result = PNCPService.anexar_documento_compra(
+                cnpj_orgao=cnpj_orgao,
+                ano_compra=int(processo.pncp_ano_compra),
+                sequencial_compra=int(processo.pncp_sequencial_compra),
+                arquivo=doc.arquivo,
+                titulo_documento=doc.titulo or "Documento",
+                tipo_documento_id=int(doc.tipo_documento_id),
+                content_type="application/pdf",  # ajuste se você detectar mimetype real
+            )
         except Exception as exc:
             # marca erro local
             doc.status = "erro"
@@ -3439,7 +4552,9 @@ class AtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         ids = request.data.get("ids", [])
         if not ids or not isinstance(ids, list):
             return Response({"error": "Envie uma lista de IDs."}, status=status.HTTP_400_BAD_REQUEST)
-        updated = self.get_queryset().filter(id__in=ids, ativo=True).update(ativo=False, status="cancelada")
+        qs = self.get_queryset().filter(id__in=ids, ativo=True)
+        ProcessoLicitatorio.registrar_alteracao(*set(qs.values_list("processo_id", flat=True)))
+        updated = qs.update(ativo=False, status="cancelada", atualizado_em=timezone.now())
         return Response({"deleted": updated}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"], url_path="publicar-no-pncp")
@@ -3652,89 +4767,11 @@ class AtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
         return self.excluir_do_pncp(request, pk=pk)
 
     # ------------------------------------------------------------------
-    # CONSULTAR ATA NO PNCP (GET)
+    # CONSULTAR / LISTAR ATAS NO PNCP (GET)
     # ------------------------------------------------------------------
-    @action(detail=True, methods=["get"], url_path="consultar-pncp")
-    def consultar_pncp(self, request, pk=None):
-        """Consulta a situação de uma Ata de Registro de Preços no PNCP."""
-        ata = self.get_object()
-        processo = ata.processo
-        try:
-            require_referencia_pncp(processo)
-            cnpj = extrair_cnpj_processo(processo)
-        except ValueError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    # consultar-pncp e listar-pncp são views assíncronas (consultar_ata_pncp_view
+    # e listar_atas_pncp_view), roteadas em urls.py nos mesmos caminhos.
 
-        if not ata.pncp_sequencial_ata:
-            return Response(
-                {"detail": "Ata não possui sequencial no PNCP."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        try:
-            token = PNCPService._get_token()
-            url = (
-                f"{PNCPService.CONSULTA_URL}/compras/{cnpj}"
-                f"/{processo.pncp_ano_compra}/{processo.pncp_sequencial_compra}"
-                f"/atas/{ata.pncp_sequencial_ata}"
-            )
-            resp = requests.get(
-                url,
-                headers={"Authorization": f"Bearer {token}"},
-                verify=PNCPService.VERIFY_SSL,
-                timeout=30,
-            )
-            if resp.status_code == 200:
-                return Response(resp.json(), status=status.HTTP_200_OK)
-            return Response(
-                {"detail": f"PNCP retornou {resp.status_code}", "body": resp.text},
-                status=resp.status_code,
-            )
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-    # ------------------------------------------------------------------
-    # LISTAR ATAS NO PNCP (GET)
-    # ------------------------------------------------------------------
-    @action(detail=False, methods=["get"], url_path="listar-pncp")
-    def listar_pncp(self, request):
-        """Lista todas as Atas de Registro de Preços de um processo no PNCP."""
-        processo_id = request.query_params.get("processo")
-        if not processo_id:
-            return Response({"detail": "Parâmetro ?processo= é obrigatório."}, status=status.HTTP_400_BAD_REQUEST)
-
-        proc_qs = ProcessoLicitatorio.objects.filter(pk=processo_id)
-        user = request.user
-        if not user.is_superuser and not user.is_staff:
-            entidade_ids = list(user.entidades.values_list("id", flat=True))
-            proc_qs = proc_qs.filter(entidade_id__in=entidade_ids)
-        processo = get_object_or_404(proc_qs)
-        try:
-            require_referencia_pncp(processo)
-            cnpj = extrair_cnpj_processo(processo)
-        except ValueError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            token = PNCPService._get_token()
-            url = (
-                f"{PNCPService.CONSULTA_URL}/compras/{cnpj}"
-                f"/{processo.pncp_ano_compra}/{processo.pncp_sequencial_compra}/atas"
-            )
-            resp = requests.get(
-                url,
-                headers={"Authorization": f"Bearer {token}"},
-                verify=PNCPService.VERIFY_SSL,
-                timeout=30,
-            )
-            if resp.status_code == 200:
-                return Response(resp.json(), status=status.HTTP_200_OK)
-            return Response(
-                {"detail": f"PNCP retornou {resp.status_code}", "body": resp.text},
-                status=resp.status_code,
-            )
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewSet):
     serializer_class = DocumentoAtaRegistroPrecosSerializer
@@ -3755,7 +4792,6 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
     def create(self, request, *args, **kwargs):
         ata_id = request.data.get("ata")
         tipo_id = request.data.get("tipo_documento_id")
-        arquivo = request.FILES.get("arquivo")
 
         if not ata_id or not tipo_id:
             return Response(
@@ -3763,7 +4799,7 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if not arquivo:
+        if not _tem_arquivo(request):
             return Response(
                 {"detail": "Campo 'arquivo' é obrigatório."},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -3776,10 +4812,13 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
             ata_qs = ata_qs.filter(processo__entidade_id__in=entidade_ids)
         ata = get_object_or_404(ata_qs)
 
-        # hash do arquivo
-        content = arquivo.read()
-        file_hash = hashlib.sha256(content).hexdigest()
-        arquivo.seek(0)
+        # hash do arquivo (upload direto: confere o objeto já gravado no bucket)
+        try:
+            arquivo, arquivo_nome, file_hash = _arquivo_recebido(request, "documentos-atas")
+        except armazenamento.UploadJaAnexado as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         # upsert por (ata, tipo_documento_id)
         existing = (
@@ -3797,7 +4836,7 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
 
         if existing and existing.status != "enviado":
             existing.arquivo = arquivo
-            existing.arquivo_nome = arquivo.name
+            existing.arquivo_nome = arquivo_nome
             existing.arquivo_hash = file_hash
             existing.titulo = titulo
             existing.status = "rascunho"
@@ -3812,7 +4851,7 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
             titulo=titulo,
             observacao=request.data.get("observacao") or None,
             arquivo=arquivo,
-            arquivo_nome=arquivo.name,
+            arquivo_nome=arquivo_nome,
             arquivo_hash=file_hash,
             status="rascunho",
             ativo=True,
@@ -3871,7 +4910,7 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
             )
 
         # tenta pegar o content_type, mas se não vier, assume PDF
-        content_type = getattr(getattr(doc.arquivo, "file", None), "content_type", "application/pdf")
+        content_type = mimetypes.guess_type(doc.arquivo.name)[0] or "application/pdf"
 
         try:
             # 6.4.6 – Inserir Documento de uma Ata
@@ -3984,3 +5023,21 @@ class DocumentoAtaRegistroPrecosViewSet(EntidadeFilterMixin, viewsets.ModelViewS
     def remover_do_pncp(self, request, pk=None):
         """Alias de compatibilidade para clients legados."""
         return self.excluir_do_pncp(request, pk=pk)
+
+
+# ============================================================
+# ⚙️ TAREFAS EM SEGUNDO PLANO
+# ============================================================
+
+class TarefaProcessamentoViewSet(viewsets.ReadOnlyModelViewSet):
+    """Acompanhamento (status/progresso/resultado) das tarefas do usuário."""
+    serializer_class = TarefaProcessamentoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["tipo", "status", "processo"]
+
+    def get_queryset(self):
+        qs = TarefaProcessamento.objects.all()
+        if not self.request.user.is_superuser:
+            qs = qs.filter(usuario=self.request.user)
+        return qs
@@ -0,0 +1,174 @@
+# api/workspace.py
+"""
+Workspace do processo: tudo que a tela do processo precisa em uma única
+resposta (/processos/{id}/workspace/).
+
+Cada seção é montada com um número fixo de consultas (select_related /
+Prefetch), independente da quantidade de itens, contratos ou documentos.
+O escopo de entidade é verificado uma vez, ao buscar o processo; as seções
+filtram apenas por processo_id.
+
+Cada seção leva um ETag (hash do conteúdo serializado). O cliente pode
+informar os ETags que já conhece em ?etags=secao:etag,...; seções
+inalteradas voltam só com {"etag", "nao_modificado": true}. A resposta
+inteira usa o ETag de versão do processo (304 sem montar nada).
+"""
+
+import hashlib
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import (
+    AtaRegistroPrecos,
+    ContratoEmpenho,
+    DocumentoPNCP,
+    Fornecedor,
+    Item,
+    ItemFornecedor,
+    ProcessoDocumentoLinha,
+)
+from .serializers import (
+    AtaRegistroPrecosSerializer,
+    ContratoEmpenhoSerializer,
+    DocumentoPNCPSerializer,
+    FornecedorSerializer,
+    ItemFornecedorSerializer,
+    ItemSerializer,
+    LoteSerializer,
+    ProcessoDocumentoLinhaSerializer,
+    ProcessoLicitatorioSerializer,
+)
+
+
+# ============================================================
+# 🧩 SEÇÕES
+# ============================================================
+
+def _secao_processo(processo, contexto):
+    return ProcessoLicitatorioSerializer(processo, context=contexto).data
+
+
+def _secao_itens(processo, contexto):
+    itens = list(
+        Item.objects.filter(processo=processo)
+        .select_related("processo", "lote", "fornecedor")
+        .order_by("ordem", "id")
+    )
+    # Mesma ordenação de numeracao_itens(): a numeração sai da própria lista
+    contexto.setdefault("_numeracao_itens", {})[processo.pk] = {
+        item.pk: idx for idx, item in enumerate(itens, start=1)
+    }
+    return ItemSerializer(itens, many=True, context=contexto).data
+
+
+def _secao_lotes(processo, contexto):
+    return LoteSerializer(processo.lotes.order_by("numero"), many=True, context=contexto).data
+
+
+def _secao_fornecedores(processo, contexto):
+    fornecedores = Fornecedor.objects.filter(processos__processo=processo).order_by("razao_social")
+    return FornecedorSerializer(fornecedores, many=True, context=contexto).data
+
+
+def _secao_itens_fornecedor(processo, contexto):
+    propostas = (
+        ItemFornecedor.objects.filter(item__processo=processo)
+        .select_related("item", "fornecedor")
+        .order_by("item__ordem", "item_id", "id")
+    )
+    return ItemFornecedorSerializer(propostas, many=True, context=contexto).data
+
+
+def _secao_documentos_pncp(processo, contexto):
+    documentos = (
+        DocumentoPNCP.objects.filter(processo=processo)
+        .select_related("linha_documento")
+        .order_by("-criado_em")
+    )
+    return DocumentoPNCPSerializer(documentos, many=True, context=contexto).data
+
+
+def _secao_documento_linhas(processo, contexto):
+    linhas = ProcessoDocumentoLinha.objects.filter(processo=processo, ativo=True).order_by("ordem", "id")
+    return ProcessoDocumentoLinhaSerializer(linhas, many=True, context=contexto).data
+
+
+def _secao_contratos(processo, contexto):
+    contratos = (
+        ContratoEmpenho.objects.filter(processo=processo, ativo=True)
+        .select_related("processo", "processo__entidade")
+        .prefetch_related(ContratoEmpenhoSerializer.prefetch_documentos())
+        .order_by("-criado_em", "id")
+    )
+    return ContratoEmpenhoSerializer(contratos, many=True, context=contexto).data
+
+
+def _secao_atas(processo, contexto):
+    atas = (
+        AtaRegistroPrecos.objects.filter(processo=processo, ativo=True)
+        .select_related("processo")
+        .order_by("-criado_em")
+    )
+    return AtaRegistroPrecosSerializer(atas, many=True, context=contexto).data
+
+
+SECOES = {
+    "processo": _secao_processo,
+    "itens": _secao_itens,
+    "lotes": _secao_lotes,
+    "fornecedores": _secao_fornecedores,
+    "itens_fornecedor": _secao_itens_fornecedor,
+    "documentos_pncp": _secao_documentos_pncp,
+    "documento_linhas": _secao_documento_linhas,
+    "contratos": _secao_contratos,
+    "atas": _secao_atas,
+}
+
+
+# ============================================================
+# 🏷️ ETAGS / MONTAGEM
+# ============================================================
+
+def etag_conteudo(dados):
+    corpo = json.dumps(dados, cls=JSONEncoder, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(corpo.encode("utf-8")).hexdigest()[:20]
+
+
+def secoes_pedidas(valor):
+    """
+    Interpreta ?include= (lista separada por vírgula). Vazio = todas.
+    Devolve (secoes, desconhecidas).
+    """
+    if not valor:
+        return list(SECOES), []
+    pedidas = [s.strip() for s in valor.split(",") if s.strip()]
+    desconhecidas = [s for s in pedidas if s not in SECOES]
+    return [s for s in SECOES if s in pedidas], desconhecidas
+
+
+def etags_conhecidas(valor):
+    """?etags=itens:abc123,lotes:def456 -> {"itens": "abc123", "lotes": "def456"}"""
+    conhecidas = {}
+    for par in (valor or "").split(","):
+        secao, _, etag = par.partition(":")
+        if secao.strip() and etag.strip():
+            conhecidas[secao.strip()] = etag.strip().strip('"')
+    return conhecidas
+
+
+def montar_workspace(processo, secoes, *, request=None, conhecidas=None):
+    """Monta as seções pedidas, omitindo os dados das que o cliente já tem."""
+    conhecidas = conhecidas or {}
+    contexto = {"request": request}
+    payload = {}
+
+    for nome in secoes:
+        dados = SECOES[nome](processo, contexto)
+        etag = etag_conteudo(dados)
+        if conhecidas.get(nome) == etag:
+            payload[nome] = {"etag": etag, "nao_modificado": True}
+        else:
+            payload[nome] = {"etag": etag, "dados": dados}
+
+    return payload
@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servidor ASGI (necessário para o stream /api/eventos/ e para as leituras
+assíncronas do PNCP não ocuparem um worker durante a espera):
+
+    uvicorn backend.asgi:application --workers 4 --host 0.0.0.0 --port $PORT
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
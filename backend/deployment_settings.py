@@ -12,13 +12,14 @@ SECRET_KEY = os.environ.get('SECRET_KEY')
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'backend.middleware.WhiteNoiseAsyncMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'backend.middleware.PrazoMiddleware',
 
 ]
 
@@ -29,9 +30,8 @@ MIDDLEWARE = [
 
 STORAGES = {
 
-    "default": {
-        "BACKEND": "django.core.files.storage.FileSystemStorage",
-    },
+    # Disco local ou bucket S3/compatível (ver ARMAZENAMENTO em settings.py)
+    "default": ARMAZENAMENTO_PADRAO,
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",   
     },
@@ -0,0 +1,69 @@
+"""
+Middlewares do projeto.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from api import prazos
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que também funciona em modo assíncrono.
+
+    O WhiteNoiseMiddleware original só é síncrono; sob ASGI isso obriga o
+    Django a rodar toda a cadeia (inclusive as views assíncronas) em uma
+    única thread, serializando as requisições. Aqui só o envio do arquivo
+    estático vai para uma thread; o resto segue assíncrono.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self._assincrono = iscoroutinefunction(get_response)
+        if self._assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._assincrono:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class PrazoMiddleware:
+    """
+    Abre um prazo total (settings.PNCP_PRAZO_TOTAL_SEGUNDOS) para cada
+    requisição; as chamadas ao PNCP encolhem seus timeouts para caber nele
+    (ver api/prazos.py). Deve ficar abaixo do timeout do proxy/gunicorn.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._assincrono = iscoroutinefunction(get_response)
+        if self._assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._assincrono:
+            return self.__acall__(request)
+        with prazos.prazo():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with prazos.prazo():
+            return await self.get_response(request)
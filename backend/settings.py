@@ -51,7 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'backend.middleware.WhiteNoiseAsyncMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.PrazoMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -195,4 +196,173 @@ LOGGING = {
             "propagate": False,
         },
     },
-}
\ No newline at end of file
+}
+# ============================================================
+# TAREFAS EM SEGUNDO PLANO / IMPORTAÇÃO
+# ============================================================
+# Threads dedicadas a tarefas longas (importações) em cada processo web
+TAREFAS_MAX_WORKERS = int(os.getenv('TAREFAS_MAX_WORKERS', '2'))
+
+# Planilhas acima deste tamanho são importadas em segundo plano
+IMPORTACAO_LIMITE_SINCRONO_BYTES = int(os.getenv('IMPORTACAO_LIMITE_SINCRONO_BYTES', str(2 * 1024 * 1024)))
+
+# Pool de processos para trabalho de CPU das requisições (api/processamento.py).
+# Processos filhos por processo web (0 = roda na própria thread)
+PROCESSAMENTO_MAX_PROCESSOS = int(os.getenv('PROCESSAMENTO_MAX_PROCESSOS', '2'))
+# Trabalhos em andamento + na fila por processo web; acima disso, 503
+PROCESSAMENTO_FILA_MAXIMA = int(os.getenv('PROCESSAMENTO_FILA_MAXIMA', '8'))
+# Quanto uma requisição espera por vaga na fila antes do 503
+PROCESSAMENTO_ESPERA_FILA_SEGUNDOS = float(os.getenv('PROCESSAMENTO_ESPERA_FILA_SEGUNDOS', '5'))
+# Tempo limite de um trabalho síncrono (importações em segundo plano não têm)
+PROCESSAMENTO_TIMEOUT_SEGUNDOS = float(os.getenv('PROCESSAMENTO_TIMEOUT_SEGUNDOS', '300'))
+
+# ============================================================
+# SINCRONIZAÇÃO (feed de alterações por entidade)
+# ============================================================
+# Janela relida antes do cursor para cobrir transações confirmadas com atraso
+SINCRONIZACAO_MARGEM_SEGUNDOS = int(os.getenv('SINCRONIZACAO_MARGEM_SEGUNDOS', '5'))
+# Acima deste número de registros alterados o cliente deve recarregar tudo
+SINCRONIZACAO_LIMITE = int(os.getenv('SINCRONIZACAO_LIMITE', '5000'))
+# Retenção dos registros de exclusão (manage.py expurgar_exclusoes)
+SINCRONIZACAO_RETENCAO_DIAS = int(os.getenv('SINCRONIZACAO_RETENCAO_DIAS', '30'))
+
+# ============================================================
+# EVENTOS (SSE de notificações e tarefas — requer ASGI)
+# ============================================================
+# "banco" (consulta periódica, vários workers) ou "memoria" (um processo só)
+EVENTOS_BROKER = os.getenv('EVENTOS_BROKER', 'banco')
+EVENTOS_INTERVALO_SEGUNDOS = float(os.getenv('EVENTOS_INTERVALO_SEGUNDOS', '2'))
+EVENTOS_HEARTBEAT_SEGUNDOS = int(os.getenv('EVENTOS_HEARTBEAT_SEGUNDOS', '15'))
+# Conexões são encerradas após este tempo; o EventSource reconecta sozinho
+EVENTOS_DURACAO_MAXIMA_SEGUNDOS = int(os.getenv('EVENTOS_DURACAO_MAXIMA_SEGUNDOS', '300'))
+
+# ============================================================
+# CACHE
+# ============================================================
+# Com REDIS_URL o cache é compartilhado entre workers (requer o pacote redis);
+# sem ela, cada processo tem seu cache em memória
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# ============================================================
+# NOTIFICAÇÕES
+# ============================================================
+# Validade do contador de não lidas em cache. A invalidação é feita na
+# escrita; o TTL só limita a defasagem entre workers com cache local.
+NOTIFICACOES_CONTADOR_TTL = int(os.getenv('NOTIFICACOES_CONTADOR_TTL', '60'))
+# Lidas mais antigas que isto são removidas (manage.py expurgar_notificacoes)
+NOTIFICACOES_RETENCAO_DIAS = int(os.getenv('NOTIFICACOES_RETENCAO_DIAS', '90'))
+
+# ============================================================
+# AUTOCOMPLETE (usuários e fornecedores)
+# ============================================================
+# Validade dos resultados em cache por entidade + termo
+AUTOCOMPLETE_CACHE_SEGUNDOS = int(os.getenv('AUTOCOMPLETE_CACHE_SEGUNDOS', '30'))
+
+# ============================================================
+# PNCP — LEITURAS ASSÍNCRONAS (api/pncp_async.py)
+# ============================================================
+# Conexões simultâneas ao PNCP por processo (pool do httpx.AsyncClient)
+PNCP_ASYNC_MAX_CONEXOES = int(os.getenv('PNCP_ASYNC_MAX_CONEXOES', '100'))
+# Leituras com hedge: se a base de consulta preferida não responder em tantos
+# segundos, a mesma consulta (GET) vai também para a base alternativa e vale
+# a primeira resposta boa. 0 desliga (uma base por vez). Use algo próximo
+# do p95 de latência do PNCP, para só as leituras lentas gerarem o 2º pedido.
+PNCP_HEDGE_ATRASO_SEGUNDOS = float(os.getenv('PNCP_HEDGE_ATRASO_SEGUNDOS', '0'))
+# Threads por processo para as leituras em paralelo do cliente síncrono
+PNCP_HEDGE_MAX_THREADS = int(os.getenv('PNCP_HEDGE_MAX_THREADS', '8'))
+
+# ============================================================
+# PNCP — PRAZO TOTAL POR REQUISIÇÃO (api/prazos.py)
+# ============================================================
+# Teto para todas as chamadas ao PNCP de uma requisição (login, permissão,
+# publicação, sincronização item a item). Mantenha abaixo do timeout do
+# proxy/gunicorn, para a resposta (parcial ou 504) chegar ao usuário.
+PNCP_PRAZO_TOTAL_SEGUNDOS = float(os.getenv('PNCP_PRAZO_TOTAL_SEGUNDOS', '100'))
+# Abaixo disto não vale começar mais uma chamada
+PNCP_PRAZO_MINIMO_CHAMADA_SEGUNDOS = float(os.getenv('PNCP_PRAZO_MINIMO_CHAMADA_SEGUNDOS', '2'))
+# Arrendamento das travas de publicação/sincronização por processo
+# (api/travas.py): renovado a cada terço enquanto a operação roda; se o
+# processo morrer, a trava vence após isto e outra execução pode assumir.
+TRAVA_OPERACAO_DURACAO_SEGUNDOS = int(os.getenv('TRAVA_OPERACAO_DURACAO_SEGUNDOS', '60'))
+
+# ============================================================
+# DOWNLOAD DE ARQUIVOS (api/downloads.py)
+# ============================================================
+# Servidor da frente que transmite o arquivo depois da checagem de permissão:
+# "nginx" (X-Accel-Redirect), "apache" (X-Sendfile, mod_xsendfile),
+# "litespeed" (X-LiteSpeed-Location) ou vazio (o Django transmite, com Range).
+DOWNLOAD_SERVIDOR = os.getenv('DOWNLOAD_SERVIDOR', '').strip().lower()
+# Location interna do nginx/litespeed apontando para MEDIA_ROOT. Ex. (nginx):
+#   location /media-protegida/ { internal; alias /caminho/para/media/; }
+# MEDIA_URL não deve ser servida publicamente em produção.
+DOWNLOAD_PREFIXO_INTERNO = os.getenv('DOWNLOAD_PREFIXO_INTERNO', '/media-protegida/')
+# Validade das URLs assinadas expostas em arquivo_url
+DOWNLOAD_URL_VALIDADE_SEGUNDOS = int(os.getenv('DOWNLOAD_URL_VALIDADE_SEGUNDOS', '3600'))
+
+# ============================================================
+# ARMAZENAMENTO DE ARQUIVOS (api/armazenamento.py)
+# ============================================================
+# Com ARMAZENAMENTO_S3_BUCKET os FileFields vão para um bucket S3 ou
+# compatível (MinIO, Ceph, R2...: informe ARMAZENAMENTO_S3_ENDPOINT) em vez
+# de MEDIA_ROOT, e o frontend pode enviar arquivos direto ao bucket
+# (/api/uploads/presign/). Requer django-storages[s3]. Credenciais vazias
+# usam a cadeia padrão do boto3 (variáveis AWS_*, perfil, IAM role).
+ARMAZENAMENTO_S3_BUCKET = os.getenv('ARMAZENAMENTO_S3_BUCKET', '')
+ARMAZENAMENTO_PADRAO = {"BACKEND": "django.core.files.storage.FileSystemStorage"}
+if ARMAZENAMENTO_S3_BUCKET:
+    ARMAZENAMENTO_PADRAO = {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": ARMAZENAMENTO_S3_BUCKET,
+            "endpoint_url": os.getenv('ARMAZENAMENTO_S3_ENDPOINT') or None,
+            "region_name": os.getenv('ARMAZENAMENTO_S3_REGIAO') or None,
+            "access_key": os.getenv('ARMAZENAMENTO_S3_ACCESS_KEY') or None,
+            "secret_key": os.getenv('ARMAZENAMENTO_S3_SECRET_KEY') or None,
+            "location": os.getenv('ARMAZENAMENTO_S3_PREFIXO', ''),
+            # MinIO e afins costumam exigir endereçamento por caminho
+            "addressing_style": os.getenv('ARMAZENAMENTO_S3_ENDERECAMENTO') or None,
+            "signature_version": "s3v4",
+            "default_acl": None,
+            "file_overwrite": False,
+            "querystring_auth": True,
+            "querystring_expire": int(os.getenv('ARMAZENAMENTO_S3_URL_VALIDADE_SEGUNDOS', '300')),
+        },
+    }
+STORAGES = {
+    "default": ARMAZENAMENTO_PADRAO,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# Limite e validade das URLs de upload direto
+ARMAZENAMENTO_UPLOAD_TAMANHO_MAXIMO = int(os.getenv('ARMAZENAMENTO_UPLOAD_TAMANHO_MAXIMO', str(200 * 1024 * 1024)))
+ARMAZENAMENTO_UPLOAD_VALIDADE_SEGUNDOS = int(os.getenv('ARMAZENAMENTO_UPLOAD_VALIDADE_SEGUNDOS', '900'))
+# Uploads retomáveis em partes (/api/uploads/): no bucket as partes vão para
+# um multipart upload; no disco, para arquivos sob este prefixo do storage
+# (MEDIA_ROOT, que precisa ser compartilhado se houver vários servidores).
+ARMAZENAMENTO_UPLOAD_PARCIAL_PREFIXO = os.getenv('ARMAZENAMENTO_UPLOAD_PARCIAL_PREFIXO', 'uploads_parciais/')
+ARMAZENAMENTO_UPLOAD_PARTE_MAXIMA = int(os.getenv('ARMAZENAMENTO_UPLOAD_PARTE_MAXIMA', str(16 * 1024 * 1024)))
+# Reserva de uma parte em gravação; vencida, outra requisição pode reenviá-la
+ARMAZENAMENTO_UPLOAD_PARTE_TIMEOUT_SEGUNDOS = int(os.getenv('ARMAZENAMENTO_UPLOAD_PARTE_TIMEOUT_SEGUNDOS', '300'))
+# Sessões paradas há mais que isto são removidas (manage.py expurgar_uploads)
+ARMAZENAMENTO_UPLOAD_RETENCAO_HORAS = int(os.getenv('ARMAZENAMENTO_UPLOAD_RETENCAO_HORAS', '48'))
+
+# ============================================================
+# LIMPEZA DE ARQUIVOS ÓRFÃOS (api/limpeza_midia.py)
+# ============================================================
+# manage.py expurgar_midia_orfa. Arquivos sem registro mais novos que a
+# carência são mantidos: cobre uploads diretos/em partes ainda não anexados.
+MIDIA_ORFA_CARENCIA_HORAS = int(os.getenv('MIDIA_ORFA_CARENCIA_HORAS', '24'))
+# Move os órfãos para quarentena/ em vez de removê-los
+MIDIA_ORFA_QUARENTENA = os.getenv('MIDIA_ORFA_QUARENTENA', 'False') == 'True'